@@ -18,6 +18,13 @@ from matplotlib.figure import Figure
 
 from image_processing import ImageProcessor
 from ml_processing import MLImageProcessor
+from result_cache import CachedProcessor
+from jobs import JobRunner
+
+# Repeating an operation with the same image and parameters is served
+# from the result cache (see result_cache.RESULT_CACHE.stats())
+ImageProcessor = CachedProcessor(ImageProcessor)
+MLImageProcessor = CachedProcessor(MLImageProcessor)
 
 
 class ComprehensiveImageApp:
@@ -52,6 +59,10 @@ class ComprehensiveImageApp:
         # Tạo giao diện
         self.create_gui()
         
+        # Xử lý chạy trong luồng nền, kết quả trả về luồng UI qua root.after
+        self.jobs = JobRunner(self.root.after, on_progress=self.show_job_progress)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
     def create_gui(self):
         """Tạo giao diện người dùng"""
         
@@ -119,9 +130,12 @@ class ComprehensiveImageApp:
         self.info_text = scrolledtext.ScrolledText(info_tab, wrap=tk.WORD, font=("Courier", 9))
         self.info_text.pack(fill=tk.BOTH, expand=True)
         
-        # Status bar
-        self.status_label = ttk.Label(self.root, text="Sẵn sàng", relief=tk.SUNKEN)
-        self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
+        # Status bar (progress bar shown while a job is running)
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_label = ttk.Label(status_frame, text="Sẵn sàng", relief=tk.SUNKEN)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress_bar = ttk.Progressbar(status_frame, mode='indeterminate', length=150)
     
     def create_bai1_3_tab(self):
         """Tạo tab cho Bài 1-3: Chuyển đổi cơ bản"""
@@ -487,6 +501,7 @@ class ComprehensiveImageApp:
                     self.original_gray = np.array(gray_pil)
                 
                 self.processed_image = self.original_gray.copy()
+                self.jobs.cancel_all()
                 
                 # Display
                 self.display_image(self.original_image)
@@ -569,6 +584,59 @@ class ComprehensiveImageApp:
             image=self.current_display, anchor=tk.CENTER
         )
     
+    # ===== Background Jobs =====
+    
+    def run_job(self, name, work, on_done, image=None):
+        """
+        Chạy work() trong luồng nền, on_done(result) chạy trên luồng UI
+        
+        Một yêu cầu mới hủy yêu cầu đang chờ. Nếu truyền image (ảnh đầu vào),
+        kết quả bị bỏ qua khi ảnh đang xử lý đã thay đổi trong lúc chạy.
+        """
+        def done(result):
+            if image is not None and self.processed_image is not image:
+                return
+            on_done(result)
+        
+        self.jobs.submit(name, work, done, on_error=self.show_job_error)
+    
+    def apply_operation(self, status_text, operation):
+        """Áp dụng operation(image) lên ảnh đang xử lý (trong luồng nền)"""
+        if self.processed_image is None:
+            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
+            return
+        
+        image = self.processed_image
+        
+        def done(result):
+            self.processed_image = result
+            self.display_image(result)
+            self.status_label.config(text=status_text)
+        
+        self.run_job(status_text, lambda: operation(image), done, image)
+    
+    def show_job_progress(self, running):
+        """Cập nhật thanh trạng thái theo các job đang chạy"""
+        if running:
+            job = running[-1]
+            self.status_label.config(text=f"⏳ Đang xử lý: {job.name} ({job.elapsed:.1f}s)")
+            if not self.progress_bar.winfo_manager():
+                self.progress_bar.pack(side=tk.RIGHT, padx=5, before=self.status_label)
+                self.progress_bar.start(10)
+        elif self.progress_bar.winfo_manager():
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+    
+    def show_job_error(self, error):
+        """Báo lỗi của job nền"""
+        self.status_label.config(text="Lỗi")
+        messagebox.showerror("Lỗi", str(error))
+    
+    def on_close(self):
+        """Dừng các job nền rồi đóng cửa sổ"""
+        self.jobs.shutdown()
+        self.root.destroy()
+    
     # ===== Bài 1-3 Methods =====
     
     def convert_grayscale(self):
@@ -692,59 +760,23 @@ class ComprehensiveImageApp:
     
     def contrast_stretching(self):
         """Kéo dãn tương phản tuyến tính"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = ImageProcessor.contrast_stretching(self.processed_image)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="Đã kéo dãn tương phản tuyến tính")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Đã kéo dãn tương phản tuyến tính",
+                             ImageProcessor.contrast_stretching)
     
     def contrast_clipping_t1(self):
         """Type 1 clipping"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = ImageProcessor.contrast_clipping_type1(self.processed_image, 50, 200)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="Type 1 Clipping [50, 200]")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Type 1 Clipping [50, 200]",
+                             lambda image: ImageProcessor.contrast_clipping_type1(image, 50, 200))
     
     def contrast_clipping_t2(self):
         """Type 2 clipping"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = ImageProcessor.contrast_clipping_type2(self.processed_image)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="Type 2 Region-based Clipping")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Type 2 Region-based Clipping",
+                             ImageProcessor.contrast_clipping_type2)
     
     def histogram_equalization(self):
         """Cân bằng histogram"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result, _ = ImageProcessor.histogram_equalization(self.processed_image)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="Cân bằng Histogram")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Cân bằng Histogram",
+                             lambda image: ImageProcessor.histogram_equalization(image)[0])
     
     def show_histogram(self):
         """Hiển thị histogram"""
@@ -789,182 +821,74 @@ class ComprehensiveImageApp:
     
     def histogram_matching(self):
         """Histogram matching"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
+        def match(image):
             # Gaussian reference
             x = np.arange(256)
             ref_hist = np.exp(-((x - 128) ** 2) / (2 * 50 ** 2))
-            ref_hist = (ref_hist / ref_hist.sum() * self.processed_image.size).astype(np.uint64)
-            
-            result = ImageProcessor.histogram_matching(self.processed_image, ref_hist)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="Histogram Matching (Gaussian)")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+            ref_hist = (ref_hist / ref_hist.sum() * image.size).astype(np.uint64)
+            return ImageProcessor.histogram_matching(image, ref_hist)
+        
+        self.apply_operation("Histogram Matching (Gaussian)", match)
     
     def adaptive_equalization(self):
         """CLAHE"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = ImageProcessor.adaptive_histogram_equalization(self.processed_image)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="Adaptive Equalization (CLAHE)")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Adaptive Equalization (CLAHE)",
+                             ImageProcessor.adaptive_histogram_equalization)
     
     # ===== Bài 7-9 Methods =====
     
     def add_noise(self):
         """Thêm nhiễu"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = ImageProcessor.add_salt_pepper_noise(self.processed_image)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="Đã thêm nhiễu salt & pepper")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Đã thêm nhiễu salt & pepper",
+                             ImageProcessor.add_salt_pepper_noise)
     
     def average_filter(self, size):
         """Average filter"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = ImageProcessor.average_filter(self.processed_image, size)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text=f"Average Filter {size}x{size}")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation(f"Average Filter {size}x{size}",
+                             lambda image: ImageProcessor.average_filter(image, size))
     
     def median_filter(self, size):
         """Median filter"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = ImageProcessor.median_filter(self.processed_image, size)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text=f"Median Filter {size}x{size}")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation(f"Median Filter {size}x{size}",
+                             lambda image: ImageProcessor.median_filter(image, size))
     
     def sobel_edge(self):
         """Sobel"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            magnitude, _, _ = ImageProcessor.sobel_edge_detection(self.processed_image)
-            self.processed_image = magnitude
-            self.display_image(magnitude)
-            self.status_label.config(text="Sobel Edge Detection")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Sobel Edge Detection",
+                             lambda image: ImageProcessor.sobel_edge_detection(image)[0])
     
     def prewitt_edge(self):
         """Prewitt"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            magnitude, _, _ = ImageProcessor.prewitt_edge_detection(self.processed_image)
-            self.processed_image = magnitude
-            self.display_image(magnitude)
-            self.status_label.config(text="Prewitt Edge Detection")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Prewitt Edge Detection",
+                             lambda image: ImageProcessor.prewitt_edge_detection(image)[0])
     
     def roberts_edge(self):
         """Roberts"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            magnitude, _, _ = ImageProcessor.roberts_edge_detection(self.processed_image)
-            self.processed_image = magnitude
-            self.display_image(magnitude)
-            self.status_label.config(text="Roberts Edge Detection")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Roberts Edge Detection",
+                             lambda image: ImageProcessor.roberts_edge_detection(image)[0])
     
     def kirsch_edge(self):
         """Kirsch"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            magnitude = ImageProcessor.kirsch_edge_detection(self.processed_image)
-            self.processed_image = magnitude
-            self.display_image(magnitude)
-            self.status_label.config(text="Kirsch Edge Detection")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Kirsch Edge Detection",
+                             ImageProcessor.kirsch_edge_detection)
     
     def laplacian(self, neighbors):
         """Laplacian"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            if neighbors == 4:
-                result = ImageProcessor.laplacian_4_neighbor(self.processed_image)
-            else:
-                result = ImageProcessor.laplacian_8_neighbor(self.processed_image)
-            
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text=f"Laplacian {neighbors}-neighbor")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        if neighbors == 4:
+            operation = ImageProcessor.laplacian_4_neighbor
+        else:
+            operation = ImageProcessor.laplacian_8_neighbor
+        self.apply_operation(f"Laplacian {neighbors}-neighbor", operation)
     
     def log_edge(self):
         """LoG"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = ImageProcessor.laplacian_of_gaussian(self.processed_image)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="Laplacian of Gaussian (LoG)")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Laplacian of Gaussian (LoG)",
+                             ImageProcessor.laplacian_of_gaussian)
     
     def sharpen(self, method):
         """Sharpen"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = ImageProcessor.sharpen_image(self.processed_image, method)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text=f"Sharpen ({method})")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation(f"Sharpen ({method})",
+                             lambda image: ImageProcessor.sharpen_image(image, method))
     
     # ===== Bài 10-11 Methods =====
     
@@ -974,15 +898,20 @@ class ComprehensiveImageApp:
             messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
             return
         
-        try:
-            magnitude, phase = ImageProcessor.fourier_transform(self.processed_image)
+        image = self.processed_image
+        
+        def work():
+            magnitude, phase = ImageProcessor.fourier_transform(image)
+            return magnitude, phase, ImageProcessor.get_magnitude_spectrum_display(magnitude)
+        
+        def done(result):
+            magnitude, phase, magnitude_display = result
             
             # Store for inverse
             self.fft_magnitude = magnitude
             self.fft_phase = phase
             
             # Display magnitude spectrum
-            magnitude_display = ImageProcessor.get_magnitude_spectrum_display(magnitude)
             self.display_image(magnitude_display)
             
             self.info_text.delete(1.0, tk.END)
@@ -995,8 +924,8 @@ class ComprehensiveImageApp:
             self.display_notebook.select(1)
             
             self.status_label.config(text="FFT Magnitude Spectrum")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        
+        self.run_job("FFT Magnitude Spectrum", work, done, image)
     
     def inverse_fft(self):
         """Inverse FFT"""
@@ -1004,13 +933,15 @@ class ComprehensiveImageApp:
             messagebox.showwarning("Cảnh báo", "Chưa có FFT! Hãy chạy FFT trước.")
             return
         
-        try:
-            result = ImageProcessor.inverse_fourier_transform(self.fft_magnitude, self.fft_phase)
+        magnitude, phase = self.fft_magnitude, self.fft_phase
+        
+        def done(result):
             self.processed_image = result
             self.display_image(result)
             self.status_label.config(text="Inverse FFT (Reconstructed)")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        
+        self.run_job("Inverse FFT",
+                     lambda: ImageProcessor.inverse_fourier_transform(magnitude, phase), done)
     
     def update_cutoff_label(self, *args):
         """Cập nhật label cutoff"""
@@ -1019,18 +950,9 @@ class ComprehensiveImageApp:
     
     def ideal_lowpass(self):
         """Ideal low-pass filter"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            cutoff = self.ideal_cutoff.get()
-            result = ImageProcessor.ideal_lowpass_filter(self.processed_image, cutoff)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text=f"Ideal Low-pass (cutoff={cutoff})")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        cutoff = self.ideal_cutoff.get()
+        self.apply_operation(f"Ideal Low-pass (cutoff={cutoff})",
+                             lambda image: ImageProcessor.ideal_lowpass_filter(image, cutoff))
     
     def update_sigma_label(self, *args):
         """Cập nhật label sigma"""
@@ -1039,18 +961,9 @@ class ComprehensiveImageApp:
     
     def gaussian_lowpass(self):
         """Gaussian low-pass filter"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            sigma = self.gaussian_sigma.get()
-            result = ImageProcessor.gaussian_lowpass_filter(self.processed_image, sigma)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text=f"Gaussian Low-pass (sigma={sigma:.1f})")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        sigma = self.gaussian_sigma.get()
+        self.apply_operation(f"Gaussian Low-pass (sigma={sigma:.1f})",
+                             lambda image: ImageProcessor.gaussian_lowpass_filter(image, sigma))
     
     # ===== Bài 12 Methods =====
     
@@ -1071,34 +984,16 @@ class ComprehensiveImageApp:
     
     def ideal_highpass(self):
         """Bài 12.1: Ideal high-pass filter"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            cutoff = self.ideal_hp_cutoff.get()
-            result = ImageProcessor.ideal_highpass_filter(self.processed_image, cutoff)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text=f"Ideal High-pass (D0={cutoff})")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        cutoff = self.ideal_hp_cutoff.get()
+        self.apply_operation(f"Ideal High-pass (D0={cutoff})",
+                             lambda image: ImageProcessor.ideal_highpass_filter(image, cutoff))
     
     def butterworth_highpass(self):
         """Bài 12.2: Butterworth high-pass filter"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            D0 = self.butter_hp_d0.get()
-            n = self.butter_hp_n.get()
-            result = ImageProcessor.butterworth_highpass_filter(self.processed_image, D0, n)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text=f"Butterworth High-pass (D0={D0}, n={n})")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        D0 = self.butter_hp_d0.get()
+        n = self.butter_hp_n.get()
+        self.apply_operation(f"Butterworth High-pass (D0={D0}, n={n})",
+                             lambda image: ImageProcessor.butterworth_highpass_filter(image, D0, n))
     
     # ===== Machine Learning Methods =====
     
@@ -1113,9 +1008,11 @@ class ComprehensiveImageApp:
             messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
             return
         
-        try:
-            k = self.kmeans_k.get()
-            result, centers = MLImageProcessor.kmeans_segmentation(self.processed_image, k)
+        k = self.kmeans_k.get()
+        image = self.processed_image
+        
+        def done(output):
+            result, centers = output
             self.processed_image = result
             self.display_image(result)
             
@@ -1130,8 +1027,9 @@ class ComprehensiveImageApp:
             self.display_notebook.select(1)
             
             self.status_label.config(text=f"K-Means Segmentation (K={k})")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        
+        self.run_job(f"K-Means (K={k})",
+                     lambda: MLImageProcessor.kmeans_segmentation(image, k), done, image)
     
     def otsu_threshold(self):
         """ML 2: Otsu automatic thresholding"""
@@ -1139,8 +1037,10 @@ class ComprehensiveImageApp:
             messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
             return
         
-        try:
-            result, threshold = MLImageProcessor.otsu_threshold(self.processed_image)
+        image = self.processed_image
+        
+        def done(output):
+            result, threshold = output
             self.processed_image = result
             self.display_image(result)
             
@@ -1155,36 +1055,16 @@ class ComprehensiveImageApp:
             self.display_notebook.select(1)
             
             self.status_label.config(text=f"Otsu Threshold = {threshold}")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        
+        self.run_job("Otsu Threshold", lambda: MLImageProcessor.otsu_threshold(image), done, image)
     
     def adaptive_threshold_ml(self):
         """ML 2.2: Adaptive thresholding"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = MLImageProcessor.adaptive_threshold_ml(self.processed_image)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="Adaptive Threshold (ML)")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("Adaptive Threshold (ML)", MLImageProcessor.adaptive_threshold_ml)
     
     def ml_edge_detection(self):
         """ML 3: ML-based edge detection"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = MLImageProcessor.detect_edges_ml(self.processed_image)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text="ML Edge Detection (Canny-like)")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation("ML Edge Detection (Canny-like)", MLImageProcessor.detect_edges_ml)
     
     def extract_features(self):
         """ML 4: Extract image features"""
@@ -1192,12 +1072,17 @@ class ComprehensiveImageApp:
             messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
             return
         
-        try:
+        image = self.processed_image
+        
+        def work():
             # Extract all feature types
-            hist_features = MLImageProcessor.extract_histogram_features(self.processed_image)
-            texture_features = MLImageProcessor.extract_texture_features(self.processed_image)
-            stat_features = MLImageProcessor.extract_statistical_features(self.processed_image)
-            combined = MLImageProcessor.extract_combined_features(self.processed_image)
+            return (MLImageProcessor.extract_histogram_features(image),
+                    MLImageProcessor.extract_texture_features(image),
+                    MLImageProcessor.extract_statistical_features(image),
+                    MLImageProcessor.extract_combined_features(image))
+        
+        def done(features):
+            hist_features, texture_features, stat_features, combined = features
             
             # Show info
             self.info_text.delete(1.0, tk.END)
@@ -1228,8 +1113,8 @@ class ComprehensiveImageApp:
             
             self.display_notebook.select(1)
             self.status_label.config(text="Extracted image features")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        
+        self.run_job("Feature extraction", work, done, image)
     
     def detect_objects(self):
         """ML 5: Simple object detection"""
@@ -1237,18 +1122,20 @@ class ComprehensiveImageApp:
             messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
             return
         
-        try:
+        image = self.processed_image
+        
+        def work():
             # First apply Otsu to get binary image
-            binary, threshold = MLImageProcessor.otsu_threshold(self.processed_image)
+            binary, threshold = MLImageProcessor.otsu_threshold(image)
             
             # Detect objects
             labels, objects = MLImageProcessor.simple_object_detection(binary, min_area=50)
             
             # Create visualization
-            if len(self.processed_image.shape) == 2:
-                vis = cv2.cvtColor(self.processed_image, cv2.COLOR_GRAY2BGR)
+            if len(image.shape) == 2:
+                vis = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
             else:
-                vis = self.processed_image.copy()
+                vis = image.copy()
             
             # Draw bounding boxes
             for obj in objects:
@@ -1258,7 +1145,10 @@ class ComprehensiveImageApp:
                 
                 cv2.rectangle(vis, (x, y), (x+w, y+h), (0, 255, 0), 2)
                 cv2.circle(vis, (cx, cy), 3, (255, 0, 0), -1)
-            
+            return vis, threshold, objects
+        
+        def done(output):
+            vis, threshold, objects = output
             self.display_image(vis)
             
             # Show info
@@ -1276,22 +1166,13 @@ class ComprehensiveImageApp:
             
             self.display_notebook.select(1)
             self.status_label.config(text=f"Detected {len(objects)} objects")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        
+        self.run_job("Object detection", work, done, image)
     
     def morphological_op(self, operation: str):
         """ML 6: Morphological operations"""
-        if self.processed_image is None:
-            messagebox.showwarning("Cảnh báo", "Chưa có ảnh!")
-            return
-        
-        try:
-            result = MLImageProcessor.morphological_operations(self.processed_image, operation)
-            self.processed_image = result
-            self.display_image(result)
-            self.status_label.config(text=f"Morphology: {operation}")
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e))
+        self.apply_operation(f"Morphology: {operation}",
+                             lambda image: MLImageProcessor.morphological_operations(image, operation))
 
 
 def main():
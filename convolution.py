@@ -0,0 +1,468 @@
+"""
+Convolution Engine
+Vectorized 2D convolution used by ImageProcessor (Bài 7-9) and
+MLImageProcessor:
+- Direct convolution by accumulating shifted slices of the padded image
+- Separable (rank-1) kernels applied as two 1D passes
+- Integral-image (summed-area table) box filters
+- FFT-based convolution for large kernels
+- A planner that picks the cheapest of the above per call, using a cost
+  model calibrated once per process
+
+convolve2d_direct applies the kernel without flipping, exactly like the
+original per-pixel loop in ImageProcessor.convolution2d. convolve() can
+also reproduce scipy.ndimage.convolve semantics (flip=True, 'reflect').
+"""
+
+import time
+import numpy as np
+from scipy import ndimage, signal
+from scipy.fft import next_fast_len
+from typing import Dict, Optional, Tuple
+
+
+# Working-set budget (bytes) for one horizontal strip of the image.
+# Keeps the accumulators of the direct engine inside the CPU cache.
+STRIP_BYTES = 4 * 1024 * 1024
+
+# numpy's pairwise summation block size (see PW_BLOCKSIZE in numpy's
+# loops_utils.h). Needed to add kernel terms in the same order as np.sum.
+_PW_BLOCKSIZE = 128
+
+# Boundary modes (scipy.ndimage names) and their np.pad equivalents
+_PAD_MODES = {
+    'nearest': 'edge',       # a a a | a b c d | d d d
+    'reflect': 'symmetric',  # c b a | a b c d | d c b
+}
+
+METHODS = ('direct', 'separable', 'integral', 'fft')
+
+
+def pad_image(image: np.ndarray, kernel_shape: Tuple[int, int],
+              mode: str = 'nearest', flip: bool = False) -> np.ndarray:
+    """
+    Pad an image so that every output pixel has a full kernel window
+
+    Args:
+        image: Input image (H, W) or (H, W, C)
+        kernel_shape: (kernel_height, kernel_width)
+        mode: Boundary mode, 'nearest' or 'reflect'
+        flip: True for true convolution (scipy.ndimage.convolve anchor)
+
+    Returns:
+        Padded image; window (i, j) starts at padded[i, j]
+    """
+    if mode not in _PAD_MODES:
+        raise ValueError(f"Unknown boundary mode: {mode}")
+
+    pad = []
+    for k in kernel_shape:
+        before = (k - 1) - k // 2 if flip else k // 2
+        pad.append((before, k - 1 - before))
+    pad += [(0, 0)] * (image.ndim - 2)
+    return np.pad(image, pad, mode=_PAD_MODES[mode])
+
+
+def pad_edge(image: np.ndarray, kernel_shape: Tuple[int, int]) -> np.ndarray:
+    """Edge-pad an image for convolution2d-style (unflipped) windows"""
+    return pad_image(image, kernel_shape, mode='nearest')
+
+
+def _strip_rows(width: int, itemsize: int, n_buffers: int) -> int:
+    """Number of output rows per strip for the given buffer count"""
+    return max(1, STRIP_BYTES // max(1, width * itemsize * n_buffers))
+
+
+def _pairwise_window_sum(padded: np.ndarray, kernel: np.ndarray,
+                         row0: int, rows: int, width: int,
+                         dtype: np.dtype) -> np.ndarray:
+    """
+    Sum of window * kernel for a strip of output rows, adding the kernel
+    terms in the same order as numpy's pairwise np.sum over a flattened
+    window. This keeps results bit-identical to np.sum(region * kernel).
+    """
+    kw = kernel.shape[1]
+    flat = kernel.ravel()
+    scratch = np.empty((rows, width) + padded.shape[2:], dtype=dtype)
+
+    def term(idx, out=None):
+        di, dj = divmod(idx, kw)
+        window = padded[row0 + di:row0 + di + rows, dj:dj + width]
+        return np.multiply(window, flat[idx], out=out, dtype=dtype)
+
+    def accumulate(acc, idx):
+        np.add(acc, term(idx, scratch), out=acc)
+
+    def pairwise(start, n):
+        if n < 8:
+            acc = term(start)
+            for idx in range(start + 1, start + n):
+                accumulate(acc, idx)
+            return acc
+        if n <= _PW_BLOCKSIZE:
+            r = [term(start + j) for j in range(8)]
+            i = 8
+            while i < n - (n % 8):
+                for j in range(8):
+                    accumulate(r[j], start + i + j)
+                i += 8
+            r[0] += r[1]
+            r[2] += r[3]
+            r[0] += r[2]
+            r[4] += r[5]
+            r[6] += r[7]
+            r[4] += r[6]
+            r[0] += r[4]
+            for idx in range(start + i, start + n):
+                accumulate(r[0], idx)
+            return r[0]
+        n2 = n // 2
+        n2 -= n2 % 8
+        left = pairwise(start, n2)
+        left += pairwise(start + n2, n - n2)
+        return left
+
+    return pairwise(0, flat.size)
+
+
+def convolve2d_direct(image: np.ndarray, kernel: np.ndarray,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Direct 2D convolution with edge padding (float result)
+
+    Output is bit-identical to summing region * kernel with np.sum for
+    every pixel, but runs as whole-strip array operations.
+
+    Args:
+        image: Input image (H, W) or (H, W, C)
+        kernel: 2D kernel of any (kh, kw) shape
+        out: Optional float64 output array of the image shape
+
+    Returns:
+        Float64 convolved image (not clipped)
+    """
+    kernel = np.asarray(kernel)
+    if kernel.ndim != 2:
+        raise ValueError(f"Kernel must be 2D, got shape {kernel.shape}")
+
+    padded = pad_edge(image, kernel.shape)
+    dtype = np.result_type(image.dtype, kernel.dtype)
+    if out is None:
+        out = np.empty(image.shape, dtype=np.float64)
+
+    rows, width = image.shape[0], image.shape[1]
+    # Up to 8 pairwise accumulators plus one scratch buffer
+    n_buffers = 9 * int(np.prod(image.shape[2:], dtype=np.int64))
+    step = _strip_rows(width, dtype.itemsize, n_buffers)
+    for row0 in range(0, rows, step):
+        h = min(step, rows - row0)
+        out[row0:row0 + h] = _pairwise_window_sum(padded, kernel, row0, h,
+                                                  width, dtype)
+    return out
+
+
+def _separable_valid(padded: np.ndarray, column: np.ndarray,
+                     row: np.ndarray, shape: Tuple[int, ...],
+                     out: np.ndarray) -> np.ndarray:
+    """Two-pass window sums over an already padded image"""
+    rows, width = shape[0], shape[1]
+
+    # Horizontal pass over all padded rows
+    horizontal = np.zeros((padded.shape[0], width) + padded.shape[2:],
+                          dtype=np.float64)
+    scratch = np.empty_like(horizontal)
+    for dj, weight in enumerate(row):
+        np.multiply(padded[:, dj:dj + width], weight, out=scratch)
+        horizontal += scratch
+
+    # Vertical pass
+    out[...] = 0
+    scratch = scratch[:rows]
+    for di, weight in enumerate(column):
+        np.multiply(horizontal[di:di + rows], weight, out=scratch)
+        out += scratch
+    return out
+
+
+def convolve2d_separable(image: np.ndarray, column: np.ndarray,
+                         row: np.ndarray,
+                         out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Separable 2D convolution with edge padding (float result)
+
+    Equivalent to convolve2d_direct(image, np.outer(column, row)) up to
+    floating point rounding, at O(kh + kw) instead of O(kh * kw) per pixel.
+
+    Args:
+        image: Input image (H, W) or (H, W, C)
+        column: Vertical 1D kernel (length kh)
+        row: Horizontal 1D kernel (length kw)
+        out: Optional float64 output array of the image shape
+
+    Returns:
+        Float64 convolved image (not clipped)
+    """
+    column = np.asarray(column, dtype=np.float64).ravel()
+    row = np.asarray(row, dtype=np.float64).ravel()
+    padded = pad_edge(image, (column.size, row.size))
+    if out is None:
+        out = np.empty(image.shape, dtype=np.float64)
+    return _separable_valid(padded, column, row, image.shape, out)
+
+
+def _box_valid(padded: np.ndarray, value: float,
+               kernel_shape: Tuple[int, int], shape: Tuple[int, int],
+               out: np.ndarray) -> np.ndarray:
+    """Constant-kernel window sums from a summed-area table"""
+    kh, kw = kernel_shape
+    rows, width = shape
+    # Integer images get an exact int64 table
+    acc = np.int64 if np.issubdtype(padded.dtype, np.integer) else np.float64
+    table = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=acc)
+    np.cumsum(padded, axis=0, dtype=acc, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+
+    window = (table[kh:kh + rows, kw:kw + width]
+              - table[:rows, kw:kw + width]
+              - table[kh:kh + rows, :width]
+              + table[:rows, :width])
+    np.multiply(window, value, out=out)
+    return out
+
+
+def _fft_valid(padded: np.ndarray, kernel: np.ndarray,
+               out: np.ndarray) -> np.ndarray:
+    """Correlation over an already padded image via FFT"""
+    flipped = kernel[::-1, ::-1].astype(np.float64)
+    out[...] = signal.fftconvolve(padded.astype(np.float64), flipped,
+                                  mode='valid')
+    return out
+
+
+def _kernel_properties(kernel: np.ndarray) -> Dict[str, object]:
+    """Structure of a kernel that the planner can exploit"""
+    flat = kernel.ravel()
+    return {
+        'box': bool(np.all(flat == flat[0])),
+        'factors': separable_factors(kernel) if min(kernel.shape) > 1 else None,
+    }
+
+
+def separable_factors(kernel: np.ndarray,
+                      rtol: float = 1e-10) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Split a rank-1 kernel into (column, row) 1D factors
+
+    Args:
+        kernel: 2D kernel
+        rtol: Relative tolerance for the reconstruction error
+
+    Returns:
+        (column, row) with np.outer(column, row) == kernel, or None if the
+        kernel is not separable
+    """
+    kernel = np.asarray(kernel, dtype=np.float64)
+    if kernel.ndim != 2:
+        return None
+
+    u, s, vt = np.linalg.svd(kernel)
+    column = u[:, 0] * np.sqrt(s[0])
+    row = vt[0] * np.sqrt(s[0])
+    scale = max(np.abs(kernel).max(), 1e-300)
+    if np.abs(np.outer(column, row) - kernel).max() > rtol * scale:
+        return None
+    return column, row
+
+
+# ===== Planner =====
+
+# Seconds per output pixel: base + per_tap * taps, filled by calibrate().
+# 'direct' is the strip engine, 'ndimage' the scipy direct path.
+_cost_model: Optional[Dict[str, Tuple[float, float]]] = None
+
+
+def _taps(method: str, kernel_shape: Tuple[int, int],
+          padded_area: int) -> float:
+    """Work units per pixel used by the cost model"""
+    kh, kw = kernel_shape
+    if method in ('direct', 'ndimage'):
+        return kh * kw
+    if method == 'separable':
+        return kh + kw
+    if method == 'integral':
+        return 1
+    return np.log2(max(padded_area, 2))
+
+
+def _fft_area(image_shape: Tuple[int, ...],
+              kernel_shape: Tuple[int, int]) -> int:
+    """Transform size used by fftconvolve on the padded image"""
+    return int(np.prod([next_fast_len(n + 2 * (k - 1))
+                        for n, k in zip(image_shape[:2], kernel_shape)]))
+
+
+def _best_time(func, repeats: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(size: int = 192) -> Dict[str, Tuple[float, float]]:
+    """
+    Measure each convolution method on a small image and fit the planner's
+    cost model (runs automatically before the first planned call)
+
+    Args:
+        size: Side of the square calibration image
+
+    Returns:
+        Dict method -> (base seconds per pixel, seconds per tap)
+    """
+    global _cost_model
+
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (size, size)).astype(np.float64)
+    pixels = image.size
+    model = {}
+
+    for method in ('direct', 'ndimage', 'separable', 'integral', 'fft'):
+        points = []
+        for k in (3, 9):
+            kernel = np.full((k, k), 1.0 / (k * k))
+            padded = pad_image(image, kernel.shape)
+            out = np.empty(image.shape)
+            if method == 'direct':
+                run = lambda: convolve2d_direct(image, kernel, out)
+            elif method == 'ndimage':
+                run = lambda: ndimage.correlate(image, kernel, output=out,
+                                                mode='nearest')
+            elif method == 'separable':
+                col = row = np.full(k, 1.0 / k)
+                run = lambda: _separable_valid(padded, col, row,
+                                               image.shape, out)
+            elif method == 'integral':
+                run = lambda: _box_valid(padded, kernel[0, 0], kernel.shape,
+                                         image.shape, out)
+            else:
+                run = lambda: _fft_valid(padded, kernel, out)
+            seconds = _best_time(run)
+            if method == 'fft':
+                # Cost per transformed pixel, per log2 of transform size
+                area = _fft_area(image.shape, kernel.shape)
+                points.append((np.log2(area), seconds / area))
+            else:
+                points.append((_taps(method, kernel.shape, 0), seconds / pixels))
+
+        (t0, c0), (t1, c1) = points
+        if method == 'fft':
+            model[method] = (0.0, float(c0 / t0 + c1 / t1) / 2)
+        elif t1 == t0:
+            model[method] = ((c0 + c1) / 2, 0.0)
+        else:
+            per_tap = max((c1 - c0) / (t1 - t0), 0.0)
+            model[method] = (max(c0 - per_tap * t0, 0.0), per_tap)
+
+    _cost_model = model
+    return model
+
+
+def estimate_cost(method: str, image_shape: Tuple[int, ...],
+                  kernel_shape: Tuple[int, int]) -> float:
+    """Estimated seconds for one convolution with the given method"""
+    if _cost_model is None:
+        calibrate()
+    base, per_tap = _cost_model[method]
+    if method == 'fft':
+        area = _fft_area(image_shape, kernel_shape)
+        return area * per_tap * _taps(method, kernel_shape, area)
+    pixels = int(np.prod(image_shape))
+    return pixels * (base + per_tap * _taps(method, kernel_shape, 0))
+
+
+def plan_convolution(image_shape: Tuple[int, ...], kernel: np.ndarray,
+                     mode: str = 'nearest', flip: bool = False,
+                     exact: bool = False) -> str:
+    """
+    Choose the cheapest convolution method for one call
+
+    Args:
+        image_shape: Shape of the input image
+        kernel: 2D kernel
+        mode: Boundary mode, 'nearest' or 'reflect'
+        flip: True for true convolution (scipy.ndimage.convolve)
+        exact: Only allow the direct method
+
+    Returns:
+        One of METHODS
+    """
+    kernel = np.asarray(kernel)
+    if exact or len(image_shape) != 2 or kernel.size <= 1:
+        return 'direct'
+
+    direct_engine = 'direct' if (mode == 'nearest' and not flip) else 'ndimage'
+    props = _kernel_properties(kernel)
+    candidates = {'direct': direct_engine, 'fft': 'fft'}
+    if props['factors'] is not None:
+        candidates['separable'] = 'separable'
+    if props['box']:
+        candidates['integral'] = 'integral'
+
+    costs = {name: estimate_cost(model, image_shape, kernel.shape)
+             for name, model in candidates.items()}
+    return min(costs, key=costs.get)
+
+
+def convolve(image: np.ndarray, kernel: np.ndarray, mode: str = 'nearest',
+             flip: bool = False, method: str = 'auto') -> np.ndarray:
+    """
+    Planned 2D convolution (float result)
+
+    With mode='nearest', flip=False this matches
+    ImageProcessor.convolution2d before clipping; with mode='reflect',
+    flip=True it matches scipy.ndimage.convolve. Methods other than
+    'direct' agree with it up to floating point rounding.
+
+    Args:
+        image: Input image
+        kernel: 2D kernel
+        mode: Boundary mode, 'nearest' or 'reflect'
+        flip: True for true convolution (scipy.ndimage.convolve)
+        method: 'auto' (planner), or one of METHODS
+
+    Returns:
+        Float64 convolved image
+    """
+    kernel = np.asarray(kernel)
+    if method == 'auto':
+        method = plan_convolution(image.shape, kernel, mode, flip)
+    elif method not in METHODS:
+        raise ValueError(f"Unknown convolution method: {method}")
+
+    if method == 'direct':
+        if mode == 'nearest' and not flip:
+            return convolve2d_direct(image, kernel)
+        run = ndimage.convolve if flip else ndimage.correlate
+        return run(image.astype(np.float64, copy=False), kernel, mode=mode)
+
+    if image.ndim != 2:
+        raise ValueError(f"Method '{method}' requires a 2D image")
+
+    out = np.empty(image.shape, dtype=np.float64)
+    padded = pad_image(image, kernel.shape, mode, flip)
+    window = kernel[::-1, ::-1] if flip else kernel
+
+    if method == 'separable':
+        factors = separable_factors(window)
+        if factors is None:
+            raise ValueError("Kernel is not separable")
+        return _separable_valid(padded, factors[0], factors[1],
+                                image.shape, out)
+    if method == 'integral':
+        if not np.all(kernel == kernel.flat[0]):
+            raise ValueError("Integral image method requires a constant kernel")
+        return _box_valid(padded, float(kernel.flat[0]), kernel.shape,
+                          image.shape, out)
+    return _fft_valid(padded, window, out)
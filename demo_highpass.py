@@ -6,7 +6,7 @@ This script generates comparison images showing the effects of both filters
 import numpy as np
 import cv2
 import matplotlib.pyplot as plt
-from image_processing import ImageProcessor
+from frequency_domain import FrequencyDomainSession
 import os
 
 
@@ -35,17 +35,20 @@ def demo_highpass_filters():
     print(f"Test image shape: {test_image.shape}")
     print(f"Test image range: [{test_image.min()}, {test_image.max()}]\n")
     
+    # One forward FFT shared by all six filters below
+    session = FrequencyDomainSession(test_image)
+    
     # Apply filters with different parameters
     print("Applying Ideal High-pass Filter with different cutoff values...")
-    ideal_d0_10 = ImageProcessor.ideal_highpass_filter(test_image, 10)
-    ideal_d0_30 = ImageProcessor.ideal_highpass_filter(test_image, 30)
-    ideal_d0_50 = ImageProcessor.ideal_highpass_filter(test_image, 50)
+    ideal_d0_10 = session.ideal_highpass(10)
+    ideal_d0_30 = session.ideal_highpass(30)
+    ideal_d0_50 = session.ideal_highpass(50)
     print("✓ Ideal filters applied\n")
     
     print("Applying Butterworth High-pass Filter with different parameters...")
-    butter_n1 = ImageProcessor.butterworth_highpass_filter(test_image, 30, 1)
-    butter_n2 = ImageProcessor.butterworth_highpass_filter(test_image, 30, 2)
-    butter_n5 = ImageProcessor.butterworth_highpass_filter(test_image, 30, 5)
+    butter_n1 = session.butterworth_highpass(30, 1)
+    butter_n2 = session.butterworth_highpass(30, 2)
+    butter_n5 = session.butterworth_highpass(30, 5)
     print("✓ Butterworth filters applied\n")
     
     # Create comparison figure 1: Ideal High-pass with different cutoffs
@@ -0,0 +1,235 @@
+"""
+Batch Feature Extraction
+Runs the MLImageProcessor feature extractors (ML 2) over many images:
+- Process pool with chunked task dispatch and a bounded number of chunks
+  in flight
+- Results collected into one contiguous float32 matrix (row i = input i)
+- Optional on-disk FeatureStore: memory-mapped features.npy plus an index
+  file, resumable after an interruption; the index records the extractor
+  and its parameters, so a store is never resumed with different features
+
+Used to build KNN training sets (see neighbors.KNNIndex).
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import numpy as np
+import cv2
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from ml_processing import MLImageProcessor
+
+
+EXTRACTORS = {
+    'combined': MLImageProcessor.extract_combined_features,
+    'histogram': MLImageProcessor.extract_histogram_features,
+    'texture': MLImageProcessor.extract_texture_features,
+    'statistical': MLImageProcessor.extract_statistical_features,
+}
+
+
+def _load(item: Union[str, np.ndarray]) -> np.ndarray:
+    if isinstance(item, (str, os.PathLike)):
+        image = cv2.imread(os.fspath(item), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError(f"Cannot read image: {item}")
+        return image
+    return np.asarray(item)
+
+
+def _extractor_params(extractor: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Extractor keyword arguments with its defaults filled in, as stored in index.json"""
+    signature = inspect.signature(EXTRACTORS[extractor])
+    bound = signature.bind_partial(None, **(params or {}))
+    bound.apply_defaults()
+    arguments = dict(bound.arguments)
+    arguments.pop(next(iter(signature.parameters)))  # The image
+    # As read back from JSON (tuples become lists)
+    return json.loads(json.dumps(arguments))
+
+
+def _extract_chunk(extractor: str, params: Dict[str, Any], start: int,
+                   items: Sequence[Union[str, np.ndarray]]):
+    """Worker: features of consecutive inputs as a (len(items), D) block"""
+    extract = EXTRACTORS[extractor]
+    return start, np.stack([extract(_load(item), **params)
+                            for item in items]).astype(np.float32)
+
+
+class FeatureStore:
+    """
+    Feature matrix on disk: <directory>/features.npy (memory-mapped),
+    index.json (one key per row: the file path, or
+    'array:<dtype><shape>:<digest>' of an array's content, plus the
+    extractor name and parameters) and done.log (row ranges already
+    written, appended after each flush)
+    """
+
+    def __init__(self, directory: str, features: np.ndarray, keys: List[str],
+                 done: np.ndarray, extractor: Optional[str] = None,
+                 params: Optional[Dict[str, Any]] = None):
+        self.directory = directory
+        self.features = features
+        self.keys = keys
+        self.done = done
+        self.extractor = extractor
+        self.params = params
+
+    @staticmethod
+    def create(directory: str, keys: List[str], n_features: int,
+               extractor: str, params: Dict[str, Any]) -> 'FeatureStore':
+        """Create an empty store with one row per key"""
+        os.makedirs(directory, exist_ok=True)
+        features = np.lib.format.open_memmap(os.path.join(directory, 'features.npy'),
+                                             mode='w+', dtype=np.float32,
+                                             shape=(len(keys), n_features))
+        with open(os.path.join(directory, 'index.json'), 'w') as f:
+            json.dump({'n_features': n_features, 'extractor': extractor,
+                       'params': params, 'keys': keys}, f)
+        open(os.path.join(directory, 'done.log'), 'w').close()
+        return FeatureStore(directory, features, keys, np.zeros(len(keys), dtype=bool),
+                            extractor, params)
+
+    @staticmethod
+    def open(directory: str, mode: str = 'r+', extractor: Optional[str] = None,
+             params: Optional[Dict[str, Any]] = None) -> 'FeatureStore':
+        """
+        Open an existing store
+
+        Args:
+            directory: Store directory
+            mode: 'r+', or 'r' for read-only features
+            extractor: If given, the extractor the store must have been
+                built with (ValueError otherwise)
+            params: If given, the extractor parameters it must have been
+                built with (as stored, i.e. with defaults filled in)
+        """
+        with open(os.path.join(directory, 'index.json')) as f:
+            index = json.load(f)
+        keys = index['keys']
+        if ((extractor is not None and index.get('extractor') != extractor)
+                or (params is not None and index.get('params') != params)):
+            raise ValueError(f"Feature store {directory} was built with extractor "
+                             f"{index.get('extractor')!r} {index.get('params')}, "
+                             f"not {extractor!r} {params}")
+        features = np.load(os.path.join(directory, 'features.npy'), mmap_mode=mode)
+        done = np.zeros(len(keys), dtype=bool)
+        with open(os.path.join(directory, 'done.log')) as f:
+            for line in f:
+                start, stop = map(int, line.split())
+                done[start:stop] = True
+        return FeatureStore(directory, features, keys, done,
+                            index.get('extractor'), index.get('params'))
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, 'index.json'))
+
+    def write(self, start: int, block: np.ndarray) -> None:
+        """Store rows start .. start + len(block) and record them as done"""
+        self.features[start:start + len(block)] = block
+        self.features.flush()
+        with open(os.path.join(self.directory, 'done.log'), 'a') as f:
+            f.write(f"{start} {start + len(block)}\n")
+        self.done[start:start + len(block)] = True
+
+
+def _array_key(array: np.ndarray) -> str:
+    """Store key of an array input: dtype, shape and a digest of its bytes"""
+    array = np.ascontiguousarray(array)
+    # blake2b rather than result_cache.content_hash: keys are saved in
+    # index.json and must not change with whether xxhash is installed
+    digest = hashlib.blake2b(array.reshape(-1).view(np.uint8), digest_size=16).hexdigest()
+    return f"array:{array.dtype.str}{array.shape}:{digest}"
+
+
+def _keys(items: Sequence[Union[str, np.ndarray]]) -> List[str]:
+    return [os.fspath(item) if isinstance(item, (str, os.PathLike))
+            else _array_key(np.asarray(item)) for item in items]
+
+
+def extract_features_batch(paths_or_arrays: Sequence[Union[str, np.ndarray]],
+                           n_jobs: Optional[int] = None, extractor: str = 'combined',
+                           chunk_size: int = 32,
+                           store: Optional[str] = None,
+                           extractor_params: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """
+    Feature vectors of many images, computed in parallel
+
+    Args:
+        paths_or_arrays: Image file paths (read as grayscale) and/or arrays
+        n_jobs: Worker processes (None = all CPUs, 1 = in this process)
+        extractor: 'combined', 'histogram', 'texture' or 'statistical'
+        chunk_size: Images per task sent to a worker
+        store: Directory of a FeatureStore. Rows already written there by an
+            earlier (interrupted) run with the same inputs, extractor and
+            parameters are skipped; a store built differently is an error.
+        extractor_params: Keyword arguments of the extractor (e.g.
+            {'bins': 64} for 'histogram')
+
+    Returns:
+        (n_images, n_features) float32 matrix; a read-only memmap of the
+        store's features.npy when store is given
+    """
+    if extractor not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor: {extractor}")
+    params = _extractor_params(extractor, extractor_params)
+    items = list(paths_or_arrays)
+    if not items:
+        return np.empty((0, 0), dtype=np.float32)
+    keys = _keys(items)
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    if store is not None and FeatureStore.exists(store):
+        target = FeatureStore.open(store, extractor=extractor, params=params)
+        if target.keys != keys:
+            raise ValueError(f"Feature store {store} was built from different inputs")
+        sink = target.write
+        pending = np.flatnonzero(~target.done)
+    else:
+        # The first image fixes the feature length
+        first = EXTRACTORS[extractor](_load(items[0]), **params).astype(np.float32)
+        n_features = len(first)
+        if store is not None:
+            target = FeatureStore.create(store, keys, n_features, extractor, params)
+            sink = target.write
+        else:
+            result = np.empty((len(items), n_features), dtype=np.float32)
+
+            def sink(start, block):
+                result[start:start + len(block)] = block
+        sink(0, first[np.newaxis])
+        pending = np.arange(1, len(items))
+
+    # Chunks of consecutive pending rows
+    chunks = []
+    for run in np.split(pending, np.flatnonzero(np.diff(pending) != 1) + 1):
+        for offset in range(0, len(run), chunk_size):
+            rows = run[offset:offset + chunk_size]
+            chunks.append((int(rows[0]), items[rows[0]:rows[-1] + 1]))
+
+    if n_jobs == 1:
+        for start, chunk in chunks:
+            sink(*_extract_chunk(extractor, params, start, chunk))
+    elif chunks:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            # Keep at most 2 chunks per worker in flight to bound memory
+            queue = iter(chunks)
+            running = set()
+            while True:
+                for start, chunk in queue:
+                    running.add(pool.submit(_extract_chunk, extractor, params, start, chunk))
+                    if len(running) >= 2 * n_jobs:
+                        break
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    sink(*future.result())
+
+    if store is not None:
+        return FeatureStore.open(store, mode='r').features
+    return result
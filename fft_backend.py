@@ -0,0 +1,311 @@
+"""
+FFT Backends
+Pluggable 2D FFT implementations for the Fourier code (Bài 10-12):
+- numpy: np.fft (always available)
+- scipy: scipy.fft with multi-threaded transforms (workers=-1)
+- pyfftw: FFTW through pyFFTW with cached plans (only if installed)
+
+The default selection 'default' takes the first available backend in
+PREFERENCE and never benchmarks. set_fft_backend('auto') opts in to
+benchmarking the available backends once per transform size (frame shape
+padded to an FFT-friendly size, transform kind) and then using the fastest.
+All backends return results that agree to floating point rounding.
+
+fast_shape gives FFT-friendly sizes, but only FrequencyDomainSession
+(pad_to_fast=True) pads to them: the ImageProcessor frequency filters
+transform the image at its own size, since masks sampled on a padded grid
+would change their results.
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import scipy.fft
+
+
+# In 'auto' mode, frames smaller than this (pixels) skip the benchmark and
+# use the first available backend in PREFERENCE; the timing noise would
+# dominate anyway.
+AUTO_MIN_PIXELS = 256 * 256
+
+# Order used by the 'default' selection (and when no benchmark result is
+# available). pyfftw is left out: planning a new shape costs more than a
+# small transform saves.
+PREFERENCE = ('scipy', 'numpy')
+
+
+class FFTBackend(ABC):
+    """Interface of a 2D FFT backend (transforms over the last two axes)"""
+
+    name = 'base'
+
+    @abstractmethod
+    def fft2(self, a: np.ndarray) -> np.ndarray:
+        """Complex 2D FFT"""
+
+    @abstractmethod
+    def ifft2(self, a: np.ndarray) -> np.ndarray:
+        """Inverse of fft2"""
+
+    @abstractmethod
+    def rfft2(self, a: np.ndarray) -> np.ndarray:
+        """Half-spectrum 2D FFT of real input"""
+
+    @abstractmethod
+    def irfft2(self, a: np.ndarray, s: Tuple[int, int]) -> np.ndarray:
+        """Inverse of rfft2 for an output of shape s"""
+
+
+class NumpyBackend(FFTBackend):
+    """np.fft, single-threaded"""
+
+    name = 'numpy'
+
+    def fft2(self, a):
+        return np.fft.fft2(a)
+
+    def ifft2(self, a):
+        return np.fft.ifft2(a)
+
+    def rfft2(self, a):
+        return np.fft.rfft2(a)
+
+    def irfft2(self, a, s):
+        return np.fft.irfft2(a, s=s)
+
+
+class ScipyBackend(FFTBackend):
+    """scipy.fft with a worker pool (-1 = all CPUs)"""
+
+    name = 'scipy'
+
+    def __init__(self, workers: int = -1):
+        self.workers = workers
+
+    def fft2(self, a):
+        return scipy.fft.fft2(a, workers=self.workers)
+
+    def ifft2(self, a):
+        return scipy.fft.ifft2(a, workers=self.workers)
+
+    def rfft2(self, a):
+        return scipy.fft.rfft2(a, workers=self.workers)
+
+    def irfft2(self, a, s):
+        return scipy.fft.irfft2(a, s=s, workers=self.workers)
+
+
+class PyFFTWBackend(FFTBackend):
+    """
+    FFTW via pyFFTW. Plans are built once per (transform, shape, dtype) and
+    reused; each call copies the input into the plan's aligned buffers.
+    """
+
+    name = 'pyfftw'
+
+    def __init__(self, threads: Optional[int] = None,
+                 planner_effort: str = 'FFTW_MEASURE'):
+        import pyfftw  # Optional dependency
+        self._pyfftw = pyfftw
+        self.threads = threads or os.cpu_count() or 1
+        self.planner_effort = planner_effort
+        self._plans: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _plan(self, kind: str, a: np.ndarray, s: Optional[tuple] = None):
+        key = (kind, a.shape, a.dtype.str, s)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is None:
+                builder = getattr(self._pyfftw.builders, kind)
+                template = self._pyfftw.empty_aligned(a.shape, dtype=a.dtype)
+                kwargs = {'s': s} if s is not None else {}
+                plan = builder(template, threads=self.threads,
+                               planner_effort=self.planner_effort, **kwargs)
+                self._plans[key] = plan
+            # Plans own their buffers: run and copy out under the lock
+            return plan(a).copy()
+
+    def _complex_input(self, a):
+        return a if np.iscomplexobj(a) else a.astype(np.complex128)
+
+    def fft2(self, a):
+        return self._plan('fft2', self._complex_input(a))
+
+    def ifft2(self, a):
+        return self._plan('ifft2', self._complex_input(a))
+
+    def rfft2(self, a):
+        if a.dtype not in (np.float32, np.float64):
+            a = a.astype(np.float64)
+        return self._plan('rfft2', a)
+
+    def irfft2(self, a, s):
+        return self._plan('irfft2', self._complex_input(a), tuple(s))
+
+
+_backends: Dict[str, FFTBackend] = {}
+_factories: Dict[str, Callable[[], FFTBackend]] = {}
+_selected = 'default'
+_fastest: Dict[tuple, str] = {}
+_registry_lock = threading.Lock()
+
+
+def register_fft_backend(name: str, factory: Callable[[], FFTBackend]) -> None:
+    """
+    Register a backend factory; it is instantiated on first use and skipped
+    if it raises ImportError (e.g. an optional library is missing)
+
+    Args:
+        name: Backend name
+        factory: Zero-argument callable returning an FFTBackend (an
+            FFTBackend subclass must implement every transform)
+
+    Raises:
+        TypeError: If factory is an FFTBackend subclass with unimplemented
+            (abstract) transforms
+    """
+    missing = getattr(factory, '__abstractmethods__', None)
+    if isinstance(factory, type) and missing:
+        raise TypeError(f"FFT backend '{name}' does not implement: "
+                        f"{', '.join(sorted(missing))}")
+    with _registry_lock:
+        _factories[name] = factory
+        _backends.pop(name, None)
+        _fastest.clear()
+
+
+register_fft_backend('numpy', NumpyBackend)
+register_fft_backend('scipy', ScipyBackend)
+register_fft_backend('pyfftw', PyFFTWBackend)
+
+
+def _instantiate(name: str) -> Optional[FFTBackend]:
+    with _registry_lock:
+        if name in _backends:
+            return _backends[name]
+        factory = _factories.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown FFT backend: {name}")
+    try:
+        backend = factory()
+    except ImportError:
+        return None
+    with _registry_lock:
+        _backends[name] = backend
+    return backend
+
+
+def available_fft_backends() -> List[str]:
+    """Names of registered backends whose dependencies are installed"""
+    return [name for name in list(_factories) if _instantiate(name) is not None]
+
+
+def set_fft_backend(name: str) -> None:
+    """
+    Select the FFT backend used by ImageProcessor
+
+    Args:
+        name: A registered backend name, 'default' (first available in
+            PREFERENCE) or 'auto' (benchmark once per transform size)
+    """
+    global _selected
+    if name not in ('default', 'auto') and _instantiate(name) is None:
+        raise ValueError(f"FFT backend '{name}' is not available")
+    _selected = name
+
+
+def benchmark_fft_backends(shape: Tuple[int, ...], real: bool = True,
+                           repeats: int = 3) -> Dict[str, float]:
+    """
+    Time a forward + inverse transform pair with every available backend
+
+    Args:
+        shape: Array shape to transform (last two axes)
+        real: Benchmark rfft2/irfft2 instead of fft2/ifft2
+        repeats: Runs per backend (best time is kept)
+
+    Returns:
+        Dict backend name -> seconds per forward + inverse pair
+    """
+    rng = np.random.default_rng(0)
+    data = rng.random(shape)
+    if not real:
+        data = data.astype(np.complex128)
+
+    timings = {}
+    for name in available_fft_backends():
+        backend = _instantiate(name)
+        best = float('inf')
+        for _ in range(repeats + 1):  # first run builds plans / warms caches
+            start = time.perf_counter()
+            if real:
+                backend.irfft2(backend.rfft2(data), s=shape[-2:])
+            else:
+                backend.ifft2(backend.fft2(data))
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def fastest_fft_backend(shape: Tuple[int, ...], real: bool = True) -> str:
+    """
+    Name of the fastest backend for transforms of the last two axes of shape
+
+    Benchmarked once per frame shape padded to fast_shape, so stacks of any
+    length and nearby awkward sizes share one measurement.
+    """
+    key = (fast_shape(shape[-2:], real), real)
+    name = _fastest.get(key)
+    if name is None:
+        timings = benchmark_fft_backends(key[0], real)
+        name = min(timings, key=timings.get)
+        _fastest[key] = name
+    return name
+
+
+def get_fft_backend(shape: Optional[Tuple[int, ...]] = None,
+                    real: bool = True) -> FFTBackend:
+    """
+    Backend to use for a transform of the given shape
+
+    Args:
+        shape: Array shape (only used by the 'auto' selection)
+        real: Whether the rfft2/irfft2 pair will be used
+
+    Returns:
+        FFTBackend instance
+    """
+    if _selected not in ('default', 'auto'):
+        return _instantiate(_selected)
+
+    if (_selected == 'auto' and shape is not None
+            and int(np.prod(shape[-2:])) >= AUTO_MIN_PIXELS):
+        return _instantiate(fastest_fft_backend(shape, real))
+    for name in PREFERENCE:
+        if name in _factories:
+            backend = _instantiate(name)
+            if backend is not None:
+                return backend
+    return _instantiate('numpy')
+
+
+def fast_shape(shape: Tuple[int, int], real: bool = True) -> Tuple[int, int]:
+    """
+    Smallest shape >= shape whose FFT is fast, e.g. (1021, 769) ->
+    (1024, 800) for real transforms (factors 2, 3, 5) or (1024, 770) for
+    complex ones (factors up to 11). Used by FrequencyDomainSession with
+    pad_to_fast=True; the ImageProcessor filters do not pad.
+
+    Args:
+        shape: (rows, cols)
+        real: Sizes for a real-input transform
+
+    Returns:
+        Padded (rows, cols)
+    """
+    return tuple(scipy.fft.next_fast_len(int(n), real=real) for n in shape)
@@ -0,0 +1,431 @@
+"""
+Frequency Domain Filtering Support
+Shared building blocks for the Fourier filters in ImageProcessor (Bài 10-12):
+- Filter masks: ideal/Gaussian low-pass, ideal/Butterworth high-pass
+- An LRU mask bank bounded by memory, with hit/miss counters
+- A real-input path (rfft2/irfft2 with half-plane masks) for real images
+- FrequencyDomainSession: one forward transform, any number of filters
+- Transforms run on the selected FFT backend (see fft_backend)
+- filter_stack: batched filtering of (N, H, W) stacks in bounded chunks
+
+Masks are stored pre-ifftshifted (zero frequency at [0, 0]), so they multiply
+the raw output of fft2 directly and the fftshift/ifftshift round trips of the
+textbook formulation are not needed. All masks here are radially symmetric,
+so the spectrum of a real image stays Hermitian after filtering and the
+half plane kept by rfft2 is enough.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from fft_backend import fast_shape, get_fft_backend
+
+
+FILTER_TYPES = (
+    'ideal_lowpass',
+    'gaussian_lowpass',
+    'ideal_highpass',
+    'butterworth_highpass',
+    'ideal_bandpass',
+)
+
+
+def build_centered_mask(filter_type: str, shape: Tuple[int, int],
+                        dtype=np.float64, **params) -> np.ndarray:
+    """
+    Build a filter mask with zero frequency at the center (fftshift layout)
+
+    Args:
+        filter_type: One of FILTER_TYPES
+        shape: (rows, cols) of the spectrum
+        dtype: Mask dtype
+        **params: cutoff (ideal filters), sigma (Gaussian), D0 and n
+            (Butterworth), low and high (band-pass radii)
+
+    Returns:
+        Mask of the given shape
+    """
+    rows, cols = shape
+    crow, ccol = rows // 2, cols // 2
+    y, x = np.ogrid[:rows, :cols]
+
+    if filter_type == 'ideal_lowpass':
+        mask = np.zeros((rows, cols), dtype=np.float64)
+        distance = np.sqrt((x - ccol)**2 + (y - crow)**2)
+        mask[distance <= params['cutoff']] = 1
+    elif filter_type == 'gaussian_lowpass':
+        distance_sq = (x - ccol)**2 + (y - crow)**2
+        mask = np.exp(-distance_sq / (2 * params['sigma']**2))
+    elif filter_type == 'ideal_highpass':
+        mask = np.ones((rows, cols), dtype=np.float64)
+        distance = np.sqrt((x - ccol)**2 + (y - crow)**2)
+        mask[distance <= params['cutoff']] = 0  # Block low frequencies
+    elif filter_type == 'butterworth_highpass':
+        distance = np.sqrt((x - ccol)**2 + (y - crow)**2)
+        # Avoid division by zero
+        mask = np.zeros((rows, cols), dtype=np.float64)
+        non_zero = distance > 0
+        mask[non_zero] = 1 / (1 + np.power(params['D0'] / distance[non_zero],
+                                           2 * params['n']))
+    elif filter_type == 'ideal_bandpass':
+        mask = np.zeros((rows, cols), dtype=np.float64)
+        distance = np.sqrt((x - ccol)**2 + (y - crow)**2)
+        mask[(distance >= params['low']) & (distance <= params['high'])] = 1
+    else:
+        raise ValueError(f"Unknown filter type: {filter_type}")
+
+    return mask.astype(dtype, copy=False)
+
+
+def build_mask(filter_type: str, shape: Tuple[int, int],
+               dtype=np.float64, half: bool = False, **params) -> np.ndarray:
+    """
+    Build a filter mask in fft2 layout (zero frequency at [0, 0])
+
+    Args:
+        filter_type: One of FILTER_TYPES
+        shape: (rows, cols) of the image
+        dtype: Mask dtype
+        half: Return only the rfft2 half plane (cols // 2 + 1 columns)
+        **params: Filter parameters, see build_centered_mask
+
+    Returns:
+        Mask that multiplies np.fft.fft2(image) (or rfft2 if half) directly
+    """
+    centered = build_centered_mask(filter_type, shape, dtype, **params)
+    mask = np.fft.ifftshift(centered)
+    if half:
+        mask = mask[:, :shape[1] // 2 + 1]
+    return np.ascontiguousarray(mask)
+
+
+def expand_half_spectrum(half: np.ndarray, cols: int,
+                         sign: float = 1.0) -> np.ndarray:
+    """
+    Rebuild a full fft2-layout plane from the rfft2 half plane of a real
+    image, using Hermitian symmetry F(-u, -v) = conj(F(u, v))
+
+    Args:
+        half: Real-valued per-frequency quantity on the half plane
+            (e.g. magnitude or phase of rfft2 output)
+        cols: Number of columns of the original image
+        sign: 1 for even quantities (magnitude), -1 for odd ones (phase)
+
+    Returns:
+        Full (rows, cols) plane
+    """
+    rows = half.shape[0]
+    full = np.empty((rows, cols), dtype=half.dtype)
+    n_half = cols // 2 + 1
+    full[:, :n_half] = half
+
+    # Column v > cols/2 mirrors column cols - v of row -u
+    mirror_rows = (-np.arange(rows)) % rows
+    mirror_cols = cols - np.arange(n_half, cols)
+    mirrored = half[mirror_rows][:, mirror_cols]
+    full[:, n_half:] = mirrored if sign > 0 else -mirrored
+    return full
+
+
+class MaskBank:
+    """
+    LRU cache of frequency filter masks
+
+    Entries are keyed on (shape, filter type, parameters, dtype, layout) and the
+    total size of cached masks is bounded by max_bytes. Cached masks are
+    read-only and shared between callers.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._masks: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(filter_type: str, shape: Tuple[int, int], dtype,
+                 params: Dict[str, float], half: bool = False) -> tuple:
+        """Cache key for one mask"""
+        return (tuple(shape), filter_type, tuple(sorted(params.items())),
+                np.dtype(dtype).str, half)
+
+    def get(self, filter_type: str, shape: Tuple[int, int],
+            dtype=np.float64, half: bool = False, **params) -> np.ndarray:
+        """
+        Return a cached mask, building it on a miss
+
+        Args:
+            filter_type: One of FILTER_TYPES
+            shape: (rows, cols) of the image
+            dtype: Mask dtype
+            half: rfft2 half-plane mask instead of the full fft2 plane
+            **params: Filter parameters, see build_centered_mask
+
+        Returns:
+            Read-only mask in fft2 (or rfft2) layout
+        """
+        key = self.make_key(filter_type, shape, dtype, params, half)
+        with self._lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                self.hits += 1
+                return mask
+            self.misses += 1
+
+        mask = build_mask(filter_type, shape, dtype, half, **params)
+        mask.setflags(write=False)
+        self._store(key, mask)
+        return mask
+
+    def _store(self, key: tuple, mask: np.ndarray) -> None:
+        """Insert a mask and evict least recently used entries over budget"""
+        if mask.nbytes > self.max_bytes:
+            return  # Larger than the whole bank: use uncached
+        with self._lock:
+            if key in self._masks:
+                return
+            self._masks[key] = mask
+            self._bytes += mask.nbytes
+            while self._bytes > self.max_bytes:
+                _, old = self._masks.popitem(last=False)
+                self._bytes -= old.nbytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all cached masks and reset the counters"""
+        with self._lock:
+            self._masks.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Cache statistics
+
+        Returns:
+            Dict with hits, misses, evictions, entries, bytes and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._masks),
+                'bytes': self._bytes,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared bank used by ImageProcessor's frequency filters
+MASK_BANK = MaskBank()
+
+# Working-memory budget (bytes) for one chunk of filter_stack. Small enough
+# for the chunk's spectrum to stay mostly in cache.
+STACK_CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def use_real_fft(image: np.ndarray, real: Optional[bool] = None) -> bool:
+    """
+    Decide between the rfft2 and fft2 paths
+
+    Args:
+        image: Input image
+        real: True/False to force a path, None for the default (rfft2 for
+            real-valued grayscale images)
+
+    Returns:
+        True if the rfft2 path should be used
+    """
+    if real is None:
+        return image.ndim == 2 and not np.iscomplexobj(image)
+    if real and np.iscomplexobj(image):
+        raise ValueError("Real FFT path requires a real-valued image")
+    return real
+
+
+class FrequencyDomainSession:
+    """
+    Frequency domain view of one grayscale image
+
+    The forward transform is computed once; every filter applied afterwards
+    costs only a mask multiply and an inverse transform. Useful for
+    parameter sweeps over the same image.
+
+    Example:
+        session = FrequencyDomainSession(image)
+        edges = [session.ideal_highpass(d0) for d0 in (10, 30, 50)]
+    """
+
+    def __init__(self, image: np.ndarray, real: Optional[bool] = None,
+                 mask_bank: MaskBank = MASK_BANK, pad_to_fast: bool = False):
+        """
+        Args:
+            image: Input grayscale image
+            real: Use rfft2/irfft2 (None: on for real grayscale images)
+            mask_bank: Mask cache to draw filter masks from
+            pad_to_fast: Reflect-pad awkward sizes (e.g. 1021x769) up to the
+                next FFT-friendly size and crop results back. Faster, but
+                masks are then sampled on the padded frequency grid, so
+                results differ slightly from the unpadded filters.
+        """
+        self.image_shape = image.shape
+        self.real = use_real_fft(image, real)
+        self.mask_bank = mask_bank
+        if pad_to_fast:
+            rows, cols = fast_shape(image.shape, self.real)
+            image = np.pad(image, ((0, rows - image.shape[0]),
+                                   (0, cols - image.shape[1])),
+                           mode='symmetric')
+        self.shape = image.shape
+        self.fft = get_fft_backend(self.shape, self.real)
+        if self.real:
+            self.spectrum = self.fft.rfft2(image)
+        else:
+            self.spectrum = self.fft.fft2(image)
+        self.spectrum.setflags(write=False)
+        self._work = np.empty_like(self.spectrum)
+
+    def mask(self, filter_type: str, **params) -> np.ndarray:
+        """Cached mask matching this session's spectrum layout"""
+        return self.mask_bank.get(filter_type, self.shape, half=self.real,
+                                  **params)
+
+    def apply_mask(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Filter with a custom mask
+
+        Args:
+            mask: Mask in fft2 layout, or rfft2 half-plane layout if the
+                session uses the real transform
+
+        Returns:
+            Filtered uint8 image
+        """
+        np.multiply(self.spectrum, mask, out=self._work)
+
+        # Inverse Fourier transform
+        if self.real:
+            image_filtered = self.fft.irfft2(self._work, s=self.shape)
+        else:
+            image_filtered = self.fft.ifft2(self._work)
+        rows, cols = self.image_shape
+        image_filtered = np.abs(image_filtered[:rows, :cols])
+
+        # Clip and convert
+        return np.clip(image_filtered, 0, 255).astype(np.uint8)
+
+    def apply(self, filter_type: str, **params) -> np.ndarray:
+        """
+        Filter with a cached mask
+
+        Args:
+            filter_type: One of FILTER_TYPES
+            **params: Filter parameters, see build_centered_mask
+
+        Returns:
+            Filtered uint8 image
+        """
+        return self.apply_mask(self.mask(filter_type, **params))
+
+    def ideal_lowpass(self, cutoff: float) -> np.ndarray:
+        """Ideal low-pass filter (Bài 10-11)"""
+        return self.apply('ideal_lowpass', cutoff=cutoff)
+
+    def gaussian_lowpass(self, sigma: float = 30.0) -> np.ndarray:
+        """Gaussian low-pass filter (Bài 11)"""
+        return self.apply('gaussian_lowpass', sigma=sigma)
+
+    def ideal_highpass(self, cutoff: float) -> np.ndarray:
+        """Ideal high-pass filter (Bài 12.1)"""
+        return self.apply('ideal_highpass', cutoff=cutoff)
+
+    def butterworth_highpass(self, D0: float, n: int = 2) -> np.ndarray:
+        """Butterworth high-pass filter (Bài 12.2)"""
+        return self.apply('butterworth_highpass', D0=D0, n=n)
+
+    def ideal_bandpass(self, low: float, high: float) -> np.ndarray:
+        """Ideal band-pass filter keeping radii in [low, high]"""
+        return self.apply('ideal_bandpass', low=low, high=high)
+
+
+def filter_image(image: np.ndarray, filter_type: str,
+                 real: Optional[bool] = None, **params) -> np.ndarray:
+    """
+    Filter a grayscale image in the frequency domain with a cached mask
+
+    Args:
+        image: Input grayscale image
+        filter_type: One of FILTER_TYPES
+        real: Use rfft2/irfft2 (None: on for real grayscale images). Results
+            stay within 1 gray level of the complex fft2 path.
+        **params: Filter parameters, see build_centered_mask
+
+    Returns:
+        Filtered uint8 image
+    """
+    return FrequencyDomainSession(image, real).apply(filter_type, **params)
+
+
+def filter_stack(stack: np.ndarray, filter_type: str,
+                 real: Optional[bool] = None, chunk_size: Optional[int] = None,
+                 out: Optional[np.ndarray] = None,
+                 max_chunk_bytes: int = STACK_CHUNK_BYTES,
+                 **params) -> np.ndarray:
+    """
+    Filter every frame of an (N, H, W) stack with one cached mask
+
+    Frames are processed in chunks: each chunk is transformed along its last
+    two axes in a single call and multiplied by the mask broadcast over the
+    chunk. Works with np.memmap input and output, so only one chunk is in
+    memory at a time.
+
+    Args:
+        stack: (N, H, W) array or memory-mapped array of grayscale frames
+        filter_type: One of FILTER_TYPES
+        real: Use rfft2/irfft2 (None: on for real-valued stacks)
+        chunk_size: Frames per chunk (None: derived from max_chunk_bytes)
+        out: Optional uint8 (N, H, W) output, e.g. an np.memmap
+        max_chunk_bytes: Working-memory budget per chunk
+        **params: Filter parameters, see build_centered_mask
+
+    Returns:
+        Filtered uint8 stack (out if given)
+    """
+    if stack.ndim != 3:
+        raise ValueError(f"Expected an (N, H, W) stack, got shape {stack.shape}")
+    n_frames, rows, cols = stack.shape
+    if real is None:
+        real = not np.iscomplexobj(stack)
+    if out is None:
+        out = np.empty((n_frames, rows, cols), dtype=np.uint8)
+
+    if chunk_size is None:
+        # Spectrum + inverse output + float copy of the input, per frame
+        bytes_per_frame = rows * cols * (32 if real else 48)
+        chunk_size = max(1, max_chunk_bytes // bytes_per_frame)
+    chunk_size = min(chunk_size, max(n_frames, 1))
+
+    mask = MASK_BANK.get(filter_type, (rows, cols), half=real, **params)
+    for start in range(0, n_frames, chunk_size):
+        block = np.asarray(stack[start:start + chunk_size])
+        fft = get_fft_backend(block.shape, real)
+        if real:
+            spectrum = fft.rfft2(block)
+            spectrum *= mask  # broadcast over the frames
+            filtered = fft.irfft2(spectrum, s=(rows, cols))
+            np.abs(filtered, out=filtered)
+        else:
+            spectrum = fft.fft2(block)
+            spectrum *= mask
+            filtered = np.abs(fft.ifft2(spectrum))
+        np.clip(filtered, 0, 255, out=filtered)
+        out[start:start + block.shape[0]] = filtered  # truncates like astype
+    return out
@@ -0,0 +1,165 @@
+"""
+Histogram Kernel
+One intensity histogram for the whole codebase (calculate_histogram, Otsu,
+histogram / statistical features, the apps' entropy and metrics, point
+operations):
+- uint8 images are counted with cv2.calcHist on the array itself: no
+  flattened copy (np.histogram(image.flatten())) and no widening of every
+  pixel to intp (np.bincount). Other dtypes fall back to np.histogram over
+  [0, 256), as before
+- Optional mask: only pixels where the mask is nonzero are counted
+- Per-channel and joint (multi-channel) histograms of colour images
+- Large images are counted in tiles whose counts are summed in int64
+  (calcHist counts in float32, exact only below 2^24 per bin), optionally on
+  a thread pool; OpenCV releases the GIL while counting
+"""
+
+import numpy as np
+import cv2
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+# Pixels per tile: below 2^24 so float32 counts stay exact, and large
+# enough that per-call overhead is negligible
+TILE_PIXELS = 1 << 22
+
+
+def _tiles(rows: int, cols: int) -> Iterator[Tuple[slice, slice]]:
+    """(row slice, column slice) tiles of at most TILE_PIXELS pixels"""
+    if rows * cols <= TILE_PIXELS:
+        yield slice(None), slice(None)
+    elif cols > TILE_PIXELS:
+        for r in range(rows):
+            for c in range(0, cols, TILE_PIXELS):
+                yield slice(r, r + 1), slice(c, c + TILE_PIXELS)
+    else:
+        step = TILE_PIXELS // cols
+        for r in range(0, rows, step):
+            yield slice(r, r + step), slice(None)
+
+
+def _as_mask(mask: np.ndarray, shape: Tuple[int, ...]) -> np.ndarray:
+    """uint8 mask for calcHist (nonzero = counted)"""
+    mask = np.asarray(mask)
+    if mask.shape != shape:
+        raise ValueError(f"Mask shape {mask.shape} does not match {shape}")
+    return mask if mask.dtype == np.uint8 else (mask != 0).view(np.uint8)
+
+
+def _calc_hist(image: np.ndarray, channels: List[int], mask: Optional[np.ndarray],
+               bins: List[int], workers: int) -> np.ndarray:
+    """cv2.calcHist of a uint8 (rows, cols[, C]) array, tile by tile, in int64"""
+    total = np.zeros(bins, dtype=np.int64)
+    if image.size == 0:
+        return total
+
+    def count(tile):
+        rows, cols = tile
+        tile_mask = None if mask is None else mask[rows, cols]
+        return cv2.calcHist([image[rows, cols]], channels, tile_mask, bins,
+                            [0, 256] * len(channels))
+
+    tiles = list(_tiles(image.shape[0], image.shape[1]))
+    if workers > 1 and len(tiles) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(count, tiles))
+    else:
+        parts = map(count, tiles)
+    for part in parts:
+        total += part.reshape(total.shape).astype(np.int64)
+    return total
+
+
+def intensity_histogram(image: np.ndarray, bins: int = 256,
+                        mask: Optional[np.ndarray] = None,
+                        workers: int = 1) -> np.ndarray:
+    """
+    Histogram of all pixel values over [0, 256)
+
+    Same counts as np.histogram(image.flatten(), bins=bins, range=[0, 256]).
+
+    Args:
+        image: Image of any shape (all channels are counted together)
+        bins: Number of equal-width bins
+        mask: Optional array of the image's shape; zero pixels are skipped
+        workers: Threads counting tiles of large images
+
+    Returns:
+        (bins,) int64 counts
+    """
+    image = np.asarray(image)
+    if image.dtype != np.uint8 or 256 % bins:
+        values = image if mask is None else image[np.asarray(mask) != 0]
+        hist, _ = np.histogram(values, bins=bins, range=(0, 256))
+        return hist
+    if image.size == 0:
+        return np.zeros(bins, dtype=np.int64)
+
+    rows = image.reshape(image.shape[0] if image.ndim > 1 else 1, -1)
+    if mask is not None:
+        mask = _as_mask(mask, image.shape).reshape(rows.shape)
+    counts = _calc_hist(rows, [0], mask, [256], workers)
+    if bins != 256:
+        # Equal-width bins are runs of 256 / bins levels
+        counts = counts.reshape(bins, -1).sum(axis=1)
+    return counts
+
+
+def channel_histograms(image: np.ndarray, mask: Optional[np.ndarray] = None,
+                       workers: int = 1) -> np.ndarray:
+    """
+    256-bin histogram of every channel
+
+    Args:
+        image: (H, W, C) image; (H, W) counts as one channel
+        mask: Optional (H, W) array; zero pixels are skipped
+        workers: Threads counting tiles of large images
+
+    Returns:
+        (C, 256) int64 counts
+    """
+    image = np.asarray(image)
+    if image.ndim == 2:
+        return intensity_histogram(image, mask=mask, workers=workers)[None]
+    if image.dtype != np.uint8:
+        return np.stack([intensity_histogram(image[..., c], mask=mask)
+                         for c in range(image.shape[2])])
+
+    if mask is not None:
+        mask = _as_mask(mask, image.shape[:2])
+    return np.stack([_calc_hist(image, [c], mask, [256], workers)
+                     for c in range(image.shape[2])])
+
+
+def joint_histogram(image: np.ndarray, channels: Optional[Sequence[int]] = None,
+                    bins: Union[int, Sequence[int]] = 32,
+                    mask: Optional[np.ndarray] = None,
+                    workers: int = 1) -> np.ndarray:
+    """
+    Joint histogram of several channels (e.g. a 3D colour histogram)
+
+    Args:
+        image: (H, W, C) image
+        channels: Channels to combine (default: all)
+        bins: Bins per channel over [0, 256), one value or one per channel
+        mask: Optional (H, W) array; zero pixels are skipped
+        workers: Threads counting tiles of large images
+
+    Returns:
+        int64 counts with one axis per channel
+    """
+    image = np.asarray(image)
+    if channels is None:
+        channels = range(image.shape[2])
+    channels = list(channels)
+    bins = [bins] * len(channels) if isinstance(bins, int) else list(bins)
+    if image.dtype != np.uint8:
+        values = image[..., channels]
+        values = values.reshape(-1, len(channels)) if mask is None \
+            else values[np.asarray(mask) != 0]
+        hist, _ = np.histogramdd(values, bins=bins, range=[(0, 256)] * len(channels))
+        return hist.astype(np.int64)
+
+    if mask is not None:
+        mask = _as_mask(mask, image.shape[:2])
+    return _calc_hist(image, channels, mask, bins, workers)
@@ -13,8 +13,13 @@ Implements various image processing techniques including:
 
 import numpy as np
 import cv2
-from scipy import ndimage
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Sequence, Union
+
+from convolution import convolve, convolve2d_separable
+from fft_backend import get_fft_backend
+from frequency_domain import expand_half_spectrum, filter_image, filter_stack, use_real_fft
+from histogram import channel_histograms, intensity_histogram
+from point_ops import HistogramReference, apply_lut, compile_lut
 
 
 class ImageProcessor:
@@ -42,6 +47,10 @@ class ImageProcessor:
             
         if r_max == r_min:
             return image
+        
+        if image.dtype == np.uint8:
+            # Same formula on the 256 levels, applied as a lookup table
+            return apply_lut(image, compile_lut('contrast_stretching', r_min=r_min, r_max=r_max))
             
         # Apply linear transformation
         stretched = ((image - r_min) / (r_max - r_min) * 255).astype(np.uint8)
@@ -61,6 +70,11 @@ class ImageProcessor:
         Returns:
             Clipped and stretched image
         """
+        if image.dtype == np.uint8:
+            return apply_lut(image, compile_lut('contrast_clipping_type1',
+                                                low_threshold=low_threshold,
+                                                high_threshold=high_threshold))
+        
         clipped = np.clip(image, low_threshold, high_threshold)
         return ImageProcessor.contrast_stretching(clipped, low_threshold, high_threshold)
     
@@ -80,6 +94,13 @@ class ImageProcessor:
         Returns:
             Processed image with enhanced regions
         """
+        if image.dtype == np.uint8:
+            # Region ranges only depend on which levels occur
+            hist = intensity_histogram(image)
+            return apply_lut(image, compile_lut('contrast_clipping_type2', hist,
+                                                dark_threshold=dark_threshold,
+                                                mid_threshold=mid_threshold))
+        
         result = np.zeros_like(image)
         
         # Dark region [0, dark_threshold]
@@ -122,8 +143,7 @@ class ImageProcessor:
         Returns:
             Histogram array of size 256
         """
-        hist, _ = np.histogram(image.flatten(), bins=256, range=[0, 256])
-        return hist
+        return intensity_histogram(image)
     
     @staticmethod
     def histogram_equalization(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
@@ -143,58 +163,75 @@ class ImageProcessor:
         if image.max() == image.min():
             return image.copy(), hist
         
-        # Calculate CDF (Cumulative Distribution Function)
-        cdf = hist.cumsum()
-        
-        # Mask out zero values in CDF
-        cdf_masked = np.ma.masked_equal(cdf, 0)
-        
-        # Normalize CDF to [0, 255]
-        cdf_normalized = (cdf_masked - cdf_masked.min()) * 255 / (cdf_masked.max() - cdf_masked.min())
-        cdf_normalized = np.ma.filled(cdf_normalized, 0).astype(np.uint8)
+        # Normalized CDF (Cumulative Distribution Function) as a lookup table
+        cdf_normalized = compile_lut('histogram_equalization', hist)
         
         # Map the pixel values using CDF
-        equalized = cdf_normalized[image.flatten()]
-        equalized = equalized.reshape(image.shape)
+        if image.dtype == np.uint8:
+            return apply_lut(image, cdf_normalized), hist
+        equalized = cdf_normalized[image]
         
         return equalized, hist
     
     @staticmethod
     def histogram_matching(image: np.ndarray, 
-                          reference_hist: np.ndarray) -> np.ndarray:
+                          reference_hist: Union[np.ndarray, HistogramReference]) -> np.ndarray:
         """
         Bài 6: Histogram matching (specification)
         Transform image to match reference histogram
         
         Args:
             image: Input grayscale image
-            reference_hist: Reference histogram to match
+            reference_hist: Reference histogram to match, or a
+                HistogramReference (reusable, e.g. built once from a
+                reference image with HistogramReference.from_image)
             
         Returns:
             Matched image
         """
-        # Equalize source image
-        source_equalized, _ = ImageProcessor.histogram_equalization(image)
-        
-        # Calculate CDF of reference histogram
-        ref_cdf = reference_hist.cumsum()
-        ref_cdf_normalized = (ref_cdf - ref_cdf.min()) * 255 / (ref_cdf.max() - ref_cdf.min())
-        
-        # Create lookup table for inverse mapping
-        lookup_table = np.zeros(256, dtype=np.uint8)
-        g_values = np.arange(256)
+        if not isinstance(reference_hist, HistogramReference):
+            reference_hist = HistogramReference(reference_hist)
         
-        for s in range(256):
-            # Find the closest reference CDF value
-            j = np.argmin(np.abs(ref_cdf_normalized - s))
-            lookup_table[s] = j
+        # Source CDF mapped straight through the inverse reference CDF
+        hist = ImageProcessor.calculate_histogram(image)
+        lookup_table = reference_hist.lut(hist)
         
         # Apply lookup table
-        matched = lookup_table[source_equalized.flatten()]
-        matched = matched.reshape(image.shape)
+        if image.dtype == np.uint8:
+            return apply_lut(image, lookup_table)
+        matched = lookup_table[image]
         
         return matched
     
+    @staticmethod
+    def histogram_matching_color(image: np.ndarray,
+                                 reference: Union[np.ndarray, Sequence]) -> np.ndarray:
+        """
+        Bài 6: Per-channel histogram matching of a colour image
+        
+        Args:
+            image: Input colour image (H, W, C), uint8
+            reference: Reference colour image with C channels, or one
+                reference per channel (histogram or HistogramReference)
+            
+        Returns:
+            Matched image, each channel matched to its reference channel
+        """
+        if isinstance(reference, np.ndarray) and reference.ndim == 3:
+            reference = [HistogramReference.from_image(reference[..., c])
+                         for c in range(reference.shape[2])]
+        if image.ndim != 3 or len(reference) != image.shape[2]:
+            raise ValueError("Need a (H, W, C) image and one reference per channel")
+        
+        luts = []
+        for ref, hist in zip(reference, channel_histograms(image)):
+            if not isinstance(ref, HistogramReference):
+                ref = HistogramReference(ref)
+            luts.append(ref.lut(hist))
+        
+        # One lookup pass with a table per channel
+        return cv2.LUT(image, np.stack(luts, axis=-1).reshape(1, 256, -1))
+    
     @staticmethod
     def adaptive_histogram_equalization(image: np.ndarray, 
                                        clip_limit: float = 2.0,
@@ -214,48 +251,50 @@ class ImageProcessor:
         return clahe.apply(image)
     
     @staticmethod
-    def convolution2d(image: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    def convolution2d(image: np.ndarray, kernel, method: str = 'direct') -> np.ndarray:
         """
         Bài 7: Custom 2D convolution implementation
         
         Args:
             image: Input image
-            kernel: Convolution kernel/mask
+            kernel: Convolution kernel/mask (any kh x kw shape), or a
+                (column, row) tuple of 1D factors for a separable kernel
+            method: 'direct' (default) is bit-identical to the per-pixel
+                np.sum(region * kernel) loop; 'auto' lets the planner pick
+                direct, separable, integral-image or FFT convolution, which
+                round differently and can move a pixel by one gray level
             
         Returns:
             Convolved image
         """
-        # Pad the image
-        kernel_size = kernel.shape[0]
-        pad_size = kernel_size // 2
-        padded = np.pad(image, pad_size, mode='edge')
-        
-        # Perform convolution
-        result = np.zeros_like(image, dtype=np.float64)
-        
-        for i in range(image.shape[0]):
-            for j in range(image.shape[1]):
-                region = padded[i:i+kernel_size, j:j+kernel_size]
-                result[i, j] = np.sum(region * kernel)
+        if isinstance(kernel, tuple):
+            # Separable kernel: two 1D passes
+            result = convolve2d_separable(image, kernel[0], kernel[1])
+        else:
+            # Edge padding, kernel applied without flipping
+            result = convolve(image, kernel, mode='nearest', method=method)
         
         # Clip and convert to uint8
         result = np.clip(result, 0, 255).astype(np.uint8)
         return result
     
     @staticmethod
-    def average_filter(image: np.ndarray, kernel_size: int = 3) -> np.ndarray:
+    def average_filter(image: np.ndarray, kernel_size: int = 3,
+                       method: str = 'direct') -> np.ndarray:
         """
         Bài 7: Average filter for noise removal
         
         Args:
             image: Input noisy image
             kernel_size: Size of averaging kernel (3 or 5)
+            method: Convolution method (see convolution2d); 'auto' opts
+                into the planner
             
         Returns:
             Filtered image
         """
         kernel = np.ones((kernel_size, kernel_size), dtype=np.float64) / (kernel_size ** 2)
-        return ImageProcessor.convolution2d(image, kernel)
+        return ImageProcessor.convolution2d(image, kernel, method=method)
     
     @staticmethod
     def median_filter(image: np.ndarray, kernel_size: int = 3) -> np.ndarray:
@@ -317,9 +356,12 @@ class ImageProcessor:
                            [0, 0, 0],
                            [1, 2, 1]], dtype=np.float64)
         
-        # Compute gradients
-        Gx = ndimage.convolve(image.astype(np.float64), sobel_x)
-        Gy = ndimage.convolve(image.astype(np.float64), sobel_y)
+        # Compute gradients (direct method: integer kernels give exact
+        # integer gradients, whatever the planner would pick)
+        Gx = convolve(image.astype(np.float64), sobel_x, mode='reflect', flip=True,
+                      method='direct')
+        Gy = convolve(image.astype(np.float64), sobel_y, mode='reflect', flip=True,
+                      method='direct')
         
         # Compute gradient magnitude
         magnitude = np.sqrt(Gx**2 + Gy**2)
@@ -348,8 +390,10 @@ class ImageProcessor:
                              [1, 1, 1]], dtype=np.float64)
         
         # Compute gradients
-        Gx = ndimage.convolve(image.astype(np.float64), prewitt_x)
-        Gy = ndimage.convolve(image.astype(np.float64), prewitt_y)
+        Gx = convolve(image.astype(np.float64), prewitt_x, mode='reflect', flip=True,
+                      method='direct')
+        Gy = convolve(image.astype(np.float64), prewitt_y, mode='reflect', flip=True,
+                      method='direct')
         
         # Compute gradient magnitude
         magnitude = np.sqrt(Gx**2 + Gy**2)
@@ -376,8 +420,10 @@ class ImageProcessor:
                              [-1, 0]], dtype=np.float64)
         
         # Compute gradients
-        Gx = ndimage.convolve(image.astype(np.float64), roberts_x)
-        Gy = ndimage.convolve(image.astype(np.float64), roberts_y)
+        Gx = convolve(image.astype(np.float64), roberts_x, mode='reflect', flip=True,
+                      method='direct')
+        Gy = convolve(image.astype(np.float64), roberts_y, mode='reflect', flip=True,
+                      method='direct')
         
         # Compute gradient magnitude
         magnitude = np.sqrt(Gx**2 + Gy**2)
@@ -409,9 +455,11 @@ class ImageProcessor:
         ]
         
         # Apply all kernels and take maximum response
+        image_float = image.astype(np.float64)
         responses = []
         for kernel in kirsch_kernels:
-            response = np.abs(ndimage.convolve(image.astype(np.float64), kernel))
+            response = np.abs(convolve(image_float, kernel, mode='reflect', flip=True,
+                                       method='direct'))
             responses.append(response)
         
         # Maximum response across all directions
@@ -436,7 +484,8 @@ class ImageProcessor:
                           [1, -4, 1],
                           [0, 1, 0]], dtype=np.float64)
         
-        result = ndimage.convolve(image.astype(np.float64), kernel)
+        result = convolve(image.astype(np.float64), kernel, mode='reflect', flip=True,
+                          method='direct')
         result = np.clip(np.abs(result), 0, 255).astype(np.uint8)
         
         return result
@@ -457,7 +506,8 @@ class ImageProcessor:
                           [1, -8, 1],
                           [1, 1, 1]], dtype=np.float64)
         
-        result = ndimage.convolve(image.astype(np.float64), kernel)
+        result = convolve(image.astype(np.float64), kernel, mode='reflect', flip=True,
+                          method='direct')
         result = np.clip(np.abs(result), 0, 255).astype(np.uint8)
         
         return result
@@ -500,7 +550,8 @@ class ImageProcessor:
             kernel = np.array([[1, 1, 1],
                               [1, -8, 1],
                               [1, 1, 1]], dtype=np.float64)
-            laplacian = ndimage.convolve(image.astype(np.float64), kernel)
+            laplacian = convolve(image.astype(np.float64), kernel, mode='reflect', flip=True,
+                                 method='direct')
             
         elif method == 'log':
             # Use Laplacian of Gaussian
@@ -508,7 +559,8 @@ class ImageProcessor:
             kernel = np.array([[1, 1, 1],
                               [1, -8, 1],
                               [1, 1, 1]], dtype=np.float64)
-            laplacian = ndimage.convolve(smoothed.astype(np.float64), kernel)
+            laplacian = convolve(smoothed.astype(np.float64), kernel, mode='reflect', flip=True,
+                                 method='direct')
         else:
             raise ValueError(f"Unknown sharpening method: {method}")
         
@@ -519,18 +571,33 @@ class ImageProcessor:
         return sharpened
     
     @staticmethod
-    def fourier_transform(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    def fourier_transform(image: np.ndarray,
+                          real: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray]:
         """
         Bài 10: Forward Fourier Transform (DFT)
         
         Args:
             image: Input grayscale image
+            real: Use the real-input FFT (rfft2); None = on for grayscale
             
         Returns:
             Tuple of (magnitude spectrum, phase spectrum)
         """
+        use_real = use_real_fft(image, real)
+        fft = get_fft_backend(image.shape, use_real)
+        if use_real:
+            # Half-plane transform of a real image; the other half follows
+            # from Hermitian symmetry
+            half = fft.rfft2(image)
+            cols = image.shape[1]
+            magnitude = expand_half_spectrum(np.abs(half), cols)
+            phase = expand_half_spectrum(np.angle(half), cols, sign=-1.0)
+            
+            # Shift zero frequency to center
+            return np.fft.fftshift(magnitude), np.fft.fftshift(phase)
+        
         # Apply FFT (faster than DFT)
-        f_transform = np.fft.fft2(image)
+        f_transform = fft.fft2(image)
         f_shift = np.fft.fftshift(f_transform)  # Shift zero frequency to center
         
         # Calculate magnitude and phase
@@ -559,7 +626,7 @@ class ImageProcessor:
         f_transform = np.fft.ifftshift(f_shift)
         
         # Apply inverse FFT
-        image_reconstructed = np.fft.ifft2(f_transform)
+        image_reconstructed = get_fft_backend(f_transform.shape, real=False).ifft2(f_transform)
         image_reconstructed = np.abs(image_reconstructed)
         
         # Clip and convert
@@ -596,84 +663,42 @@ class ImageProcessor:
         return magnitude_display
     
     @staticmethod
-    def ideal_lowpass_filter(image: np.ndarray, cutoff_frequency: int) -> np.ndarray:
+    def ideal_lowpass_filter(image: np.ndarray, cutoff_frequency: int,
+                             real: Optional[bool] = None) -> np.ndarray:
         """
         Bài 10-11: Ideal Low-pass Filter in frequency domain
         
         Args:
             image: Input grayscale image
             cutoff_frequency: Cutoff frequency (radius)
+            real: Use the real-input FFT (rfft2); None = on for grayscale
             
         Returns:
             Filtered image
         """
-        # Get image dimensions
-        rows, cols = image.shape
-        crow, ccol = rows // 2, cols // 2
-        
-        # Create ideal low-pass filter mask
-        mask = np.zeros((rows, cols), dtype=np.float64)
-        y, x = np.ogrid[:rows, :cols]
-        distance = np.sqrt((x - ccol)**2 + (y - crow)**2)
-        mask[distance <= cutoff_frequency] = 1
-        
-        # Apply Fourier transform
-        f_transform = np.fft.fft2(image)
-        f_shift = np.fft.fftshift(f_transform)
-        
-        # Apply filter in frequency domain
-        f_filtered = f_shift * mask
-        
-        # Inverse Fourier transform
-        f_ishift = np.fft.ifftshift(f_filtered)
-        image_filtered = np.fft.ifft2(f_ishift)
-        image_filtered = np.abs(image_filtered)
-        
-        # Clip and convert
-        image_filtered = np.clip(image_filtered, 0, 255).astype(np.uint8)
-        
-        return image_filtered
+        # Cached ideal low-pass mask, applied to the image spectrum
+        return filter_image(image, 'ideal_lowpass', real, cutoff=cutoff_frequency)
     
     @staticmethod
-    def gaussian_lowpass_filter(image: np.ndarray, sigma: float = 30.0) -> np.ndarray:
+    def gaussian_lowpass_filter(image: np.ndarray, sigma: float = 30.0,
+                                real: Optional[bool] = None) -> np.ndarray:
         """
         Bài 11: Gaussian Low-pass Filter in frequency domain
         
         Args:
             image: Input grayscale image
             sigma: Standard deviation for Gaussian filter
+            real: Use the real-input FFT (rfft2); None = on for grayscale
             
         Returns:
             Filtered image
         """
-        # Get image dimensions
-        rows, cols = image.shape
-        crow, ccol = rows // 2, cols // 2
-        
-        # Create Gaussian low-pass filter mask
-        y, x = np.ogrid[:rows, :cols]
-        distance_sq = (x - ccol)**2 + (y - crow)**2
-        mask = np.exp(-distance_sq / (2 * sigma**2))
-        
-        # Apply Fourier transform
-        f_transform = np.fft.fft2(image)
-        f_shift = np.fft.fftshift(f_transform)
-        
-        # Apply filter in frequency domain
-        f_filtered = f_shift * mask
-        
-        # Inverse Fourier transform
-        f_ishift = np.fft.ifftshift(f_filtered)
-        image_filtered = np.fft.ifft2(f_ishift)
-        image_filtered = np.abs(image_filtered)
-        
-        # Clip and convert
-        image_filtered = np.clip(image_filtered, 0, 255).astype(np.uint8)
-        
-        return image_filtered
+        # Cached Gaussian low-pass mask, applied to the image spectrum
+        return filter_image(image, 'gaussian_lowpass', real, sigma=sigma)
     
     @staticmethod
-    def ideal_highpass_filter(image: np.ndarray, cutoff_frequency: int) -> np.ndarray:
+    def ideal_highpass_filter(image: np.ndarray, cutoff_frequency: int,
+                              real: Optional[bool] = None) -> np.ndarray:
         """
         Bài 12.1: Ideal High-pass Filter in frequency domain
         Uses H_ideal_high = 1 - H_ideal_low to preserve edges and details
@@ -681,39 +706,17 @@ class ImageProcessor:
         Args:
             image: Input grayscale image
             cutoff_frequency: Cutoff frequency (radius) - blocks frequencies below this
+            real: Use the real-input FFT (rfft2); None = on for grayscale
             
         Returns:
             Filtered image with enhanced edges
         """
-        # Get image dimensions
-        rows, cols = image.shape
-        crow, ccol = rows // 2, cols // 2
-        
-        # Create ideal high-pass filter mask (1 - low-pass mask)
-        mask = np.ones((rows, cols), dtype=np.float64)
-        y, x = np.ogrid[:rows, :cols]
-        distance = np.sqrt((x - ccol)**2 + (y - crow)**2)
-        mask[distance <= cutoff_frequency] = 0  # Block low frequencies
-        
-        # Apply Fourier transform
-        f_transform = np.fft.fft2(image)
-        f_shift = np.fft.fftshift(f_transform)
-        
-        # Apply filter in frequency domain
-        f_filtered = f_shift * mask
-        
-        # Inverse Fourier transform
-        f_ishift = np.fft.ifftshift(f_filtered)
-        image_filtered = np.fft.ifft2(f_ishift)
-        image_filtered = np.abs(image_filtered)
-        
-        # Clip and convert
-        image_filtered = np.clip(image_filtered, 0, 255).astype(np.uint8)
-        
-        return image_filtered
+        # Cached ideal high-pass mask (1 - low-pass mask)
+        return filter_image(image, 'ideal_highpass', real, cutoff=cutoff_frequency)
     
     @staticmethod
-    def butterworth_highpass_filter(image: np.ndarray, D0: int, n: int = 2) -> np.ndarray:
+    def butterworth_highpass_filter(image: np.ndarray, D0: int, n: int = 2,
+                                    real: Optional[bool] = None) -> np.ndarray:
         """
         Bài 12.2: Butterworth High-pass Filter in frequency domain
         Smoother transition than ideal filter, reduces ringing artifacts
@@ -723,36 +726,35 @@ class ImageProcessor:
             image: Input grayscale image
             D0: Cutoff frequency (radius)
             n: Order of the filter (higher = sharper transition)
+            real: Use the real-input FFT (rfft2); None = on for grayscale
             
         Returns:
             Filtered image with enhanced edges (smoother than ideal)
         """
-        # Get image dimensions
-        rows, cols = image.shape
-        crow, ccol = rows // 2, cols // 2
-        
-        # Create Butterworth high-pass filter mask
-        y, x = np.ogrid[:rows, :cols]
-        distance = np.sqrt((x - ccol)**2 + (y - crow)**2)
-        
-        # Avoid division by zero
-        mask = np.zeros((rows, cols), dtype=np.float64)
-        non_zero = distance > 0
-        mask[non_zero] = 1 / (1 + np.power(D0 / distance[non_zero], 2 * n))
-        
-        # Apply Fourier transform
-        f_transform = np.fft.fft2(image)
-        f_shift = np.fft.fftshift(f_transform)
-        
-        # Apply filter in frequency domain
-        f_filtered = f_shift * mask
-        
-        # Inverse Fourier transform
-        f_ishift = np.fft.ifftshift(f_filtered)
-        image_filtered = np.fft.ifft2(f_ishift)
-        image_filtered = np.abs(image_filtered)
-        
-        # Clip and convert
-        image_filtered = np.clip(image_filtered, 0, 255).astype(np.uint8)
+        # Cached Butterworth high-pass mask
+        return filter_image(image, 'butterworth_highpass', real, D0=D0, n=n)
+    
+    @staticmethod
+    def frequency_filter_batch(images: np.ndarray, filter_type: str,
+                               chunk_size: Optional[int] = None,
+                               out: Optional[np.ndarray] = None,
+                               real: Optional[bool] = None,
+                               **params) -> np.ndarray:
+        """
+        Bài 10-12: Frequency domain filtering of an image stack
+        (video frames, tiles) with one shared mask
         
-        return image_filtered
+        Args:
+            images: (N, H, W) grayscale stack, may be an np.memmap
+            filter_type: 'ideal_lowpass' (cutoff), 'gaussian_lowpass' (sigma),
+                'ideal_highpass' (cutoff), 'butterworth_highpass' (D0, n)
+                or 'ideal_bandpass' (low, high)
+            chunk_size: Frames transformed per call (None: memory-bounded)
+            out: Optional uint8 output stack, may be an np.memmap
+            real: Use the real-input FFT (rfft2); None = on for real input
+            **params: Filter parameters named above
+            
+        Returns:
+            Filtered uint8 stack, frame i equal to filtering images[i] alone
+        """
+        return filter_stack(images, filter_type, real, chunk_size, out, **params)
@@ -14,6 +14,9 @@ import numpy as np
 import math
 import os
 
+from histogram import intensity_histogram
+from point_ops import apply_point_ops
+
 
 class ImageProcessingApp:
     """Lớp chính cho ứng dụng xử lý ảnh"""
@@ -554,7 +557,7 @@ class ImageProcessingApp:
             gray_array = np.array(gray_image)
             
             # Tính histogram
-            histogram, _ = np.histogram(gray_array, bins=256, range=(0, 256))
+            histogram = intensity_histogram(gray_array)
             
             # Chuẩn hóa histogram thành xác suất
             histogram = histogram / histogram.sum()
@@ -639,7 +642,8 @@ class ImageProcessingApp:
         try:
             # Chuyển sang grayscale
             gray_image = self.original_image.convert('L')
-            gray_array = np.array(gray_image, dtype=np.float64)
+            gray_uint8 = np.array(gray_image)
+            gray_array = gray_uint8.astype(np.float64)
             
             # 1. Độ sáng
             brightness = np.mean(gray_array)
@@ -649,7 +653,7 @@ class ImageProcessingApp:
             rms_contrast = np.sqrt(np.mean((gray_array - brightness) ** 2))
             
             # 3. Entropy
-            histogram, _ = np.histogram(gray_array, bins=256, range=(0, 256))
+            histogram = intensity_histogram(gray_uint8)
             histogram = histogram / histogram.sum()
             entropy = 0
             for prob in histogram:
@@ -708,8 +712,8 @@ class ImageProcessingApp:
             gray_image = self.original_image.convert('L')
             gray_array = np.array(gray_image)
             
-            # Áp dụng công thức: s = 255 - r
-            negative_array = 255 - gray_array
+            # Áp dụng công thức: s = 255 - r (bảng tra cứu 256 mức)
+            negative_array = apply_point_ops(gray_array, [('negative', {})])
             
             # Chuyển về ảnh
             negative_image = Image.fromarray(negative_array.astype(np.uint8))
@@ -741,16 +745,14 @@ class ImageProcessingApp:
         try:
             # Chuyển sang grayscale
             gray_image = self.original_image.convert('L')
-            gray_array = np.array(gray_image, dtype=np.float64)
+            gray_array = np.array(gray_image)
             
             # Lấy giá trị c
             c = self.log_c.get()
             
-            # Áp dụng công thức: s = c * log(1 + r)
-            log_array = c * np.log1p(gray_array)
-            
-            # Chuẩn hóa về [0, 255]
-            log_array = (log_array - np.min(log_array)) / (np.max(log_array) - np.min(log_array)) * 255
+            # Áp dụng công thức: s = c * log(1 + r), chuẩn hóa về [0, 255]
+            # (tính trên 256 mức xám rồi tra bảng thay vì tính từng pixel)
+            log_array = apply_point_ops(gray_array, [('log_transform', {'c': c})])
             
             # Chuyển về ảnh
             log_image = Image.fromarray(log_array.astype(np.uint8))
@@ -782,22 +784,14 @@ class ImageProcessingApp:
         try:
             # Chuyển sang grayscale
             gray_image = self.original_image.convert('L')
-            gray_array = np.array(gray_image, dtype=np.float64)
+            gray_array = np.array(gray_image)
             
             # Lấy giá trị c
             c = self.inv_log_c.get()
             
-            # Chuẩn hóa về [0, 1]
-            normalized = gray_array / 255.0
-            
-            # Áp dụng công thức: r = e^(s/c) - 1
-            # Nhưng cần điều chỉnh để tránh overflow
-            inv_log_array = np.expm1(normalized / c) if c > 0 else normalized
-            
-            # Chuẩn hóa về [0, 255]
-            if np.max(inv_log_array) > np.min(inv_log_array):
-                inv_log_array = (inv_log_array - np.min(inv_log_array)) / \
-                                (np.max(inv_log_array) - np.min(inv_log_array)) * 255
+            # Áp dụng công thức: r = e^(s/c) - 1 trên [0, 1], chuẩn hóa về [0, 255]
+            # (tính trên 256 mức xám rồi tra bảng thay vì tính từng pixel)
+            inv_log_array = apply_point_ops(gray_array, [('inverse_log_transform', {'c': c})])
             
             # Chuyển về ảnh
             inv_log_image = Image.fromarray(inv_log_array.astype(np.uint8))
@@ -829,19 +823,14 @@ class ImageProcessingApp:
         try:
             # Chuyển sang grayscale
             gray_image = self.original_image.convert('L')
-            gray_array = np.array(gray_image, dtype=np.float64)
+            gray_array = np.array(gray_image)
             
             # Lấy giá trị gamma
             gamma = self.gamma.get()
             
-            # Chuẩn hóa về [0, 1]
-            normalized = gray_array / 255.0
-            
-            # Áp dụng công thức: s = c * r^γ (với c = 1 cho đơn giản)
-            gamma_array = np.power(normalized, gamma)
-            
-            # Chuyển về [0, 255]
-            gamma_array = gamma_array * 255
+            # Áp dụng công thức: s = c * r^γ (với c = 1 cho đơn giản) trên [0, 1],
+            # chuyển về [0, 255] (tính trên 256 mức xám rồi tra bảng)
+            gamma_array = apply_point_ops(gray_array, [('gamma_transform', {'gamma': gamma})])
             
             # Chuyển về ảnh
             gamma_image = Image.fromarray(gamma_array.astype(np.uint8))
@@ -0,0 +1,174 @@
+"""
+Background Jobs
+Runs GUI processing off the Tk main thread (comprehensive_app.py):
+- Work is executed by a thread pool; numpy / OpenCV release the GIL, so
+  the window keeps redrawing while an image is processed
+- Results are handed back through a queue that the UI thread drains from
+  a root.after poll loop; Tk widgets are only touched on the UI thread
+- One job per channel: submitting a new job cancels the stale one (it is
+  dropped from the queue if it has not started, and its result is
+  discarded if it has)
+- A progress callback reports the running jobs and their elapsed time
+"""
+
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Job:
+    """A unit of background work submitted to a JobRunner"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, channel: str):
+        self.id = next(Job._ids)
+        self.name = name
+        self.channel = channel
+        self.submitted = time.perf_counter()
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> bool:
+        """
+        Mark the job stale; it will not start, or its result is ignored
+
+        Returns:
+            True if the job had not started and never will (no result
+            will be delivered for it)
+        """
+        self._cancelled.set()
+        return self.future is not None and self.future.cancel()
+
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.submitted
+
+
+class JobRunner:
+    """
+    Executor-backed job queue for a Tk application
+
+    Example:
+        runner = JobRunner(root.after, on_progress=show_progress)
+        runner.submit("Median 5x5", lambda: median(image, 5), on_done=show)
+    """
+
+    def __init__(self, schedule: Callable[[int, Callable[[], None]], Any],
+                 max_workers: int = 1, poll_ms: int = 50,
+                 on_progress: Optional[Callable[[List[Job]], None]] = None):
+        """
+        Args:
+            schedule: root.after (or any callable (delay_ms, callback))
+            max_workers: Worker threads
+            poll_ms: Interval of the UI-thread poll while jobs are running
+            on_progress: Called on the UI thread with the running jobs at
+                every poll (an empty list when the last one finishes)
+        """
+        self._schedule = schedule
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='job')
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._current: Dict[str, Job] = {}
+        self._callbacks: Dict[int, tuple] = {}
+        self._polling = False
+        self.poll_ms = poll_ms
+        self.on_progress = on_progress
+        self.stale = 0
+
+    def submit(self, name: str, work: Callable[[], Any],
+               on_done: Callable[[Any], None],
+               on_error: Optional[Callable[[BaseException], None]] = None,
+               channel: str = 'default') -> Job:
+        """
+        Run work() in the background and call on_done(result) on the UI thread
+
+        Args:
+            name: Label shown in progress reports
+            work: Zero-argument callable executed by a worker thread
+            on_done: Receives the result (UI thread)
+            on_error: Receives the exception if work raises (UI thread)
+            channel: Jobs on the same channel replace each other
+
+        Returns:
+            The submitted Job
+        """
+        previous = self._current.get(channel)
+        if previous is not None:
+            self._cancel(previous)
+
+        job = Job(name, channel)
+        self._current[channel] = job
+        self._callbacks[job.id] = (on_done, on_error)
+        job.future = self._executor.submit(self._run, job, work)
+        if not self._polling:
+            self._polling = True
+            self._schedule(self.poll_ms, self.poll)
+        return job
+
+    def _cancel(self, job: Job) -> None:
+        if job.cancel():
+            # Never runs, so poll() will not see it: drop its callbacks
+            # (and the images they hold) now
+            self._callbacks.pop(job.id, None)
+
+    def _run(self, job: Job, work: Callable[[], Any]) -> None:
+        if job.cancelled():
+            self._results.put((job, None, None))
+            return
+        try:
+            self._results.put((job, work(), None))
+        except BaseException as error:  # Delivered to on_error on the UI thread
+            self._results.put((job, None, error))
+
+    def running(self) -> List[Job]:
+        """Jobs that are neither finished nor cancelled"""
+        return [job for job in self._current.values() if not job.cancelled()]
+
+    def poll(self) -> None:
+        """Deliver finished jobs (UI thread); reschedules itself while busy"""
+        while True:
+            try:
+                job, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            on_done, on_error = self._callbacks.pop(job.id, (None, None))
+            if job.cancelled() or self._current.get(job.channel) is not job:
+                self.stale += 1
+                continue
+            del self._current[job.channel]
+            if error is None:
+                on_done(result)
+            elif on_error is not None:
+                on_error(error)
+            else:
+                raise error
+
+        # Cancelled jobs that never started are dropped by the executor
+        for channel, job in list(self._current.items()):
+            if job.cancelled() and job.future.done():
+                del self._current[channel]
+
+        running = self.running()
+        if self.on_progress is not None:
+            self.on_progress(running)
+        if self._current:
+            self._schedule(self.poll_ms, self.poll)
+        else:
+            self._polling = False
+
+    def cancel_all(self) -> None:
+        """Cancel every pending or running job"""
+        for job in self._current.values():
+            self._cancel(job)
+
+    def shutdown(self) -> None:
+        """Cancel all jobs and stop the worker threads (do not wait)"""
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
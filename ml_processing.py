@@ -15,10 +15,16 @@ Bài tập Machine Learning - Xử lý ảnh
 Tác giả: Minhhieu-coder
 """
 
+import time
 import numpy as np
 import cv2
-from typing import Tuple, List, Optional
-from scipy import ndimage
+from typing import Tuple, List, Optional, Union
+
+from clustering import assign_clusters, minibatch_kmeans
+from convolution import convolve
+from histogram import intensity_histogram
+from neighbors import block_knn, top_k, vote
+from pca import pca_components
 
 
 class MLImageProcessor:
@@ -26,27 +32,47 @@ class MLImageProcessor:
     
     @staticmethod
     def kmeans_segmentation(image: np.ndarray, k: int = 3, 
-                            max_iterations: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+                            max_iterations: int = 100,
+                            method: str = 'auto') -> Tuple[np.ndarray, np.ndarray]:
         """
         ML 1: K-Means clustering for image segmentation
         Segments image into k clusters based on pixel intensity
         
+        The 'histogram' method clusters the 256 gray levels weighted by their
+        pixel counts and maps the image through a lookup table, so time and
+        memory do not grow with the image size. It gives the same clusters as
+        'pixels' (centroids are exact means instead of float32 sums).
+        
         Args:
             image: Input grayscale image
             k: Number of clusters (segments)
             max_iterations: Maximum iterations for convergence
+            method: 'histogram' (uint8 images only), 'pixels', or 'auto'
+                (histogram for uint8 images)
             
         Returns:
             Tuple of (segmented image, cluster centers)
         """
         import warnings
         
-        # Flatten image for clustering
-        pixels = image.flatten().astype(np.float32)
+        if method == 'auto':
+            method = 'histogram' if image.dtype == np.uint8 else 'pixels'
+        if method == 'histogram':
+            if image.dtype != np.uint8:
+                raise ValueError("Histogram K-Means requires a uint8 image")
+            # Gray levels weighted by their pixel counts
+            counts = intensity_histogram(image).astype(np.float64)
+            levels = np.arange(256, dtype=np.float32)
+            unique_vals = levels[counts > 0]
+        elif method == 'pixels':
+            # Flatten image for clustering
+            pixels = image.flatten().astype(np.float32)
+            unique_vals = np.unique(pixels)
+        else:
+            raise ValueError(f"Unknown K-Means method: {method}")
         
         # Random initialization of centroids
         np.random.seed(42)  # For reproducibility
-        unique_vals = np.unique(pixels)
         if len(unique_vals) < k:
             warnings.warn(f"Requested k={k} clusters but image only has {len(unique_vals)} unique values. Using k={len(unique_vals)} instead.")
             k = len(unique_vals)
@@ -56,6 +82,30 @@ class MLImageProcessor:
         centroids = unique_vals[idx].astype(np.float32)
         centroids = np.sort(centroids)  # Sort for consistent ordering
         
+        if method == 'histogram':
+            weighted = counts * levels
+            for iteration in range(max_iterations):
+                # Assign each gray level to nearest centroid
+                lut = np.argmin(np.abs(levels[:, np.newaxis] - centroids), axis=1)
+                
+                # Update centroids from per-cluster counts and sums
+                size = np.bincount(lut, weights=counts, minlength=k)
+                total = np.bincount(lut, weights=weighted, minlength=k)
+                new_centroids = centroids.copy()
+                filled = size > 0
+                new_centroids[filled] = total[filled] / size[filled]
+                
+                # Check convergence
+                if np.allclose(centroids, new_centroids, atol=1.0):
+                    break
+                
+                centroids = new_centroids
+            
+            # Create segmented image through the level -> centroid table
+            segmented = centroids[lut].astype(np.uint8)[image]
+            
+            return segmented, centroids
+        
         # K-Means iteration
         for iteration in range(max_iterations):
             # Assign each pixel to nearest centroid
@@ -83,13 +133,22 @@ class MLImageProcessor:
         return segmented, centroids
     
     @staticmethod
-    def color_kmeans_segmentation(image: np.ndarray, k: int = 3) -> np.ndarray:
+    def color_kmeans_segmentation(image: np.ndarray, k: int = 3,
+                                  method: str = 'cv2', seed: Optional[int] = 42,
+                                  batch_size: int = 4096,
+                                  tol: float = 0.2) -> np.ndarray:
         """
         ML 1.2: K-Means clustering for color image segmentation
         
         Args:
             image: Input color image (BGR)
             k: Number of clusters
+            method: 'cv2' (cv2.kmeans, 10 random restarts over all pixels) or
+                'minibatch' (k-means++ seeding and mini-batch updates over a
+                pixel sample; deterministic for a given seed)
+            seed: Random seed of the 'minibatch' engine
+            batch_size: Pixels per mini-batch
+            tol: Center movement at which the 'minibatch' engine stops
             
         Returns:
             Segmented color image
@@ -101,6 +160,15 @@ class MLImageProcessor:
         # Reshape to 2D array of pixels
         pixels = image.reshape((-1, 3)).astype(np.float32)
         
+        if method == 'minibatch':
+            centers = minibatch_kmeans(pixels, k, batch_size=batch_size,
+                                       tol=tol, seed=seed)
+            # Chunked assignment keeps memory flat for large photos
+            labels, _ = assign_clusters(pixels, centers)
+            return np.uint8(centers)[labels].reshape(image.shape)
+        if method != 'cv2':
+            raise ValueError(f"Unknown K-Means method: {method}")
+        
         # K-Means criteria
         criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
         
@@ -129,7 +197,7 @@ class MLImageProcessor:
         Returns:
             Normalized histogram feature vector
         """
-        hist, _ = np.histogram(image.flatten(), bins=bins, range=[0, 256])
+        hist = intensity_histogram(image, bins=bins)
         
         # Normalize histogram
         hist = hist.astype(np.float64)
@@ -195,7 +263,7 @@ class MLImageProcessor:
             kurtosis = np.mean(((image - mean_val) / std_val) ** 4) - 3
         
         # Energy and entropy
-        hist, _ = np.histogram(image.flatten(), bins=256, range=[0, 256])
+        hist = intensity_histogram(image)
         prob = hist / hist.sum() if hist.sum() > 0 else hist
         energy = np.sum(prob ** 2)
         
@@ -216,16 +284,23 @@ class MLImageProcessor:
         return features
     
     @staticmethod
-    def extract_combined_features(image: np.ndarray) -> np.ndarray:
+    def extract_combined_features(image: np.ndarray,
+                                  fused: Optional[bool] = None) -> np.ndarray:
         """
         ML 2.4: Extract combined feature vector for classification
         
         Args:
             image: Input grayscale image
+            fused: Use extract_fused_features (default: for 2D uint8 images)
             
         Returns:
             Combined feature vector
         """
+        if fused is None:
+            fused = image.dtype == np.uint8 and image.ndim == 2
+        if fused:
+            return MLImageProcessor.extract_fused_features(image)
+        
         hist_features = MLImageProcessor.extract_histogram_features(image, bins=16)
         texture_features = MLImageProcessor.extract_texture_features(image)
         stat_features = MLImageProcessor.extract_statistical_features(image)
@@ -238,46 +313,181 @@ class MLImageProcessor:
         
         return combined
     
+    @staticmethod
+    def extract_fused_features(image: np.ndarray) -> np.ndarray:
+        """
+        ML 2.5: Combined feature vector from one histogram and one gradient pass
+        
+        Same features as extract_combined_features with the three extractors:
+        the 16-bin histogram, mean, min / max, median, moments, energy and
+        entropy all come from one 256-bin histogram, and both Sobel
+        derivatives from one cv2.spatialGradient call. Histogram, median,
+        energy, entropy and texture features are identical; std, skewness
+        and kurtosis agree to floating point rounding.
+        
+        Args:
+            image: Input grayscale image (uint8)
+            
+        Returns:
+            Combined feature vector (29 values)
+        """
+        if image.dtype != np.uint8:
+            raise ValueError("Fused feature extraction requires a uint8 image")
+        levels = np.arange(256, dtype=np.float64)
+        
+        # One 256-bin histogram
+        counts = intensity_histogram(image)
+        n = image.size
+        hist_features = counts.reshape(16, 16).sum(axis=1) / n
+        
+        # Moments of the gray levels weighted by their counts
+        mean_val = np.dot(counts, np.arange(256)) / n
+        deviation = levels - mean_val
+        std_val = np.sqrt(np.dot(counts, deviation ** 2) / n)
+        skewness = kurtosis = 0.0
+        if std_val > 0:
+            z = deviation / std_val
+            skewness = np.dot(counts, z ** 3) / n
+            kurtosis = np.dot(counts, z ** 4) / n - 3
+        
+        occupied = np.flatnonzero(counts)
+        min_val, max_val = occupied[0], occupied[-1]
+        
+        # Median: the middle value (or the two middle values) of the sorted pixels
+        cumulative = np.cumsum(counts)
+        lower = np.searchsorted(cumulative, (n - 1) // 2, side='right')
+        upper = np.searchsorted(cumulative, n // 2, side='right')
+        median_val = (lower + upper) / 2
+        
+        prob = counts / n
+        energy = np.sum(prob ** 2)
+        entropy = -np.sum(prob * np.log2(prob + 1e-10))
+        
+        stat_features = np.array([
+            mean_val / 255.0,
+            std_val / 128.0,
+            (max_val - min_val) / 255.0,
+            median_val / 255.0,
+            skewness,
+            kurtosis,
+            energy,
+            entropy / 8.0
+        ])
+        
+        # One gradient pass: both 3x3 Sobel derivatives (exact in int16)
+        gx, gy = cv2.spatialGradient(image)
+        Gx = gx.astype(np.float64)
+        Gy = gy.astype(np.float64)
+        magnitude = np.sqrt(Gx**2 + Gy**2)
+        direction = np.arctan2(Gy, Gx)
+        
+        texture_features = np.array([
+            np.mean(magnitude),
+            np.std(magnitude),
+            np.max(magnitude),
+            np.mean(np.abs(direction)),
+            np.std(direction),
+        ])
+        texture_features = texture_features / (np.max(np.abs(texture_features)) + 1e-10)
+        
+        return np.concatenate([hist_features, texture_features, stat_features])
+    
+    @staticmethod
+    def benchmark_feature_extraction(image: Optional[np.ndarray] = None,
+                                     repeats: int = 5) -> dict:
+        """
+        ML 2.6: Time extract_combined_features with and without fusion
+        
+        Args:
+            image: Grayscale uint8 image (default: random 1024x1024)
+            repeats: Runs per method (best time is kept)
+            
+        Returns:
+            Dict with 'separate' and 'fused' seconds and their 'speedup'
+        """
+        if image is None:
+            image = np.random.default_rng(0).integers(0, 256, (1024, 1024), dtype=np.uint8)
+        
+        results = {}
+        for name, fused in (('separate', False), ('fused', True)):
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                MLImageProcessor.extract_combined_features(image, fused=fused)
+                best = min(best, time.perf_counter() - start)
+            results[name] = best
+        results['speedup'] = results['separate'] / results['fused']
+        return results
+    
     @staticmethod
     def knn_classify(train_features: np.ndarray, train_labels: np.ndarray,
-                    test_feature: np.ndarray, k: int = 3) -> int:
+                    test_feature: np.ndarray, k: int = 3,
+                    weights: str = 'uniform',
+                    return_neighbors: bool = False) -> Union[int, np.ndarray, tuple]:
         """
         ML 3: K-Nearest Neighbors classification
         
         Args:
             train_features: Training feature vectors (n_samples, n_features)
             train_labels: Training labels (n_samples,)
-            test_feature: Test feature vector (n_features,)
+            test_feature: Test feature vector (n_features,) or query matrix
+                (n_queries, n_features)
             k: Number of neighbors
+            weights: 'uniform' (majority vote) or 'distance' (votes weighted
+                by 1 / distance)
+            return_neighbors: Also return neighbour indices and distances
             
         Returns:
-            Predicted label
-        """
-        # Calculate distances to all training samples
-        distances = np.sqrt(np.sum((train_features - test_feature) ** 2, axis=1))
+            Predicted label (int for one vector, array for a query matrix);
+            with return_neighbors, a tuple (labels, indices, distances) where
+            indices / distances are (k,) or (n_queries, k), nearest first
         
-        # Get k nearest neighbors
+        Query matrices are processed in cache-sized tiles of the distance
+        matrix (neighbors.block_knn). For repeated queries against the same
+        training set build a neighbors.KNNIndex once instead.
+        """
         k = min(k, len(train_labels))
-        nearest_indices = np.argsort(distances)[:k]
-        nearest_labels = train_labels[nearest_indices]
+        single = np.ndim(test_feature) == 1
+        
+        if single:
+            # Calculate distances to all training samples
+            distances = np.sqrt(np.sum((train_features - test_feature) ** 2, axis=1))
+            
+            # Get k nearest neighbors (partial sort)
+            distances, indices = top_k(distances[np.newaxis, :], k)
+        else:
+            queries = np.asarray(test_feature, dtype=np.float64)
+            distances, indices = block_knn(queries, np.asarray(train_features, dtype=np.float64), k)
         
-        # Majority voting
-        unique_labels, counts = np.unique(nearest_labels, return_counts=True)
-        predicted_label = unique_labels[np.argmax(counts)]
+        # Majority (or distance-weighted) voting
+        labels = vote(np.asarray(train_labels)[indices], distances, weights)
         
-        return int(predicted_label)
+        if single:
+            labels, indices, distances = int(labels[0]), indices[0], distances[0]
+        if return_neighbors:
+            return labels, indices, distances
+        return labels
     
     @staticmethod
-    def pca_reduce(images: np.ndarray, n_components: int = 10) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    def pca_reduce(images: np.ndarray, n_components: int = 10,
+                   solver: str = 'auto') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
         ML 4: Principal Component Analysis for dimensionality reduction
         
         Args:
             images: Input images array (n_samples, height, width)
             n_components: Number of principal components
+            solver: 'covariance' (eigh of the pixel covariance), 'gram'
+                (eigh of the sample Gram matrix), 'svd' (thin SVD),
+                'randomized' (randomized SVD), or 'auto' to choose from the
+                data shape (see pca.choose_pca_solver)
             
         Returns:
             Tuple of (reduced features, principal components, mean image)
+        
+        Only the covariance solver builds an (n_pixels x n_pixels) matrix.
+        Every solver returns n_components components (at most n_pixels);
+        components beyond the data rank have zero variance and ~0 features.
         """
         # Flatten images
         n_samples = images.shape[0]
@@ -287,19 +497,8 @@ class MLImageProcessor:
         mean_img = np.mean(flattened, axis=0)
         centered = flattened - mean_img
         
-        # Compute covariance matrix
-        cov_matrix = np.cov(centered.T)
-        
-        # Compute eigenvalues and eigenvectors
-        eigenvalues, eigenvectors = np.linalg.eigh(cov_matrix)
-        
-        # Sort by eigenvalues (descending)
-        idx = np.argsort(eigenvalues)[::-1]
-        eigenvectors = eigenvectors[:, idx]
-        
-        # Select top n_components
-        n_components = min(n_components, eigenvectors.shape[1])
-        principal_components = eigenvectors[:, :n_components]
+        # Top n_components principal directions (columns)
+        principal_components = pca_components(centered, n_components, solver)
         
         # Project data onto principal components
         reduced = np.dot(centered, principal_components)
@@ -319,42 +518,111 @@ class MLImageProcessor:
             Tuple of (binary image, optimal threshold)
         """
         # Calculate histogram
-        hist, bin_edges = np.histogram(image.flatten(), bins=256, range=[0, 256])
-        hist = hist.astype(np.float64)
+        hist = intensity_histogram(image)
         
-        # Total number of pixels
-        total = hist.sum()
+        # Between-class variance of all 256 thresholds in one pass
+        best_threshold = int(MLImageProcessor.otsu_threshold_batch(hist)[0])
         
-        # Probability of each intensity
-        prob = hist / total
+        # Apply threshold
+        binary = (image > best_threshold).astype(np.uint8) * 255
         
-        # Class probabilities and means
-        best_threshold = 0
-        max_variance = 0
+        return binary, best_threshold
+    
+    @staticmethod
+    def otsu_threshold_batch(histograms: np.ndarray) -> np.ndarray:
+        """
+        ML 5.1: Otsu thresholds for many 256-bin histograms at once
         
-        for t in range(256):
-            # Class 1: pixels with intensity <= t
-            w0 = np.sum(prob[:t+1])
-            w1 = np.sum(prob[t+1:])
-            
-            if w0 == 0 or w1 == 0:
-                continue
-            
-            # Mean intensities
-            mu0 = np.sum(np.arange(t+1) * prob[:t+1]) / w0
-            mu1 = np.sum(np.arange(t+1, 256) * prob[t+1:]) / w1
-            
-            # Between-class variance
-            variance = w0 * w1 * (mu0 - mu1) ** 2
+        Uses cumulative moments: for threshold t, class 0 holds levels <= t,
+        w0 = c0 / N, mu0 = s0 / c0 with c0, s0 the cumulative count and
+        intensity sum. The between-class variance w0 * w1 * (mu0 - mu1)^2 is
+        evaluated for every t of every histogram in one vectorized pass.
+        
+        Args:
+            histograms: Histogram (256,) or batch of histograms (B, 256)
             
-            if variance > max_variance:
-                max_variance = variance
-                best_threshold = t
+        Returns:
+            Array (B,) of optimal thresholds (0 if no threshold separates
+            two non-empty classes)
+        """
+        hists = np.atleast_2d(np.asarray(histograms))
+        levels = np.arange(hists.shape[1])
+        
+        # Exact cumulative counts and intensity sums (integers for count data)
+        acc = np.int64 if np.issubdtype(hists.dtype, np.integer) else np.float64
+        count0 = np.cumsum(hists, axis=1, dtype=acc)
+        sum0 = np.cumsum(hists * levels, axis=1, dtype=acc)
+        total = count0[:, -1:]
+        count1 = total - count0
+        sum1 = sum0[:, -1:] - sum0
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mu0 = sum0 / count0
+            mu1 = sum1 / count1
+            variance = (count0 / total) * (count1 / total) * (mu0 - mu1) ** 2
+        variance[(count0 == 0) | (count1 == 0)] = 0
+        
+        # First threshold with the largest variance, 0 if none is positive
+        thresholds = np.argmax(variance, axis=1)
+        thresholds[variance.max(axis=1) <= 0] = 0
+        return thresholds
+    
+    @staticmethod
+    def multi_otsu_threshold(image: np.ndarray,
+                             n_thresholds: int = 2) -> Tuple[np.ndarray, List[int]]:
+        """
+        ML 5.3: Multi-level Otsu thresholding (2-4 thresholds)
         
-        # Apply threshold
-        binary = (image > best_threshold).astype(np.uint8) * 255
+        Maximizes the between-class variance sum_k S_k^2 / P_k over all
+        threshold combinations with dynamic programming on the 256-bin
+        histogram (P_k, S_k: pixel count and intensity sum of class k).
         
-        return binary, best_threshold
+        Args:
+            image: Input grayscale image
+            n_thresholds: Number of thresholds (1-4), giving n_thresholds + 1 classes
+            
+        Returns:
+            Tuple of (image with class k drawn at gray level k * 255 / n_thresholds,
+            list of thresholds; class k holds levels in (t[k-1], t[k]])
+        """
+        if not 1 <= n_thresholds <= 4:
+            raise ValueError(f"n_thresholds must be in [1, 4], got {n_thresholds}")
+        
+        hist = intensity_histogram(image)
+        levels = np.arange(256)
+        
+        # Cumulative moments with a leading 0: class (a, b] covers levels a..b-1
+        P = np.concatenate([[0], np.cumsum(hist)]).astype(np.float64)
+        S = np.concatenate([[0], np.cumsum(hist * levels)]).astype(np.float64)
+        
+        # score[a, b] = S^2 / P of the class (a, b]; invalid when a >= b
+        count = P[None, :] - P[:, None]
+        total = S[None, :] - S[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score = np.where(count > 0, total ** 2 / count, 0.0)
+        score[np.tril_indices(257)] = -np.inf
+        
+        # best[b]: best score of splitting levels 0..b-1 into m classes
+        best = score[0].copy()
+        choices = []
+        for _ in range(n_thresholds):
+            candidates = best[:, None] + score
+            choices.append(np.argmax(candidates, axis=0))
+            best = candidates.max(axis=0)
+        
+        # Backtrack class boundaries from the last level
+        boundary = 256
+        thresholds = []
+        for choice in reversed(choices):
+            boundary = int(choice[boundary])
+            thresholds.append(boundary - 1)
+        thresholds.reverse()
+        
+        # Draw classes at evenly spaced gray levels
+        classes = np.digitize(image, np.array(thresholds) + 1)
+        segmented = np.round(classes * 255 / n_thresholds).astype(np.uint8)
+        
+        return segmented, thresholds
     
     @staticmethod
     def adaptive_threshold_ml(image: np.ndarray, block_size: int = 15,
@@ -370,9 +638,12 @@ class MLImageProcessor:
         Returns:
             Binary image
         """
-        # Calculate local mean using convolution
+        # Calculate local mean using convolution. The direct method, not the
+        # planner: the threshold compares against the mean exactly, so its
+        # rounding must not depend on which method is fastest here
         kernel = np.ones((block_size, block_size), dtype=np.float64) / (block_size ** 2)
-        local_mean = ndimage.convolve(image.astype(np.float64), kernel)
+        local_mean = convolve(image, kernel, mode='reflect', flip=True,
+                              method='direct')
         
         # Apply adaptive threshold
         binary = (image > (local_mean - C)).astype(np.uint8) * 255
@@ -381,7 +652,9 @@ class MLImageProcessor:
     
     @staticmethod
     def detect_edges_ml(image: np.ndarray, low_threshold: float = 0.1,
-                       high_threshold: float = 0.3) -> np.ndarray:
+                       high_threshold: float = 0.3,
+                       timings: Optional[dict] = None,
+                       hysteresis: str = 'dilate') -> np.ndarray:
         """
         ML 6: Canny-like edge detection with automatic thresholds
         
@@ -389,12 +662,57 @@ class MLImageProcessor:
             image: Input grayscale image
             low_threshold: Low threshold ratio (relative to max gradient)
             high_threshold: High threshold ratio (relative to max gradient)
+            timings: Optional dict that receives the seconds spent in each
+                stage ('blur', 'gradient', 'nms', 'threshold', 'hysteresis')
+            hysteresis: 'dilate' (3 dilation steps, weak edges up to 3 pixels
+                from a strong edge) or 'exact' (every weak edge connected to
+                a strong edge), see hysteresis_edges
             
         Returns:
             Edge map
         """
+        strong, weak = MLImageProcessor.edge_masks(image, low_threshold, high_threshold,
+                                                   timings)
+        
+        # Hysteresis: connect weak edges to strong edges
+        start = time.perf_counter()
+        edges = MLImageProcessor.hysteresis_edges(strong, weak, hysteresis)
+        if timings is not None:
+            timings['hysteresis'] = time.perf_counter() - start
+        
+        return edges
+    
+    @staticmethod
+    def edge_masks(image: np.ndarray, low_threshold: float = 0.1,
+                   high_threshold: float = 0.3,
+                   timings: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ML 6.0: Strong and weak edge pixels, the stages of detect_edges_ml
+        before hysteresis (blur, gradient, non-maximum suppression, double
+        thresholding)
+        
+        Args:
+            image: Input grayscale image
+            low_threshold: Low threshold ratio (relative to max gradient)
+            high_threshold: High threshold ratio (relative to max gradient)
+            timings: Optional dict that receives the seconds spent in each
+                stage ('blur', 'gradient', 'nms', 'threshold')
+            
+        Returns:
+            Tuple of boolean masks (strong, weak)
+        """
+        clock = time.perf_counter()
+        
+        def lap(stage):
+            nonlocal clock
+            now = time.perf_counter()
+            if timings is not None:
+                timings[stage] = now - clock
+            clock = now
+        
         # Gaussian blur
         blurred = cv2.GaussianBlur(image, (5, 5), 1.4)
+        lap('blur')
         
         # Calculate gradients
         Gx = cv2.Sobel(blurred, cv2.CV_64F, 1, 0, ksize=3)
@@ -403,40 +721,62 @@ class MLImageProcessor:
         # Gradient magnitude and direction
         magnitude = np.sqrt(Gx**2 + Gy**2)
         direction = np.arctan2(Gy, Gx)
+        lap('gradient')
         
         # Non-maximum suppression
-        rows, cols = image.shape
-        suppressed = np.zeros_like(magnitude)
-        
-        # Discretize direction to 0, 45, 90, 135 degrees
-        angle = np.rad2deg(direction) % 180
-        
-        for i in range(1, rows-1):
-            for j in range(1, cols-1):
-                # Determine neighboring pixels based on gradient direction
-                if (0 <= angle[i, j] < 22.5) or (157.5 <= angle[i, j] <= 180):
-                    n1, n2 = magnitude[i, j-1], magnitude[i, j+1]
-                elif 22.5 <= angle[i, j] < 67.5:
-                    n1, n2 = magnitude[i-1, j+1], magnitude[i+1, j-1]
-                elif 67.5 <= angle[i, j] < 112.5:
-                    n1, n2 = magnitude[i-1, j], magnitude[i+1, j]
-                else:
-                    n1, n2 = magnitude[i-1, j-1], magnitude[i+1, j+1]
-                
-                # Keep pixel if it's local maximum
-                if magnitude[i, j] >= n1 and magnitude[i, j] >= n2:
-                    suppressed[i, j] = magnitude[i, j]
+        suppressed = MLImageProcessor.non_maximum_suppression(magnitude, direction)
+        lap('nms')
         
         # Double thresholding
         max_mag = np.max(suppressed)
         low_thresh = low_threshold * max_mag
         high_thresh = high_threshold * max_mag
         
-        edges = np.zeros_like(image, dtype=np.uint8)
         strong = suppressed >= high_thresh
         weak = (suppressed >= low_thresh) & (suppressed < high_thresh)
+        lap('threshold')
         
-        # Hysteresis: connect weak edges to strong edges
+        return strong, weak
+    
+    @staticmethod
+    def hysteresis_edges(strong: np.ndarray, weak: np.ndarray,
+                         method: str = 'dilate') -> np.ndarray:
+        """
+        ML 6.2: Hysteresis edge tracking
+        
+        'dilate' grows the strong edges by three 3x3 dilations restricted to
+        weak pixels, so weak chains further than 3 pixels from a strong edge
+        are cut off. 'exact' labels the 8-connected components of strong | weak
+        once and keeps every component that contains a strong pixel.
+        
+        Args:
+            strong: Boolean mask of pixels above the high threshold
+            weak: Boolean mask of pixels between the two thresholds
+            method: 'dilate' or 'exact'
+            
+        Returns:
+            Edge map (0 or 255, uint8)
+        """
+        if method == 'exact':
+            candidates = strong | weak
+            n_labels, labels = cv2.connectedComponents(candidates.view(np.uint8),
+                                                       connectivity=8)
+            
+            # Work on candidate pixels only (edges are sparse)
+            index = np.flatnonzero(candidates)
+            component = labels.ravel()[index]
+            
+            # Lookup table: component label -> contains a strong pixel
+            connected = np.zeros(n_labels, dtype=bool)
+            connected[component[strong.ravel()[index]]] = True
+            
+            edges = np.zeros(strong.shape, dtype=np.uint8)
+            edges.ravel()[index[connected[component]]] = 255
+            return edges
+        if method != 'dilate':
+            raise ValueError(f"Unknown hysteresis method: {method}")
+        
+        edges = np.zeros(strong.shape, dtype=np.uint8)
         edges[strong] = 255
         
         # Simple hysteresis using dilation
@@ -446,6 +786,100 @@ class MLImageProcessor:
         
         return edges
     
+    @staticmethod
+    def benchmark_hysteresis(shapes: Tuple[Tuple[int, int], ...] = ((1080, 1920), (2160, 3840)),
+                             repeats: int = 3,
+                             image: Optional[np.ndarray] = None) -> dict:
+        """
+        ML 6.3: Time the 'dilate' and 'exact' hysteresis methods
+        
+        Computes the strong / weak masks of an image of each shape (1080p
+        and 4K by default) with edge_masks, the stages detect_edges_ml runs
+        before hysteresis, then times both hysteresis_edges methods on them.
+        
+        Args:
+            shapes: Image shapes (rows, cols) to benchmark
+            repeats: Runs per method (best time is kept)
+            image: Grayscale image resized to each shape (default: a
+                synthetic scene)
+            
+        Returns:
+            Dict shape -> {'dilate': seconds, 'exact': seconds,
+            'extra_edges': fraction of pixels only the exact method marks}
+        """
+        rng = np.random.default_rng(0)
+        results = {}
+        for rows, cols in shapes:
+            if image is not None:
+                frame = cv2.resize(image, (cols, rows), interpolation=cv2.INTER_CUBIC)
+            else:
+                # Smooth random scene with texture so both masks are non-trivial
+                scene = cv2.resize(rng.random((rows // 40 + 2, cols // 40 + 2)), (cols, rows),
+                                   interpolation=cv2.INTER_CUBIC)
+                scene += rng.normal(0, 0.05, (rows, cols))
+                frame = cv2.normalize(scene, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+            
+            strong, weak = MLImageProcessor.edge_masks(frame)
+            
+            entry = {}
+            for method in ('dilate', 'exact'):
+                best = float('inf')
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    edges = MLImageProcessor.hysteresis_edges(strong, weak, method)
+                    best = min(best, time.perf_counter() - start)
+                entry[method] = best
+                entry[method + '_edges'] = edges
+            entry['extra_edges'] = float(np.mean(entry.pop('exact_edges') > entry.pop('dilate_edges')))
+            results[(rows, cols)] = entry
+        return results
+    
+    @staticmethod
+    def non_maximum_suppression(magnitude: np.ndarray,
+                                direction: np.ndarray) -> np.ndarray:
+        """
+        ML 6.1: Non-maximum suppression for edge thinning
+        
+        Gradient directions are quantized to 0, 45, 90 and 135 degrees and each
+        interior pixel is compared with its two neighbours along the gradient,
+        using shifted views of the magnitude instead of a per-pixel loop.
+        
+        Args:
+            magnitude: Gradient magnitude
+            direction: Gradient direction in radians
+            
+        Returns:
+            Magnitude where it is a local maximum along the gradient, else 0
+            (border pixels are always 0)
+        """
+        rows, cols = magnitude.shape
+        suppressed = np.zeros_like(magnitude)
+        if rows < 3 or cols < 3:
+            return suppressed
+        
+        # Discretize direction to 0, 45, 90, 135 degrees
+        angle = np.rad2deg(direction[1:-1, 1:-1]) % 180
+        center = magnitude[1:-1, 1:-1]
+        
+        def shifted(di, dj):
+            return magnitude[1 + di:rows - 1 + di, 1 + dj:cols - 1 + dj]
+        
+        # (neighbour 1, neighbour 2) offsets for each direction bin
+        bins = [
+            ((angle < 22.5) | (angle >= 157.5), (0, -1), (0, 1)),
+            ((angle >= 22.5) & (angle < 67.5), (-1, 1), (1, -1)),
+            ((angle >= 67.5) & (angle < 112.5), (-1, 0), (1, 0)),
+            ((angle >= 112.5) & (angle < 157.5), (-1, -1), (1, 1)),
+        ]
+        
+        keep = np.zeros(center.shape, dtype=bool)
+        for in_bin, offset1, offset2 in bins:
+            keep |= in_bin & (center >= shifted(*offset1)) & (center >= shifted(*offset2))
+        
+        # Keep pixel if it's local maximum
+        suppressed[1:-1, 1:-1] = np.where(keep, center, 0)
+        return suppressed
+    
     @staticmethod
     def morphological_operations(image: np.ndarray, operation: str = 'erosion',
                                  kernel_size: int = 3) -> np.ndarray:
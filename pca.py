@@ -0,0 +1,323 @@
+"""
+PCA Solvers
+Principal components for MLImageProcessor.pca_reduce (ML 4) without
+forming the (n_pixels x n_pixels) covariance matrix when it is large:
+- covariance: eigh of the pixel covariance (original method, small images)
+- gram: eigh of the (n_samples x n_samples) Gram matrix, for n_samples << n_pixels
+- svd: thin SVD of the centered data
+- randomized: randomized SVD (Halko et al.) for a few top components
+- IncrementalPCA: out-of-core fitting over image batches or directories,
+  with checkpoints and transform of new images
+
+choose_pca_solver picks one from the data shape. Component signs are
+arbitrary for every solver, as with eigh.
+"""
+
+import itertools
+import os
+import numpy as np
+import cv2
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+
+# Largest pixel count for which the covariance matrix is formed (32 MB)
+COVARIANCE_MAX_PIXELS = 2048
+
+# Randomized SVD is used when the components wanted are at most this
+# fraction of min(n_samples, n_pixels) and that rank is large
+RANDOMIZED_MAX_FRACTION = 0.1
+RANDOMIZED_MIN_RANK = 500
+
+PCA_SOLVERS = ('covariance', 'gram', 'svd', 'randomized')
+
+
+def choose_pca_solver(n_samples: int, n_pixels: int, n_components: int) -> str:
+    """
+    Cheapest solver for a data shape
+
+    Args:
+        n_samples: Number of images
+        n_pixels: Pixels per image
+        n_components: Components wanted
+
+    Returns:
+        Solver name (one of PCA_SOLVERS)
+    """
+    rank = min(n_samples, n_pixels)
+    if n_pixels <= COVARIANCE_MAX_PIXELS and n_samples >= n_pixels:
+        return 'covariance'
+    if rank >= RANDOMIZED_MIN_RANK and n_components <= RANDOMIZED_MAX_FRACTION * rank:
+        return 'randomized'
+    if n_samples < n_pixels:
+        return 'gram'
+    return 'svd'
+
+
+def _covariance_components(centered: np.ndarray, n_components: int) -> np.ndarray:
+    cov_matrix = np.cov(centered.T)
+    eigenvalues, eigenvectors = np.linalg.eigh(cov_matrix)
+    idx = np.argsort(eigenvalues)[::-1]
+    return eigenvectors[:, idx[:n_components]]
+
+
+def _gram_components(centered: np.ndarray, n_components: int) -> np.ndarray:
+    # X X^T u = s^2 u  <=>  X^T X v = s^2 v with v = X^T u / s
+    gram = centered @ centered.T
+    eigenvalues, eigenvectors = np.linalg.eigh(gram)
+    idx = np.argsort(eigenvalues)[::-1]
+    eigenvalues, eigenvectors = eigenvalues[idx], eigenvectors[:, idx]
+
+    # Centering leaves at most n_samples - 1 non-zero directions
+    tol = max(eigenvalues[0], 0) * max(centered.shape) * np.finfo(np.float64).eps
+    rank = int(np.sum(eigenvalues > tol))
+    n_components = min(n_components, rank)
+    components = centered.T @ eigenvectors[:, :n_components]
+    return components / np.sqrt(eigenvalues[:n_components])
+
+
+def _svd_components(centered: np.ndarray, n_components: int) -> np.ndarray:
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    return vt[:n_components].T
+
+
+def _randomized_components(centered: np.ndarray, n_components: int,
+                           oversample: int = 10, power_iterations: int = 4,
+                           seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    size = min(n_components + oversample, min(centered.shape))
+
+    # Orthonormal basis of the range of X, refined by power iterations
+    # (X X^T)^q X. Products are written as basis^T X so the large matrix
+    # is read row by row; the QR factorizations stay (n_samples x size).
+    basis, _ = np.linalg.qr(centered @ rng.standard_normal((centered.shape[1], size)))
+    for _ in range(power_iterations):
+        basis, _ = np.linalg.qr(centered @ (basis.T @ centered).T)
+
+    _, _, vt = np.linalg.svd(basis.T @ centered, full_matrices=False)
+    return vt[:n_components].T
+
+
+def _complete_basis(components: np.ndarray, n_columns: int,
+                    seed: int = 0) -> np.ndarray:
+    """
+    Extend orthonormal columns to n_columns with directions orthogonal to
+    them. When the columns span the data, the added directions carry zero
+    variance, like the trailing eigenvectors of a rank-deficient covariance.
+    """
+    n_pixels, k = components.shape
+    if k >= n_columns:
+        return components
+    rng = np.random.default_rng(seed)
+    extra = rng.standard_normal((n_pixels, n_columns - k))
+    for _ in range(2):  # Second pass restores orthogonality lost to rounding
+        extra -= components @ (components.T @ extra)
+        extra, _ = np.linalg.qr(extra)
+    return np.hstack([components, extra])
+
+
+def pca_components(centered: np.ndarray, n_components: int,
+                   solver: str = 'auto') -> np.ndarray:
+    """
+    Top principal directions of centered data
+
+    Args:
+        centered: (n_samples, n_pixels) data with zero column means
+        n_components: Number of components
+        solver: One of PCA_SOLVERS, or 'auto'
+
+    Returns:
+        (n_pixels, min(n_components, n_pixels)) orthonormal columns, largest
+        variance first, whatever the solver. Beyond the data rank (at most
+        n_samples - 1 after centering) the columns are zero-variance
+        directions, as the covariance solver's trailing eigenvectors are.
+    """
+    n_samples, n_pixels = centered.shape
+    if solver == 'auto':
+        solver = choose_pca_solver(n_samples, n_pixels, n_components)
+
+    n_columns = min(n_components, n_pixels)
+    if solver == 'covariance':
+        return _covariance_components(centered, n_columns)
+    n_components = min(n_components, n_samples, n_pixels)
+    if solver == 'gram':
+        components = _gram_components(centered, n_components)
+    elif solver == 'svd':
+        components = _svd_components(centered, n_components)
+    elif solver == 'randomized':
+        components = _randomized_components(centered, n_components)
+    else:
+        raise ValueError(f"Unknown PCA solver: {solver}")
+    return _complete_basis(components, n_columns)
+
+
+# File types read by IncrementalPCA.fit from a directory
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def iter_image_files(directory: str) -> Iterator[np.ndarray]:
+    """Grayscale images of a directory, in sorted file name order"""
+    names = sorted(name for name in os.listdir(directory)
+                   if name.lower().endswith(IMAGE_EXTENSIONS))
+    for name in names:
+        image = cv2.imread(os.path.join(directory, name), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise ValueError(f"Cannot read image: {name}")
+        yield image
+
+
+class IncrementalPCA:
+    """
+    PCA fitted one batch of images at a time (Ross et al., 2008)
+
+    Keeps only the mean, the top components with their singular values and
+    the sample count; each batch is merged by a thin SVD of
+    [diag(S) V^T; batch - batch mean; mean correction row], so memory is
+    O((n_components + batch_size) x n_pixels) however many images are seen.
+
+    Example:
+        ipca = IncrementalPCA(n_components=20)
+        ipca.fit('frames/', batch_size=256, checkpoint='eigen.npz')
+        reduced = ipca.transform(new_images)
+    """
+
+    def __init__(self, n_components: int = 10):
+        self.n_components = n_components
+        self.n_samples_seen = 0
+        self.image_shape: Optional[Tuple[int, ...]] = None
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None  # (n_pixels, k) columns
+        self.singular_values: Optional[np.ndarray] = None
+
+    @property
+    def explained_variance(self) -> np.ndarray:
+        """Variance of the data along each component"""
+        return self.singular_values ** 2 / max(self.n_samples_seen - 1, 1)
+
+    def partial_fit(self, images: np.ndarray) -> 'IncrementalPCA':
+        """
+        Update the mean and components with one batch
+
+        Args:
+            images: (batch, height, width) array (or (batch, n_pixels))
+
+        Returns:
+            self
+        """
+        images = np.asarray(images)
+        if self.image_shape is None:
+            self.image_shape = images.shape[1:]
+        elif images.shape[1:] != self.image_shape:
+            raise ValueError(f"Image shape {images.shape[1:]} does not match "
+                             f"{self.image_shape} of the fitted images")
+        batch = images.reshape(len(images), -1).astype(np.float64)
+        if len(batch) == 0:
+            return self
+
+        n_old, n_new = self.n_samples_seen, len(batch)
+        n_total = n_old + n_new
+        batch_mean = batch.mean(axis=0)
+
+        if n_old == 0:
+            stacked = batch - batch_mean
+            mean = batch_mean
+        else:
+            # Previous data summarized by its components, plus a row that
+            # accounts for the shift between the two means
+            correction = np.sqrt(n_old * n_new / n_total) * (self.mean - batch_mean)
+            stacked = np.vstack([self.singular_values[:, np.newaxis] * self.components.T,
+                                 batch - batch_mean,
+                                 correction])
+            mean = self.mean + (batch_mean - self.mean) * (n_new / n_total)
+
+        _, singular_values, vt = np.linalg.svd(stacked, full_matrices=False)
+        k = min(self.n_components, len(singular_values))
+        self.mean = mean
+        self.components = vt[:k].T
+        self.singular_values = singular_values[:k]
+        self.n_samples_seen = n_total
+        return self
+
+    def fit(self, source: Union[str, Iterable[np.ndarray]], batch_size: int = 256,
+            checkpoint: Optional[str] = None, checkpoint_every: int = 10,
+            resume: bool = False) -> 'IncrementalPCA':
+        """
+        Fit over a directory of image files or any iterable of images
+
+        Args:
+            source: Directory path or iterable of (height, width) images
+            batch_size: Images per partial_fit (at least n_components for
+                the first batch to produce all components)
+            checkpoint: .npz file the state is saved to every checkpoint_every
+                batches and at the end
+            checkpoint_every: Batches between checkpoints
+            resume: Load checkpoint if it exists and skip the images it has
+                already seen (the source must yield them in the same order)
+
+        Returns:
+            self
+        """
+        if resume and checkpoint and os.path.exists(checkpoint):
+            self.__dict__.update(IncrementalPCA.load(checkpoint).__dict__)
+        images = iter_image_files(source) if isinstance(source, str) else iter(source)
+        images = itertools.islice(images, self.n_samples_seen if resume else 0, None)
+
+        batches = 0
+        while True:
+            batch = list(itertools.islice(images, batch_size))
+            if not batch:
+                break
+            self.partial_fit(np.stack(batch))
+            batches += 1
+            if checkpoint and batches % checkpoint_every == 0:
+                self.save(checkpoint)
+
+        if checkpoint:
+            self.save(checkpoint)
+        return self
+
+    def transform(self, images: np.ndarray) -> np.ndarray:
+        """
+        Project images onto the fitted components (no refitting)
+
+        Args:
+            images: (n, height, width) array or a single (height, width) image
+
+        Returns:
+            (n, n_components) reduced features
+        """
+        if self.components is None:
+            raise ValueError("IncrementalPCA has not been fitted")
+        images = np.asarray(images)
+        if images.shape == self.image_shape:
+            images = images[np.newaxis]
+        flattened = images.reshape(len(images), -1).astype(np.float64)
+        return (flattened - self.mean) @ self.components
+
+    def inverse_transform(self, reduced: np.ndarray) -> np.ndarray:
+        """Images reconstructed from reduced features, (n, height, width)"""
+        flattened = np.asarray(reduced) @ self.components.T + self.mean
+        return flattened.reshape((len(flattened),) + tuple(self.image_shape))
+
+    def save(self, path: str) -> None:
+        """Write the fitted state to an .npz file (atomically)"""
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez(f, n_components=self.n_components,
+                     n_samples_seen=self.n_samples_seen,
+                     image_shape=np.array(self.image_shape or (), dtype=np.int64),
+                     mean=self.mean, components=self.components,
+                     singular_values=self.singular_values)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def load(path: str) -> 'IncrementalPCA':
+        """Restore a state written by save"""
+        with np.load(path, allow_pickle=False) as data:
+            ipca = IncrementalPCA(int(data['n_components']))
+            ipca.n_samples_seen = int(data['n_samples_seen'])
+            if ipca.n_samples_seen:
+                ipca.image_shape = tuple(int(n) for n in data['image_shape'])
+                ipca.mean = data['mean']
+                ipca.components = data['components']
+                ipca.singular_values = data['singular_values']
+        return ipca
@@ -0,0 +1,264 @@
+"""
+Operation Pipeline
+Chains ImageProcessor / MLImageProcessor operations and plans how to run
+them, instead of calling each method on the previous uint8 result:
+- Adjacent point operations (contrast stretching, clipping, equalization,
+  matching, and the negative / log / gamma transforms of point_ops) are
+  fused into one 256-entry lookup table, built from a single histogram of
+  the stage input (see point_ops)
+- Linear / neighbourhood operations (average filter, Laplacian, LoG,
+  sharpening, Sobel, Prewitt) keep their output in float32, clipped to
+  [0, 255] but not truncated, and feed it to the next such stage; it is
+  converted to uint8 only where an operation needs uint8 input or at the end
+- float32 and uint8 work buffers are allocated once per image shape and
+  reused by later stages and later calls; only the most recent
+  BUFFER_SHAPES shapes are kept, so a stream of differently sized images
+  does not accumulate buffers
+
+Example:
+    pipe = Pipeline(['contrast_stretching', 'histogram_equalization',
+                     ('sharpen_image', {'method': 'laplacian'})])
+    result = pipe(image)
+    pipe.describe()  # ['lut(contrast_stretching + histogram_equalization)',
+                     #  'float32(sharpen_image)']
+
+With precision='uint8' every stage's output is rounded as the methods do,
+and the result is identical to calling them one after another. A Pipeline
+reuses its buffers, so one instance should not be run from several
+threads at once.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import cv2
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+from image_processing import ImageProcessor
+from ml_processing import MLImageProcessor
+from histogram import intensity_histogram
+from point_ops import POINT_OPS, apply_lut, apply_point_ops, compile_chain
+
+
+# scipy.ndimage boundary modes used by the methods, as OpenCV border types
+_REFLECT = cv2.BORDER_REFLECT        # 'reflect':  c b a | a b c d | d c b
+_NEAREST = cv2.BORDER_REPLICATE      # 'nearest':  a a a | a b c d | d d d
+
+_LAPLACIAN_4 = np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]], dtype=np.float32)
+_LAPLACIAN_8 = np.array([[1, 1, 1], [1, -8, 1], [1, 1, 1]], dtype=np.float32)
+# Flipped, since the methods use true convolution and filter2D correlates
+_SOBEL = (np.array([[1, 0, -1], [2, 0, -2], [1, 0, -1]], dtype=np.float32),
+          np.array([[1, 2, 1], [0, 0, 0], [-1, -2, -1]], dtype=np.float32))
+_PREWITT = (np.array([[1, 0, -1], [1, 0, -1], [1, 0, -1]], dtype=np.float32),
+            np.array([[1, 1, 1], [0, 0, 0], [-1, -1, -1]], dtype=np.float32))
+
+
+def _average(src, out, tmp, kernel_size=3):
+    return cv2.blur(src, (kernel_size, kernel_size), dst=out, borderType=_NEAREST)
+
+
+def _laplacian(kernel):
+    def stage(src, out, tmp):
+        cv2.filter2D(src, cv2.CV_32F, kernel, dst=out, borderType=_REFLECT)
+        return np.abs(out, out=out)
+    return stage
+
+
+def _log(src, out, tmp, sigma=1.4):
+    cv2.GaussianBlur(src, (5, 5), sigma, dst=tmp)
+    cv2.filter2D(tmp, cv2.CV_32F, _LAPLACIAN_8, dst=out, borderType=_REFLECT)
+    return np.abs(out, out=out)
+
+
+def _sharpen(src, out, tmp, method='laplacian'):
+    if method == 'laplacian':
+        smoothed = src
+    elif method == 'log':
+        smoothed = cv2.GaussianBlur(src, (5, 5), 1.4, dst=tmp)
+    else:
+        raise ValueError(f"Unknown sharpening method: {method}")
+    cv2.filter2D(smoothed, cv2.CV_32F, _LAPLACIAN_8, dst=out, borderType=_REFLECT)
+    return np.subtract(src, out, out=out)
+
+
+def _gradient(kernels):
+    def stage(src, out, tmp):
+        cv2.filter2D(src, cv2.CV_32F, kernels[0], dst=tmp, borderType=_REFLECT)
+        cv2.filter2D(src, cv2.CV_32F, kernels[1], dst=out, borderType=_REFLECT)
+        return cv2.magnitude(tmp, out, out)
+    return stage
+
+
+# Method name -> float32 stage(src, out, tmp, **parameters). src is float32;
+# out and tmp are free float32 buffers of the same shape.
+FLOAT_STAGES: Dict[str, Callable[..., np.ndarray]] = {
+    'average_filter': _average,
+    'laplacian_4_neighbor': _laplacian(_LAPLACIAN_4),
+    'laplacian_8_neighbor': _laplacian(_LAPLACIAN_8),
+    'laplacian_of_gaussian': _log,
+    'sharpen_image': _sharpen,
+    'sobel_edge_detection': _gradient(_SOBEL),
+    'prewitt_edge_detection': _gradient(_PREWITT),
+}
+
+PRECISIONS = ('float32', 'uint8')
+
+# Image shapes whose work buffers are kept (least recently used dropped)
+BUFFER_SHAPES = 2
+
+Step = Union[str, Callable, Tuple[Union[str, Callable], Dict[str, Any]]]
+
+
+def _resolve(operation: Union[str, Callable]) -> Tuple[str, Callable, bool]:
+    """
+    (name, function, is a processor method) of an operation given by name or
+    function; only processor methods are fused or run in float32
+    """
+    if callable(operation):
+        name = getattr(operation, '__name__', repr(operation))
+        candidates = (operation, getattr(operation, '__wrapped__', None))
+        known = any(getattr(processor, name, None) in candidates
+                    for processor in (ImageProcessor, MLImageProcessor))
+        return name, operation, known
+    for processor in (ImageProcessor, MLImageProcessor):
+        func = getattr(processor, operation, None)
+        if callable(func):
+            return operation, func, True
+    if operation in POINT_OPS:
+        def point_op(image, **params):
+            return apply_point_ops(image, [(operation, params)])
+        point_op.__name__ = operation
+        return operation, point_op, True
+    raise ValueError(f"Unknown operation: {operation}")
+
+
+class Pipeline:
+    """
+    A planned chain of image operations
+
+    Args:
+        steps: Operations in order; each a method name of ImageProcessor /
+            MLImageProcessor, a function taking the image first, or a
+            (name or function, keyword arguments) pair. Operations returning
+            a tuple, e.g. (image, histogram), pass on the first element.
+        precision: 'float32' keeps linear stage outputs unrounded between
+            stages; 'uint8' reproduces the methods' rounding exactly
+        fuse: Fuse adjacent point operations into one lookup table
+    """
+
+    def __init__(self, steps: Sequence[Step], precision: str = 'float32',
+                 fuse: bool = True):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.precision = precision
+        self.fuse = fuse
+        self.steps: List[Tuple[str, Callable, Dict[str, Any]]] = []
+        known = []
+        for step in steps:
+            operation, kwargs = step if isinstance(step, tuple) else (step, {})
+            name, func, is_method = _resolve(operation)
+            self.steps.append((name, func, dict(kwargs)))
+            known.append(is_method)
+        self.stages = self._plan(known)
+        self._buffers: 'OrderedDict[Tuple[int, ...], Dict[str, Any]]' = OrderedDict()
+
+    def _plan(self, known: List[bool]) -> List[Tuple[str, list]]:
+        """Group steps into ('lut', [...]), ('float', [step]) and ('call', [step])"""
+        stages = []
+        for (name, func, kwargs), is_method in zip(self.steps, known):
+            if not is_method:
+                stages.append(('call', [(name, func, kwargs)]))
+            elif self.fuse and name in POINT_OPS:
+                if stages and stages[-1][0] == 'lut':
+                    stages[-1][1].append((name, func, kwargs))
+                else:
+                    stages.append(('lut', [(name, func, kwargs)]))
+            elif self.precision == 'float32' and name in FLOAT_STAGES:
+                stages.append(('float', [(name, func, kwargs)]))
+            else:
+                stages.append(('call', [(name, func, kwargs)]))
+        return stages
+
+    def describe(self) -> List[str]:
+        """One line per planned stage"""
+        kinds = {'lut': 'lut', 'float': 'float32', 'call': 'call'}
+        return [f"{kinds[kind]}({' + '.join(name for name, _, _ in steps)})"
+                for kind, steps in self.stages]
+
+    def _work_buffers(self, shape: Tuple[int, ...]) -> Dict[str, Any]:
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            buffers = {'float': [np.empty(shape, dtype=np.float32) for _ in range(3)],
+                       'uint8': [np.empty(shape, dtype=np.uint8) for _ in range(2)]}
+            self._buffers[shape] = buffers
+            while len(self._buffers) > BUFFER_SHAPES:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(shape)
+        return buffers
+
+    def _owned(self, array: np.ndarray) -> bool:
+        """Whether array is one of this pipeline's work buffers"""
+        buffers = self._buffers.get(array.shape)
+        return buffers is not None and any(array is buffer for buffer
+                                           in buffers['float'] + buffers['uint8'])
+
+    def _to_uint8(self, image: np.ndarray) -> np.ndarray:
+        """Round a (clipped) float32 stage output as the methods do (truncate)"""
+        if image.dtype != np.float32 or not self._owned(image):
+            return image
+        out = self._work_buffers(image.shape)['uint8'][0]
+        np.copyto(out, image, casting='unsafe')
+        return out
+
+    def _run_lut(self, image: np.ndarray, steps: list) -> np.ndarray:
+        image = self._to_uint8(image)
+        if image.dtype != np.uint8:
+            raise ValueError(f"Point operations need a uint8 image, got {image.dtype}")
+        hist = intensity_histogram(image)
+        lut = compile_chain([(name, kwargs) for name, _, kwargs in steps], hist)
+        buffers = self._work_buffers(image.shape)['uint8']
+        out = buffers[1] if image is buffers[0] else buffers[0]
+        return apply_lut(image, lut, out=out)
+
+    def _run_float(self, image: np.ndarray, step) -> np.ndarray:
+        name, _, kwargs = step
+        buffers = self._work_buffers(image.shape)['float']
+        if image.dtype != np.float32 or not self._owned(image):
+            np.copyto(buffers[0], image, casting='unsafe')
+            image = buffers[0]
+        out, tmp = [b for b in buffers if b is not image][:2]
+        result = FLOAT_STAGES[name](image, out, tmp, **kwargs)
+        # Same range as the method's output, without rounding to integers
+        return np.clip(result, 0, 255, out=result)
+
+    def __call__(self, image: np.ndarray) -> np.ndarray:
+        """
+        Run the pipeline
+
+        Args:
+            image: Input image (uint8 for point and most other operations)
+
+        Returns:
+            Output image (uint8 unless the last operation returns another type)
+        """
+        current = np.asarray(image)
+        for kind, steps in self.stages:
+            if kind == 'lut':
+                current = self._run_lut(current, steps)
+            elif kind == 'float':
+                current = self._run_float(current, steps[0])
+            else:
+                name, func, kwargs = steps[0]
+                current = func(self._to_uint8(current), **kwargs)
+                if isinstance(current, tuple):
+                    current = current[0]
+
+        # Never hand out a work buffer: the next call would overwrite it
+        if not self._owned(current):
+            return current
+        if current.dtype == np.float32:
+            return current.astype(np.uint8)
+        return current.copy()
+
+    run = __call__
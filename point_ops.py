@@ -0,0 +1,318 @@
+"""
+Point Operations
+Per-intensity mappings of uint8 images compiled to 256-entry lookup tables:
+- The ImageProcessor point operations (Bài 4-6: contrast stretching,
+  clipping, equalization, histogram matching) and the negative, log,
+  inverse-log and gamma transforms of image_processing_app.py
+- Each operation is written once, elementwise; it is evaluated on the 256
+  intensities to compile a table, which cv2.LUT / np.take then apply. Image
+  dependent operations take their statistics (occupied range, CDF) from
+  the image histogram
+- Chains compile to a single table: the histogram is pushed through each
+  table in turn, so a chain costs one histogram and one lookup pass
+
+Every operation reproduces the arithmetic of the method it replaces
+(including its uint8 wrap-around), so the table gives exactly the same
+output.
+"""
+
+import time
+import numpy as np
+import cv2
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from histogram import intensity_histogram
+
+# All intensities, the "image" a table is computed on
+LEVELS = np.arange(256, dtype=np.uint8)
+
+
+def _present(hist: Optional[np.ndarray]) -> np.ndarray:
+    """Intensities that occur in the image"""
+    if hist is None:
+        raise ValueError("This point operation needs the image histogram")
+    return LEVELS[np.asarray(hist)[:256] > 0]
+
+
+def _stretch(values: np.ndarray, r_min, r_max) -> np.ndarray:
+    # Same expression as ImageProcessor.contrast_stretching
+    if r_max == r_min:
+        return values
+    return ((values - r_min) / (r_max - r_min) * 255).astype(np.uint8)
+
+
+# ----- Operations: f(values, hist, **parameters), elementwise on values -----
+
+def _contrast_stretching(values, hist, r_min=None, r_max=None):
+    if r_min is None:
+        r_min = np.min(_present(hist))
+    if r_max is None:
+        r_max = np.max(_present(hist))
+    return _stretch(values, r_min, r_max)
+
+
+def _contrast_clipping_type1(values, hist, low_threshold, high_threshold):
+    return _stretch(np.clip(values, low_threshold, high_threshold),
+                    low_threshold, high_threshold)
+
+
+def _contrast_clipping_type2(values, hist, dark_threshold=85, mid_threshold=170):
+    present = _present(hist)
+    result = np.zeros_like(values)
+    regions = [(lambda v: v <= dark_threshold, 0),
+               (lambda v: (v > dark_threshold) & (v <= mid_threshold), 85),
+               (lambda v: v > mid_threshold, 170)]
+    for in_region, offset in regions:
+        occupied = present[in_region(present)]
+        if len(occupied) == 0:
+            continue
+        low, high = np.min(occupied), np.max(occupied)
+        if high > low:
+            mask = in_region(values)
+            result[mask] = (offset + (values[mask] - low) / (high - low) * 85).astype(np.uint8)
+    return result
+
+
+def _equalization_table(hist: np.ndarray) -> np.ndarray:
+    if len(_present(hist)) <= 1:
+        return LEVELS.copy()  # Uniform image is returned unchanged
+
+    cdf = np.asarray(hist).cumsum()
+    cdf_masked = np.ma.masked_equal(cdf, 0)
+    cdf_normalized = (cdf_masked - cdf_masked.min()) * 255 / (cdf_masked.max() - cdf_masked.min())
+    return np.ma.filled(cdf_normalized, 0).astype(np.uint8)
+
+
+def _histogram_equalization(values, hist):
+    return _equalization_table(hist)[values]
+
+
+def _nearest_levels(cdf: np.ndarray) -> np.ndarray:
+    """
+    For every s in 0..255 the reference level whose normalized CDF is
+    closest to s, i.e. np.argmin(np.abs(cdf - s)) including its tie rule
+    (the lowest such level)
+    """
+    # Distances in the CDF's own precision, as cdf - s computes them
+    targets = np.arange(256).astype(cdf.dtype)
+    if not (np.all(np.isfinite(cdf)) and np.all(np.diff(cdf) >= 0)):
+        # Not a CDF (negative counts, empty reference): plain argmin
+        return np.abs(cdf[None, :] - targets[:, None]).argmin(axis=1).astype(np.uint8)
+
+    # A sorted CDF has its closest value on either side of s: the last value
+    # below s or the first value at or above it
+    upper = np.minimum(np.searchsorted(cdf, targets, side='left'), len(cdf) - 1)
+    lower = np.maximum(upper - 1, 0)
+    use_lower = np.abs(cdf[lower] - targets) <= np.abs(cdf[upper] - targets)
+    nearest = np.where(use_lower, cdf[lower], cdf[upper])
+    # Empty reference bins repeat a CDF value; argmin returns the first
+    return np.searchsorted(cdf, nearest, side='left').astype(np.uint8)
+
+
+class HistogramReference:
+    """
+    Target distribution for histogram matching, prepared once
+
+    Inverting the reference CDF is done at construction, so matching many
+    images (e.g. video frames) to one reference only costs each image's
+    histogram and one lookup.
+
+    Args:
+        hist: Reference histogram (256 bins)
+    """
+
+    def __init__(self, hist: np.ndarray):
+        self.hist = np.asarray(hist)
+        ref_cdf = self.hist.cumsum()
+        self.cdf = (ref_cdf - ref_cdf.min()) * 255 / (ref_cdf.max() - ref_cdf.min())
+        # Equalized level s -> reference level
+        self.inverse = _nearest_levels(np.asarray(self.cdf))
+
+    @classmethod
+    def from_image(cls, image: np.ndarray) -> 'HistogramReference':
+        """Reference distribution of a uint8 grayscale image"""
+        return cls(intensity_histogram(image))
+
+    def lut(self, hist: np.ndarray) -> np.ndarray:
+        """Table mapping an image with histogram hist onto the reference"""
+        # Source CDF (equalization) straight into the inverse reference CDF
+        return self.inverse[_equalization_table(hist)]
+
+    def match(self, image: np.ndarray) -> np.ndarray:
+        """Histogram-match a uint8 grayscale image to the reference"""
+        return apply_lut(image, self.lut(intensity_histogram(image)))
+
+
+def _histogram_matching(values, hist, reference_hist):
+    reference = reference_hist
+    if not isinstance(reference, HistogramReference):
+        reference = HistogramReference(reference_hist)
+    return reference.lut(hist)[values]
+
+
+def _negative(values, hist):
+    # s = 255 - r
+    return 255 - values
+
+
+def _log_transform(values, hist, c=1.0):
+    # s = c * log(1 + r), normalized over the image to [0, 255]
+    levels = c * np.log1p(_present(hist).astype(np.float64))
+    log_values = c * np.log1p(values.astype(np.float64))
+    return ((log_values - np.min(levels)) / (np.max(levels) - np.min(levels)) * 255).astype(np.uint8)
+
+
+def _inverse_log_transform(values, hist, c=1.0):
+    # r = e^(s/c) - 1 on [0, 1], normalized over the image to [0, 255]
+    def transform(v):
+        normalized = v / 255.0
+        return np.expm1(normalized / c) if c > 0 else normalized
+    levels = transform(_present(hist).astype(np.float64))
+    result = transform(values.astype(np.float64))
+    if np.max(levels) > np.min(levels):
+        result = (result - np.min(levels)) / (np.max(levels) - np.min(levels)) * 255
+    return result.astype(np.uint8)
+
+
+def _gamma_transform(values, hist, gamma=1.0):
+    # s = r^gamma on [0, 1] (c = 1)
+    return (np.power(values / 255.0, gamma) * 255).astype(np.uint8)
+
+
+# Operation name -> f(values, hist, **parameters)
+POINT_OPS: Dict[str, Callable[..., np.ndarray]] = {
+    'contrast_stretching': _contrast_stretching,
+    'contrast_clipping_type1': _contrast_clipping_type1,
+    'contrast_clipping_type2': _contrast_clipping_type2,
+    'histogram_equalization': _histogram_equalization,
+    'histogram_matching': _histogram_matching,
+    'negative': _negative,
+    'log_transform': _log_transform,
+    'inverse_log_transform': _inverse_log_transform,
+    'gamma_transform': _gamma_transform,
+}
+
+# Operations whose table does not depend on the image
+IMAGE_INDEPENDENT = frozenset({'contrast_clipping_type1', 'negative', 'gamma_transform'})
+
+
+def compile_lut(name: str, hist: Optional[np.ndarray] = None, **params) -> np.ndarray:
+    """
+    Table of one point operation
+
+    Args:
+        name: Operation name (see POINT_OPS)
+        hist: 256-bin histogram of the image the table is for; not needed
+            for IMAGE_INDEPENDENT operations (nor for contrast_stretching
+            with explicit r_min and r_max)
+        **params: Operation parameters, as for the ImageProcessor method
+
+    Returns:
+        (256,) uint8 table
+    """
+    if name not in POINT_OPS:
+        raise ValueError(f"Unknown point operation: {name}")
+    return POINT_OPS[name](LEVELS, hist, **params)
+
+
+def compose_luts(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Table of applying first, then second"""
+    return second[first]
+
+
+def transform_histogram(hist: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """Histogram of an image after applying lut, from its histogram before"""
+    return np.bincount(lut, weights=hist, minlength=256).astype(np.int64)
+
+
+def compile_chain(steps: Sequence[Tuple[str, Dict[str, Any]]],
+                  hist: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Single table of a chain of point operations
+
+    Args:
+        steps: (operation name, parameters) pairs, applied in order
+        hist: Histogram of the chain's input (needed if any operation
+            depends on the image)
+
+    Returns:
+        (256,) uint8 table equal to applying the steps one after another
+    """
+    lut = LEVELS.copy()
+    for name, params in steps:
+        step_lut = compile_lut(name, hist, **params)
+        if hist is not None:
+            hist = transform_histogram(hist, step_lut)
+        lut = compose_luts(lut, step_lut)
+    return lut
+
+
+def apply_lut(image: np.ndarray, lut: np.ndarray,
+              out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Map every pixel of a uint8 image through a 256-entry uint8 table
+
+    Args:
+        image: uint8 image (any shape)
+        lut: (256,) uint8 table
+        out: Optional uint8 output array of the image's shape
+
+    Returns:
+        Mapped image
+    """
+    if image.ndim <= 2 or image.shape[-1] <= 4:
+        return cv2.LUT(image, lut, dst=out)
+    return np.take(lut, image, out=out)
+
+
+def apply_point_ops(image: np.ndarray,
+                    steps: Sequence[Tuple[str, Dict[str, Any]]]) -> np.ndarray:
+    """
+    Apply a chain of point operations to a uint8 image with one lookup
+
+    Example:
+        apply_point_ops(image, [('gamma_transform', {'gamma': 0.5}),
+                                ('histogram_equalization', {})])
+    """
+    hist = None
+    if any(name not in IMAGE_INDEPENDENT for name, _ in steps):
+        hist = intensity_histogram(image)
+    return apply_lut(image, compile_chain(steps, hist))
+
+
+def benchmark_point_ops(image: Optional[np.ndarray] = None,
+                        repeats: int = 5) -> Dict[str, Tuple[float, float, float]]:
+    """
+    Per-pixel float evaluation vs compiled table, per operation
+
+    Args:
+        image: uint8 test image (default: random 2160x3840)
+        repeats: Timed runs per variant (best time is kept)
+
+    Returns:
+        Dict name -> (direct ms, table ms, speedup); the table time includes
+        the histogram and compiling
+    """
+    if image is None:
+        image = np.random.default_rng(0).integers(0, 256, (2160, 3840), dtype=np.uint8)
+    reference_hist = np.exp(-((np.arange(256) - 128) ** 2) / (2 * 50 ** 2))
+    params = {'contrast_clipping_type1': {'low_threshold': 50, 'high_threshold': 200},
+              'histogram_matching': {'reference_hist': reference_hist},
+              'gamma_transform': {'gamma': 0.5}}
+
+    def best(func):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000
+
+    results = {}
+    for name, op in POINT_OPS.items():
+        kwargs = params.get(name, {})
+        hist = intensity_histogram(image)
+        direct = best(lambda: op(image, hist, **kwargs))
+        table = best(lambda: apply_point_ops(image, [(name, kwargs)]))
+        results[name] = (direct, table, direct / table)
+    return results
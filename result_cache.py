@@ -0,0 +1,313 @@
+"""
+Result Cache
+Memoization of ImageProcessor / MLImageProcessor static methods for the GUI:
+- Keys: a fast content hash of every array argument (xxhash when installed,
+  hashlib.blake2b otherwise) plus the remaining parameters, with defaults
+  applied so positional and keyword calls share entries
+- In-memory LRU bounded in bytes, optional on-disk tier (pickle files)
+- Hit / miss / eviction statistics
+
+Callers get copies of cached arrays, so editing a result in place never
+corrupts the cache.
+"""
+
+import copy
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import numpy as np
+
+try:
+    import xxhash  # Optional dependency, about 10x faster than blake2b
+except ImportError:
+    xxhash = None
+
+
+# Methods that must always run: they draw random numbers
+NONDETERMINISTIC = frozenset({'add_salt_pepper_noise'})
+
+# Mutable containers passed as arguments may be out-parameters the function
+# fills in (e.g. detect_edges_ml(timings={})); such calls always run
+_OUT_PARAMETER_TYPES = (dict, list, set, bytearray)
+
+
+def content_hash(array: np.ndarray) -> str:
+    """
+    Hash of an array's dtype, shape and bytes
+
+    Args:
+        array: Any numpy array (non-contiguous arrays are copied first)
+
+    Returns:
+        Hex digest (128 bits)
+    """
+    array = np.ascontiguousarray(array)
+    hasher = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    hasher.update(f"{array.dtype.str}{array.shape}".encode())
+    hasher.update(array.reshape(-1).view(np.uint8))
+    return hasher.hexdigest()
+
+
+def _fingerprint(value: Any) -> str:
+    """Stable text form of a call argument; TypeError if it has none"""
+    if isinstance(value, np.ndarray):
+        return 'array:' + content_hash(value)
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, np.generic)):
+        return repr(value)
+    if isinstance(value, (tuple, list)):
+        return type(value).__name__ + '(' + ','.join(_fingerprint(v) for v in value) + ')'
+    if isinstance(value, dict):
+        return 'dict(' + ','.join(f"{_fingerprint(k)}:{_fingerprint(v)}"
+                                  for k, v in sorted(value.items(), key=repr)) + ')'
+    raise TypeError(f"Cannot fingerprint {type(value).__name__}")
+
+
+def _size(value: Any) -> int:
+    """Approximate memory footprint of a result in bytes"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_size(k) + _size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    LRU cache of function results keyed on argument content
+
+    The in-memory tier is bounded by max_bytes. With disk_dir set, results
+    are also written there (bounded by disk_max_bytes, oldest files removed
+    first) and memory misses are looked up on disk. The disk directory is
+    scanned once, at construction; afterwards its size is tracked as files
+    are written and removed.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024,
+                 disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._results: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._disk_files: "OrderedDict[str, int]" = OrderedDict()  # path -> size, oldest first
+        self._disk_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            files = [os.path.join(disk_dir, name) for name in os.listdir(disk_dir)
+                     if name.endswith('.pkl')]
+            for path in sorted(files, key=os.path.getmtime):
+                self._disk_files[path] = os.path.getsize(path)
+                self._disk_bytes += self._disk_files[path]
+
+    @staticmethod
+    def make_key(name: str, signature: Optional[inspect.Signature],
+                 args: tuple, kwargs: dict) -> str:
+        """Cache key of a call (TypeError if an argument cannot be hashed)"""
+        if signature is not None:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            args, kwargs = bound.args, bound.kwargs
+        text = name + _fingerprint(tuple(args)) + _fingerprint(dict(kwargs))
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + '.pkl')
+
+    def lookup(self, key: str):
+        """
+        Cached result for a key
+
+        Returns:
+            Tuple (found, value); value is a copy of the cached result
+        """
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(entry[0])
+
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    value = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass  # Unreadable file: treat as a miss and rewrite it
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                self._store_memory(key, value)
+                return True, copy.deepcopy(value)
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def store(self, key: str, value: Any) -> None:
+        """Insert a result in memory (and on disk if enabled)"""
+        value = copy.deepcopy(value)
+        self._store_memory(key, value)
+        if self.disk_dir:
+            self._store_disk(key, value)
+
+    def _store_memory(self, key: str, value: Any) -> None:
+        size = _size(value)
+        if size > self.max_bytes:
+            return  # Larger than the whole cache
+        with self._lock:
+            if key in self._results:
+                return
+            self._results[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, old_size) = self._results.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    def _store_disk(self, key: str, value: Any) -> None:
+        path = self._disk_path(key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        size = os.path.getsize(path)
+
+        # Trim the disk tier, least recently written first
+        with self._lock:
+            self._disk_bytes += size - self._disk_files.pop(path, 0)
+            self._disk_files[path] = size
+            while self._disk_bytes > self.disk_max_bytes and self._disk_files:
+                old_path, old_size = self._disk_files.popitem(last=False)
+                self._disk_bytes -= old_size
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass  # Already removed by another cache on the same directory
+
+    def memoize(self, func: Callable, name: Optional[str] = None) -> Callable:
+        """
+        Wrap a function so repeated calls with equal arguments hit the cache
+
+        Calls passing a dict, list, set or bytearray are not cached: the
+        function may fill it in (an out-parameter), which a cached result
+        would skip.
+
+        Args:
+            func: Function (e.g. a static method)
+            name: Key prefix (default: the function's qualified name)
+
+        Returns:
+            Wrapped function
+        """
+        name = name or func.__qualname__
+        try:
+            signature = inspect.signature(func)
+        except (TypeError, ValueError):
+            signature = None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if any(isinstance(value, _OUT_PARAMETER_TYPES)
+                   for value in (*args, *kwargs.values())):
+                return func(*args, **kwargs)
+            try:
+                key = self.make_key(name, signature, args, kwargs)
+            except TypeError:
+                return func(*args, **kwargs)  # Argument without a stable fingerprint
+            found, value = self.lookup(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            self.store(key, value)
+            return value
+
+        wrapper.cache = self
+        return wrapper
+
+    def clear(self, disk: bool = False) -> None:
+        """Drop all cached results (and the disk tier if disk=True)"""
+        with self._lock:
+            self._results.clear()
+            self._bytes = 0
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+            if disk:
+                self._disk_files.clear()
+                self._disk_bytes = 0
+        if disk and self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Cache statistics
+
+        Returns:
+            Dict with hits (memory), disk_hits, misses, evictions, entries,
+            bytes, disk_bytes and hit_rate (memory + disk hits over all lookups)
+        """
+        with self._lock:
+            found = self.hits + self.disk_hits
+            lookups = found + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._results),
+                'bytes': self._bytes,
+                'disk_bytes': self._disk_bytes,
+                'hit_rate': found / lookups if lookups else 0.0,
+            }
+
+
+# Shared cache used by CachedProcessor
+RESULT_CACHE = ResultCache()
+
+
+class CachedProcessor:
+    """
+    Proxy of a processor class whose static methods are memoized
+
+    Example:
+        ImageProcessor = CachedProcessor(image_processing.ImageProcessor)
+        ImageProcessor.median_filter(image, 5)   # computed
+        ImageProcessor.median_filter(image, 5)   # served from the cache
+    """
+
+    def __init__(self, processor: type, cache: Optional[ResultCache] = None,
+                 exclude: Iterable[str] = NONDETERMINISTIC):
+        self._processor = processor
+        self._cache = cache if cache is not None else RESULT_CACHE
+        self._exclude = frozenset(exclude)
+        self._wrapped: Dict[str, Callable] = {}
+
+    @property
+    def cache(self) -> ResultCache:
+        return self._cache
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._processor, name)
+        if (name.startswith('_') or name in self._exclude or not callable(attribute)
+                or not isinstance(inspect.getattr_static(self._processor, name), staticmethod)):
+            return attribute
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            wrapped = self._cache.memoize(attribute, f"{self._processor.__name__}.{name}")
+            self._wrapped[name] = wrapped
+        return wrapped
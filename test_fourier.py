@@ -82,6 +82,95 @@ def test_fourier_functions():
     return True
 
 
+def test_real_fft_path():
+    """Test that the rfft2 path matches the complex fft2 path"""
+    
+    print("=== Testing Real-input FFT Path ===\n")
+    
+    rng = np.random.default_rng(0)
+    for shape in [(64, 64), (45, 38)]:  # even and odd sizes
+        test_image = rng.integers(0, 256, shape, dtype=np.uint8)
+        
+        mag_complex, phase_complex = ImageProcessor.fourier_transform(test_image, real=False)
+        mag_real, phase_real = ImageProcessor.fourier_transform(test_image, real=True)
+        assert np.allclose(mag_real, mag_complex), f"Magnitude mismatch for {shape}"
+        assert np.allclose(np.exp(1j * phase_real), np.exp(1j * phase_complex)), \
+            f"Phase mismatch for {shape}"
+        
+        filters = [
+            (ImageProcessor.ideal_lowpass_filter, (20,)),
+            (ImageProcessor.gaussian_lowpass_filter, (15.0,)),
+            (ImageProcessor.ideal_highpass_filter, (10,)),
+            (ImageProcessor.butterworth_highpass_filter, (20, 2)),
+        ]
+        for filter_func, args in filters:
+            expected = filter_func(test_image, *args, real=False).astype(int)
+            result = filter_func(test_image, *args).astype(int)  # rfft2 by default
+            assert np.abs(result - expected).max() <= 1, \
+                f"{filter_func.__name__} differs by more than 1 LSB for {shape}"
+        print(f"   ✓ Shape {shape}: spectrum and filters match")
+    print()
+
+
+def test_fft_backends():
+    """Test that every available FFT backend gives the same results"""
+    
+    print("=== Testing FFT Backends ===\n")
+    
+    import fft_backend
+    
+    rng = np.random.default_rng(1)
+    test_image = rng.integers(0, 256, (61, 47), dtype=np.uint8)
+    expected = ImageProcessor.gaussian_lowpass_filter(test_image, 10.0, real=False).astype(int)
+    expected_mag, _ = ImageProcessor.fourier_transform(test_image, real=False)
+    
+    try:
+        for name in fft_backend.available_fft_backends():
+            fft_backend.set_fft_backend(name)
+            for real in [True, False]:
+                result = ImageProcessor.gaussian_lowpass_filter(test_image, 10.0, real=real)
+                assert np.abs(result.astype(int) - expected).max() <= 1, \
+                    f"Backend {name} (real={real}) differs by more than 1 LSB"
+                magnitude, _ = ImageProcessor.fourier_transform(test_image, real=real)
+                assert np.allclose(magnitude, expected_mag), f"Backend {name} spectrum mismatch"
+            print(f"   ✓ Backend '{name}' passed")
+    finally:
+        fft_backend.set_fft_backend('default')
+    
+    # The default selection never benchmarks; 'auto' benchmarks once per
+    # frame size, not once per stack chunk
+    fft_backend._fastest.clear()
+    ImageProcessor.gaussian_lowpass_filter(rng.integers(0, 256, (300, 300), dtype=np.uint8), 10.0)
+    assert not fft_backend._fastest, "Default FFT backend selection ran a benchmark"
+    stack = rng.integers(0, 256, (5, 260, 270), dtype=np.uint8)
+    try:
+        fft_backend.set_fft_backend('auto')
+        ImageProcessor.frequency_filter_batch(stack, 'gaussian_lowpass', chunk_size=2, sigma=10.0)
+        assert list(fft_backend._fastest) == [(fft_backend.fast_shape((260, 270)), True)]
+    finally:
+        fft_backend.set_fft_backend('default')
+    
+    # Awkward sizes are padded up to FFT-friendly ones
+    assert fft_backend.fast_shape((1021, 769)) == (1024, 800), "Unexpected fast shape"
+    assert fft_backend.fast_shape((1021, 769), real=False) == (1024, 770), "Unexpected fast shape"
+    timings = fft_backend.benchmark_fft_backends((64, 64), repeats=1)
+    assert set(timings) == set(fft_backend.available_fft_backends()), "Benchmark incomplete"
+    print("   ✓ Fast shape and benchmark passed\n")
+    
+    # An incomplete backend is rejected when registered, not at first use
+    class Incomplete(fft_backend.FFTBackend):
+        def fft2(self, a):
+            return np.fft.fft2(a)
+    try:
+        fft_backend.register_fft_backend('incomplete', Incomplete)
+        assert False, "Registered a backend without ifft2/rfft2/irfft2"
+    except TypeError:
+        pass
+    assert 'incomplete' not in fft_backend.available_fft_backends()
+
+
 if __name__ == "__main__":
     success = test_fourier_functions()
+    test_real_fft_path()
+    test_fft_backends()
     exit(0 if success else 1)
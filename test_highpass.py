@@ -105,6 +105,108 @@ def test_highpass_filters():
     return True
 
 
+def test_mask_bank():
+    """Test the cached frequency mask bank"""
+    
+    print("=== Testing Frequency Mask Bank ===\n")
+    
+    from frequency_domain import MaskBank, build_centered_mask
+    
+    bank = MaskBank()
+    mask = bank.get('butterworth_highpass', (64, 48), D0=20, n=2)
+    again = bank.get('butterworth_highpass', (64, 48), D0=20, n=2)
+    assert again is mask, "Second lookup should hit the cache"
+    assert bank.stats()['hits'] == 1 and bank.stats()['misses'] == 1, "Wrong hit/miss counters"
+    
+    # Cached masks are stored pre-ifftshifted
+    centered = build_centered_mask('butterworth_highpass', (64, 48), D0=20, n=2)
+    assert np.array_equal(np.fft.fftshift(mask), centered), "Mask layout mismatch"
+    assert not mask.flags.writeable, "Cached masks must be read-only"
+    print("   ✓ Hits, misses and mask layout passed")
+    
+    # LRU eviction under a memory budget of two masks
+    small = MaskBank(max_bytes=2 * 32 * 32 * 8)
+    for cutoff in [5, 10, 15]:
+        small.get('ideal_lowpass', (32, 32), cutoff=cutoff)
+    stats = small.stats()
+    assert stats['entries'] == 2 and stats['evictions'] == 1, f"Unexpected stats: {stats}"
+    print("   ✓ LRU eviction passed")
+    
+    # Filters match the textbook fftshift formulation
+    test_image = np.zeros((64, 48), dtype=np.uint8)
+    test_image[20:40, 10:30] = 255
+    f_shift = np.fft.fftshift(np.fft.fft2(test_image)) * centered
+    expected = np.abs(np.fft.ifft2(np.fft.ifftshift(f_shift)))
+    expected = np.clip(expected, 0, 255).astype(np.uint8)
+    result = ImageProcessor.butterworth_highpass_filter(test_image, 20, 2)
+    assert np.array_equal(result, expected), "Cached-mask filter mismatch"
+    print("   ✓ Cached-mask filtering passed\n")
+
+
+def test_frequency_session():
+    """Test one-transform, many-filter frequency session"""
+    
+    print("=== Testing Frequency Domain Session ===\n")
+    
+    from frequency_domain import FrequencyDomainSession
+    
+    test_image = np.zeros((96, 80), dtype=np.uint8)
+    test_image[30:70, 20:60] = 255
+    
+    for real in [True, False]:
+        session = FrequencyDomainSession(test_image, real=real)
+        for cutoff in [10, 30]:
+            expected = ImageProcessor.ideal_highpass_filter(test_image, cutoff, real=real)
+            assert np.array_equal(session.ideal_highpass(cutoff), expected), \
+                "Session ideal high-pass mismatch"
+        for n in [1, 2, 5]:
+            expected = ImageProcessor.butterworth_highpass_filter(test_image, 30, n, real=real)
+            assert np.array_equal(session.butterworth_highpass(30, n), expected), \
+                "Session Butterworth high-pass mismatch"
+        
+        # Band-pass starting at radius 0 is the ideal low-pass
+        expected = ImageProcessor.ideal_lowpass_filter(test_image, 25, real=real)
+        assert np.array_equal(session.ideal_bandpass(0, 25), expected), "Band-pass mismatch"
+    print("   ✓ Session filters match per-call filters\n")
+
+
+def test_stack_filtering():
+    """Test batched frequency filtering over an image stack"""
+    
+    print("=== Testing Batched Stack Filtering ===\n")
+    
+    import os
+    import tempfile
+    
+    rng = np.random.default_rng(2)
+    stack = rng.integers(0, 256, (5, 40, 36), dtype=np.uint8)
+    
+    result = ImageProcessor.frequency_filter_batch(stack, 'butterworth_highpass',
+                                                   chunk_size=2, D0=10, n=2)
+    assert result.shape == stack.shape and result.dtype == np.uint8, "Stack output mismatch"
+    for i in range(len(stack)):
+        expected = ImageProcessor.butterworth_highpass_filter(stack[i], 10, 2)
+        assert np.abs(result[i].astype(int) - expected.astype(int)).max() <= 1, \
+            f"Frame {i} differs from single-image filter"
+    print("   ✓ Chunked stack matches per-frame filtering")
+    
+    # Memory-mapped input and output
+    with tempfile.TemporaryDirectory() as tmp:
+        src = np.lib.format.open_memmap(os.path.join(tmp, 'in.npy'), mode='w+',
+                                        dtype=np.uint8, shape=stack.shape)
+        src[:] = stack
+        dst = np.lib.format.open_memmap(os.path.join(tmp, 'out.npy'), mode='w+',
+                                        dtype=np.uint8, shape=stack.shape)
+        ImageProcessor.frequency_filter_batch(src, 'butterworth_highpass',
+                                              chunk_size=3, out=dst, D0=10, n=2)
+        assert np.array_equal(np.asarray(dst), result), "Memory-mapped output mismatch"
+        del src, dst
+    print("   ✓ Memory-mapped stack passed\n")
+
+
 if __name__ == "__main__":
     success = test_highpass_filters()
+    test_mask_bank()
+    test_frequency_session()
+    test_stack_filtering()
     exit(0 if success else 1)
@@ -51,6 +51,56 @@ def test_kmeans_segmentation():
     print("  ✓ K-Means segmentation passed")
 
 
+def test_kmeans_histogram_mode():
+    """Test histogram K-Means against the per-pixel implementation"""
+    print("\nTesting Histogram K-Means...")
+    
+    rng = np.random.default_rng(1)
+    centers = np.array([30.0, 90.0, 160.0, 230.0])
+    img = rng.normal(centers[rng.integers(0, 4, (80, 120))], 12)
+    img = img.clip(0, 255).astype(np.uint8)
+    
+    for k in (2, 4, 6):
+        seg_pix, cent_pix = MLImageProcessor.kmeans_segmentation(img, k, method='pixels')
+        seg_hist, cent_hist = MLImageProcessor.kmeans_segmentation(img, k, method='histogram')
+        assert np.array_equal(seg_pix, seg_hist), f"Segmentation differs for k={k}"
+        assert np.allclose(cent_pix, cent_hist, atol=1e-3), f"Centroids differ for k={k}"
+    
+    print(f"  - Centroids (k=6): {cent_hist}")
+    print("  ✓ Histogram K-Means passed")
+
+
+def test_minibatch_color_kmeans():
+    """Test the mini-batch color K-Means engine"""
+    print("\nTesting Mini-batch Color K-Means...")
+    
+    from clustering import assign_clusters, minibatch_kmeans
+    
+    rng = np.random.default_rng(2)
+    palette = np.array([[20, 40, 200], [200, 60, 30], [60, 180, 90]], dtype=np.float64)
+    img = palette[rng.integers(0, 3, (120, 160))] + rng.normal(0, 8, (120, 160, 3))
+    img = img.clip(0, 255).astype(np.uint8)
+    
+    seg1 = MLImageProcessor.color_kmeans_segmentation(img, 3, method='minibatch', seed=7)
+    seg2 = MLImageProcessor.color_kmeans_segmentation(img, 3, method='minibatch', seed=7)
+    assert seg1.shape == img.shape and seg1.dtype == np.uint8
+    assert np.array_equal(seg1, seg2), "Same seed should give the same segmentation"
+    assert len(np.unique(seg1.reshape(-1, 3), axis=0)) == 3
+    
+    # Centers recover the palette
+    pixels = img.reshape(-1, 3).astype(np.float32)
+    centers = minibatch_kmeans(pixels, 3, batch_size=1024, seed=0)
+    order = np.argsort(centers[:, 0])
+    assert np.abs(centers[order] - palette[np.argsort(palette[:, 0])]).max() < 3
+    
+    # Chunked assignment matches a full distance matrix
+    labels, _ = assign_clusters(pixels, centers, chunk_rows=1000)
+    full = np.argmin(((pixels[:, None, :] - centers) ** 2).sum(axis=2), axis=1)
+    assert np.array_equal(labels, full)
+    
+    print("  ✓ Mini-batch color K-Means passed")
+
+
 def test_feature_extraction():
     """Test feature extraction functions"""
     print("\nTesting Feature Extraction...")
@@ -78,6 +128,93 @@ def test_feature_extraction():
     print("  ✓ Feature extraction passed")
 
 
+def test_fused_features():
+    """Test the fused extractor against the three separate extractors"""
+    print("\nTesting Fused Feature Extraction...")
+    
+    rng = np.random.default_rng(9)
+    images = [create_test_image(),
+              rng.integers(0, 256, (31, 47), dtype=np.uint8),
+              rng.integers(0, 4, (6, 8), dtype=np.uint8),
+              np.full((10, 10), 77, dtype=np.uint8)]
+    for img in images:
+        separate = MLImageProcessor.extract_combined_features(img, fused=False)
+        fused = MLImageProcessor.extract_fused_features(img)
+        assert fused.shape == separate.shape == (29,)
+        assert np.allclose(fused, separate, rtol=1e-12, atol=1e-12), np.abs(fused - separate).max()
+        # Everything except std / skewness / kurtosis is bit-identical
+        same = np.ones(29, dtype=bool)
+        same[[22, 25, 26]] = False
+        assert np.array_equal(fused[same], separate[same])
+    
+    # Non-uint8 images keep using the separate extractors
+    float_img = create_test_image().astype(np.float64)
+    assert MLImageProcessor.extract_combined_features(float_img).shape == (29,)
+    
+    timings = MLImageProcessor.benchmark_feature_extraction(repeats=2)
+    print(f"  - Speedup over separate extractors: {timings['speedup']:.1f}x")
+    print("  ✓ Fused feature extraction passed")
+
+
+def test_feature_batch():
+    """Test parallel batch feature extraction and the resumable feature store"""
+    print("\nTesting Batch Feature Extraction...")
+    
+    import os
+    import tempfile
+    from feature_batch import FeatureStore, extract_features_batch
+    
+    rng = np.random.default_rng(10)
+    images = [rng.integers(0, 256, (40, 50), dtype=np.uint8) for _ in range(23)]
+    expected = np.stack([MLImageProcessor.extract_combined_features(img)
+                         for img in images]).astype(np.float32)
+    
+    features = extract_features_batch(images, n_jobs=2, chunk_size=4)
+    assert features.dtype == np.float32 and features.flags['C_CONTIGUOUS']
+    assert np.array_equal(features, expected)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, 'features')
+        stored = extract_features_batch(images, n_jobs=1, chunk_size=5, store=store)
+        assert np.array_equal(stored, expected)
+        
+        # Simulate an interrupted run: only the first 10 rows were recorded
+        with open(os.path.join(store, 'done.log'), 'w') as f:
+            f.write("0 10\n")
+        partial = FeatureStore.open(store)
+        partial.features[10:] = 0
+        partial.features.flush()
+        assert partial.done.sum() == 10
+        
+        resumed = extract_features_batch(images, n_jobs=2, chunk_size=5, store=store)
+        assert np.array_equal(resumed, expected)
+        assert FeatureStore.open(store, mode='r').done.all()
+        
+        # The store remembers its extractor: resuming with another one fails
+        assert FeatureStore.open(store, mode='r').extractor == 'combined'
+        for kwargs in ({'extractor': 'texture'},
+                       {'extractor_params': {'fused': False}}):
+            try:
+                extract_features_batch(images, n_jobs=1, store=store, **kwargs)
+                assert False, "Mismatched extractor should be rejected"
+            except ValueError:
+                pass
+        # Arrays are keyed by content: the same number of other arrays is
+        # not resumed from stale rows
+        try:
+            extract_features_batch(images[::-1], n_jobs=1, store=store)
+            assert False, "Resumed a store built from different arrays"
+        except ValueError:
+            pass
+        
+        histogram = extract_features_batch(images[:3], n_jobs=1, extractor='histogram',
+                                           extractor_params={'bins': 16},
+                                           store=os.path.join(tmp, 'histogram'))
+        assert histogram.shape == (3, 16)
+    
+    print("  ✓ Batch feature extraction passed")
+
+
 def test_knn_classifier():
     """Test KNN classifier"""
     print("\nTesting KNN Classifier...")
@@ -107,6 +244,66 @@ def test_knn_classifier():
     print("  ✓ KNN classifier passed")
 
 
+def test_knn_index():
+    """Test KNNIndex against per-query knn_classify"""
+    print("\nTesting KNN Index...")
+    
+    from neighbors import KNNIndex
+    
+    rng = np.random.default_rng(5)
+    for n_features in (4, 29):
+        train = rng.normal(size=(500, n_features))
+        labels = rng.integers(0, 4, 500)
+        queries = rng.normal(size=(40, n_features))
+        expected = [MLImageProcessor.knn_classify(train, labels, q, k=5) for q in queries]
+        exact = np.sort(np.sqrt(((queries[:, None] - train) ** 2).sum(axis=2)), axis=1)[:, :5]
+        
+        for method in ('kdtree', 'brute'):
+            index = KNNIndex(train, labels, method=method)
+            distances, indices = index.query(queries, k=5)
+            assert indices.shape == (40, 5)
+            assert np.allclose(distances, exact), f"{method} distances differ"
+            assert index.predict(queries, k=5).tolist() == expected, f"{method} labels differ"
+    
+    assert KNNIndex(train).method == 'brute' and KNNIndex(train[:, :4]).method == 'kdtree'
+    print("  ✓ KNN index passed")
+
+
+def test_knn_batched_queries():
+    """Test knn_classify with query matrices, neighbours and weighted voting"""
+    print("\nTesting Batched KNN Queries...")
+    
+    from neighbors import block_knn
+    
+    rng = np.random.default_rng(6)
+    train = rng.normal(size=(300, 12))
+    labels = rng.integers(0, 3, 300)
+    queries = rng.normal(size=(25, 12))
+    
+    # Query matrix gives the same labels as one query at a time
+    single = [MLImageProcessor.knn_classify(train, labels, q, k=4) for q in queries]
+    batch, indices, distances = MLImageProcessor.knn_classify(
+        train, labels, queries, k=4, return_neighbors=True)
+    assert batch.tolist() == single
+    assert indices.shape == distances.shape == (25, 4)
+    
+    # Tiled distances match the full distance matrix
+    full = np.sqrt(((queries[:, None] - train) ** 2).sum(axis=2))
+    tiled, tiled_indices = block_knn(queries, train, 4, block_rows=7, block_cols=50)
+    assert np.allclose(tiled, np.sort(full, axis=1)[:, :4])
+    assert np.array_equal(tiled_indices, np.argsort(full, axis=1)[:, :4])
+    assert np.allclose(distances, tiled)
+    
+    # Distance weighting lets one close neighbour outvote two far ones
+    train = np.array([[0.0], [1.0], [1.1], [5.0]])
+    labels = np.array([0, 1, 1, 2])
+    query = np.array([0.1])
+    assert MLImageProcessor.knn_classify(train, labels, query, k=3) == 1
+    assert MLImageProcessor.knn_classify(train, labels, query, k=3, weights='distance') == 0
+    
+    print("  ✓ Batched KNN queries passed")
+
+
 def test_otsu_threshold():
     """Test Otsu thresholding"""
     print("\nTesting Otsu Thresholding...")
@@ -123,6 +320,48 @@ def test_otsu_threshold():
     print("  ✓ Otsu thresholding passed")
 
 
+def test_otsu_multilevel_and_batch():
+    """Test batched and multi-level Otsu against brute-force references"""
+    print("\nTesting Batched / Multi-level Otsu...")
+    
+    rng = np.random.default_rng(0)
+    levels = np.arange(256)
+    
+    # Batched thresholds match a direct per-histogram search
+    hists = rng.integers(0, 50, (20, 256))
+    hists[0] = 0
+    hists[0, 40] = 100  # single level: no valid split
+    thresholds = MLImageProcessor.otsu_threshold_batch(hists)
+    for hist, t in zip(hists, thresholds):
+        best, best_t = 0, 0
+        for cut in range(255):
+            n0, n1 = hist[:cut + 1].sum(), hist[cut + 1:].sum()
+            if n0 == 0 or n1 == 0:
+                continue
+            mu0 = (hist[:cut + 1] * levels[:cut + 1]).sum() / n0
+            mu1 = (hist[cut + 1:] * levels[cut + 1:]).sum() / n1
+            variance = n0 * n1 * (mu0 - mu1) ** 2
+            if variance > best * (1 + 1e-12):
+                best, best_t = variance, cut
+        assert t == best_t, f"Batched threshold {t} != {best_t}"
+    
+    # Three well separated populations are split between the modes
+    img = np.concatenate([rng.normal(40, 5, 2000), rng.normal(120, 5, 2000),
+                          rng.normal(210, 5, 2000)]).clip(0, 255).astype(np.uint8)
+    img = img.reshape(60, 100)
+    segmented, cuts = MLImageProcessor.multi_otsu_threshold(img, 2)
+    assert len(cuts) == 2 and 50 < cuts[0] < 110 and 130 < cuts[1] < 200, cuts
+    assert np.unique(segmented).tolist() == [0, 128, 255]
+    
+    # One threshold reduces to the binary method
+    binary, t = MLImageProcessor.otsu_threshold(img)
+    segmented, cuts = MLImageProcessor.multi_otsu_threshold(img, 1)
+    assert cuts == [t] and np.array_equal(segmented, binary)
+    
+    print(f"  - Multi-level thresholds: {cuts}")
+    print("  ✓ Batched / multi-level Otsu passed")
+
+
 def test_adaptive_threshold():
     """Test adaptive thresholding"""
     print("\nTesting Adaptive Thresholding...")
@@ -134,6 +373,14 @@ def test_adaptive_threshold():
     assert binary.shape == test_img.shape, "Output shape mismatch"
     assert binary.dtype == np.uint8, "Output should be uint8"
     
+    # Flat image with C=0: every pixel sits on its local mean, and the mean
+    # (summed by scipy.ndimage.convolve) rounds just below it
+    from scipy import ndimage
+    flat = np.full((200, 300), 77, dtype=np.uint8)
+    kernel = np.ones((15, 15)) / 225
+    expected = (flat > ndimage.convolve(flat.astype(np.float64), kernel)).astype(np.uint8) * 255
+    assert np.array_equal(MLImageProcessor.adaptive_threshold_ml(flat, C=0), expected)
+    
     print("  ✓ Adaptive thresholding passed")
 
 
@@ -151,6 +398,85 @@ def test_ml_edge_detection():
     print("  ✓ ML edge detection passed")
 
 
+def _reference_nms(magnitude, direction):
+    """Per-pixel loop NMS (the original detect_edges_ml implementation)"""
+    rows, cols = magnitude.shape
+    suppressed = np.zeros_like(magnitude)
+    angle = np.rad2deg(direction) % 180
+    for i in range(1, rows - 1):
+        for j in range(1, cols - 1):
+            if (0 <= angle[i, j] < 22.5) or (157.5 <= angle[i, j] <= 180):
+                n1, n2 = magnitude[i, j - 1], magnitude[i, j + 1]
+            elif 22.5 <= angle[i, j] < 67.5:
+                n1, n2 = magnitude[i - 1, j + 1], magnitude[i + 1, j - 1]
+            elif 67.5 <= angle[i, j] < 112.5:
+                n1, n2 = magnitude[i - 1, j], magnitude[i + 1, j]
+            else:
+                n1, n2 = magnitude[i - 1, j - 1], magnitude[i + 1, j + 1]
+            if magnitude[i, j] >= n1 and magnitude[i, j] >= n2:
+                suppressed[i, j] = magnitude[i, j]
+    return suppressed
+
+
+def test_non_maximum_suppression():
+    """Test vectorized NMS against the per-pixel loop"""
+    print("\nTesting Non-Maximum Suppression...")
+    
+    rng = np.random.default_rng(3)
+    # Quantized magnitudes create ties between neighbours
+    magnitude = rng.integers(0, 5, (40, 50)).astype(np.float64)
+    direction = rng.uniform(-np.pi, np.pi, (40, 50))
+    direction[0, :8] = np.deg2rad([0, 22.5, 67.5, 112.5, 157.5, 180, -22.5, -90])
+    
+    result = MLImageProcessor.non_maximum_suppression(magnitude, direction)
+    assert np.array_equal(result, _reference_nms(magnitude, direction)), "NMS mismatch"
+    
+    timings = {}
+    edges = MLImageProcessor.detect_edges_ml(create_test_image(), timings=timings)
+    assert edges.dtype == np.uint8
+    assert set(timings) == {'blur', 'gradient', 'nms', 'threshold', 'hysteresis'}
+    
+    print(f"  - Stage timings (ms): {', '.join(f'{k}={v * 1000:.2f}' for k, v in timings.items())}")
+    print("  ✓ Non-maximum suppression passed")
+
+
+def test_exact_hysteresis():
+    """Test connected-component hysteresis"""
+    print("\nTesting Exact Hysteresis...")
+    
+    strong = np.zeros((20, 30), dtype=bool)
+    weak = np.zeros((20, 30), dtype=bool)
+    strong[5, 2] = True
+    weak[5, 3:25] = True      # long weak chain attached to a strong pixel
+    weak[12:15, 10] = True    # isolated weak segment
+    weak[6, 25] = True        # diagonal continuation (8-connectivity)
+    
+    exact = MLImageProcessor.hysteresis_edges(strong, weak, 'exact')
+    dilate = MLImageProcessor.hysteresis_edges(strong, weak, 'dilate')
+    assert exact[5, 2:25].min() == 255 and exact[6, 25] == 255, "Chain should be fully kept"
+    assert exact[12:15, 10].max() == 0, "Isolated weak edges should be dropped"
+    assert dilate[5, 10] == 0, "Dilation hysteresis only reaches 3 pixels"
+    
+    # Exact hysteresis keeps a superset of the dilation result
+    rng = np.random.default_rng(4)
+    strong = rng.random((60, 80)) > 0.97
+    weak = ~strong & (rng.random((60, 80)) > 0.6)
+    exact = MLImageProcessor.hysteresis_edges(strong, weak, 'exact')
+    dilate = MLImageProcessor.hysteresis_edges(strong, weak, 'dilate')
+    assert np.all(exact >= dilate) and np.all(exact[strong] == 255)
+    
+    edges = MLImageProcessor.detect_edges_ml(create_test_image(), hysteresis='exact')
+    assert edges.dtype == np.uint8
+    
+    # The benchmark times the stages detect_edges_ml runs
+    strong, weak = MLImageProcessor.edge_masks(create_test_image())
+    assert np.array_equal(MLImageProcessor.hysteresis_edges(strong, weak, 'exact'), edges)
+    results = MLImageProcessor.benchmark_hysteresis(shapes=((60, 80),), repeats=1)
+    assert set(results[(60, 80)]) == {'dilate', 'exact', 'extra_edges'}
+    
+    print("  ✓ Exact hysteresis passed")
+
+
 def test_morphological_operations():
     """Test morphological operations"""
     print("\nTesting Morphological Operations...")
@@ -220,6 +546,82 @@ def test_pca_reduce():
     print("  ✓ PCA reduction passed")
 
 
+def test_pca_solvers():
+    """Test that all PCA solvers find the same subspace"""
+    print("\nTesting PCA Solvers...")
+    
+    from pca import choose_pca_solver
+    
+    rng = np.random.default_rng(7)
+    basis = rng.normal(size=(6, 24 * 24)) * 20
+    weights = rng.normal(size=(60, 6)) * np.array([6, 5, 4, 3, 2, 1])
+    images = (128 + weights @ basis + rng.normal(size=(60, 24 * 24))).reshape(60, 24, 24)
+    
+    reference, ref_components, ref_mean = MLImageProcessor.pca_reduce(images, 4, solver='covariance')
+    for solver in ('gram', 'svd', 'randomized'):
+        reduced, components, mean_img = MLImageProcessor.pca_reduce(images, 4, solver=solver)
+        assert components.shape == ref_components.shape
+        # Same directions up to sign
+        assert np.allclose(np.abs(np.sum(components * ref_components, axis=0)), 1, atol=1e-6), solver
+        assert np.allclose(np.abs(reduced), np.abs(reference), atol=1e-6), solver
+        assert np.array_equal(mean_img, ref_mean)
+    
+    # Large images never form the pixel covariance matrix
+    assert choose_pca_solver(20, 256 * 256, 5) == 'gram'
+    assert choose_pca_solver(5000, 256 * 256, 10) == 'randomized'
+    assert choose_pca_solver(5000, 100, 10) == 'covariance'
+    reduced, components, _ = MLImageProcessor.pca_reduce(rng.random((8, 128, 128)), 3)
+    assert reduced.shape == (8, 3) and components.shape == (128 * 128, 3)
+    
+    # More components than the data rank: same shapes as the covariance
+    # solver, padded with orthonormal zero-variance directions
+    few = rng.random((5, 32, 32)) * 255
+    for solver in ('auto', 'gram', 'svd', 'randomized', 'covariance'):
+        reduced, components, _ = MLImageProcessor.pca_reduce(few, n_components=10, solver=solver)
+        assert reduced.shape == (5, 10) and components.shape == (1024, 10), solver
+        assert np.allclose(components.T @ components, np.eye(10), atol=1e-8), solver
+        assert np.allclose(reduced[:, 4:], 0, atol=1e-6), solver
+    
+    print("  ✓ PCA solvers passed")
+
+
+def test_incremental_pca():
+    """Test incremental PCA, checkpoint / resume and transform"""
+    print("\nTesting Incremental PCA...")
+    
+    import os
+    import tempfile
+    from pca import IncrementalPCA
+    
+    rng = np.random.default_rng(8)
+    # Rank-3 data: incremental and batch PCA find the same subspace
+    basis = rng.normal(size=(3, 16 * 16)) * 20
+    images = (100 + rng.normal(size=(120, 3)) @ basis).reshape(120, 16, 16)
+    reduced, components, mean_img = MLImageProcessor.pca_reduce(images, 3, solver='svd')
+    
+    ipca = IncrementalPCA(n_components=3).fit(iter(images), batch_size=25)
+    assert ipca.n_samples_seen == 120
+    assert np.allclose(ipca.mean, mean_img)
+    assert np.allclose(np.abs(np.sum(ipca.components * components, axis=0)), 1)
+    assert np.allclose(np.abs(ipca.transform(images)), np.abs(reduced))
+    assert np.allclose(ipca.inverse_transform(ipca.transform(images[:5])), images[:5])
+    
+    # Interrupted fit resumed from its checkpoint gives the same state
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, 'ipca.npz')
+        IncrementalPCA(3).fit(iter(images[:50]), batch_size=25, checkpoint=checkpoint)
+        resumed = IncrementalPCA(3).fit(iter(images), batch_size=25,
+                                        checkpoint=checkpoint, resume=True)
+        assert resumed.n_samples_seen == 120
+        assert np.allclose(resumed.components, ipca.components)
+        
+        loaded = IncrementalPCA.load(checkpoint)
+        assert np.allclose(loaded.transform(images[0]), ipca.transform(images[0]))
+    
+    print(f"  - Explained variance: {np.round(ipca.explained_variance, 1)}")
+    print("  ✓ Incremental PCA passed")
+
+
 def run_all_tests():
     """Run all ML tests"""
     print("\n" + "=" * 50)
@@ -227,14 +629,25 @@ def run_all_tests():
     print("=" * 50)
     
     test_kmeans_segmentation()
+    test_kmeans_histogram_mode()
+    test_minibatch_color_kmeans()
     test_feature_extraction()
+    test_fused_features()
+    test_feature_batch()
     test_knn_classifier()
+    test_knn_index()
+    test_knn_batched_queries()
     test_otsu_threshold()
+    test_otsu_multilevel_and_batch()
     test_adaptive_threshold()
     test_ml_edge_detection()
+    test_non_maximum_suppression()
+    test_exact_hysteresis()
     test_morphological_operations()
     test_object_detection()
     test_pca_reduce()
+    test_pca_solvers()
+    test_incremental_pca()
     
     print("\n" + "=" * 50)
     print("All ML tests passed successfully!")
@@ -157,6 +157,488 @@ def test_image_processing():
     print("\n=== All tests passed successfully! ===\n")
 
 
+def _reference_convolution(image, kernel):
+    """Per-pixel reference loop (original convolution2d semantics)"""
+    kh, kw = kernel.shape
+    padded = np.pad(image, ((kh // 2, kh // 2), (kw // 2, kw // 2)), mode='edge')
+    result = np.zeros_like(image, dtype=np.float64)
+    for i in range(image.shape[0]):
+        for j in range(image.shape[1]):
+            result[i, j] = np.sum(padded[i:i+kh, j:j+kw] * kernel)
+    return np.clip(result, 0, 255).astype(np.uint8)
+
+
+def test_convolution_engine():
+    """Test vectorized convolution engine against the per-pixel loop"""
+    
+    print("\n=== Testing Convolution Engine ===\n")
+    
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (48, 40), dtype=np.uint8)
+    
+    # Square kernels, including sizes above numpy's pairwise block size
+    for size in [2, 3, 5, 13]:
+        kernel = np.ones((size, size), dtype=np.float64) / (size ** 2)
+        expected = _reference_convolution(image, kernel)
+        result = ImageProcessor.convolution2d(image, kernel, method='direct')
+        assert np.array_equal(result, expected), f"Mismatch for {size}x{size} kernel"
+    print("  ✓ Square kernels bit-identical")
+    
+    # Non-square kernel
+    kernel = rng.normal(size=(3, 7))
+    expected = _reference_convolution(image, kernel)
+    result = ImageProcessor.convolution2d(image, kernel, method='direct')
+    assert np.array_equal(result, expected), "Non-square kernel mismatch"
+    print("  ✓ Non-square kernel bit-identical")
+    
+    # Separable kernel given as (column, row) factors
+    column = np.array([1.0, 2.0, 1.0]) / 4
+    row = np.array([1.0, 4.0, 6.0, 4.0, 1.0]) / 16
+    expected = _reference_convolution(image, np.outer(column, row))
+    result = ImageProcessor.convolution2d(image, (column, row))
+    assert np.abs(result.astype(int) - expected.astype(int)).max() <= 1, \
+        "Separable kernel mismatch"
+    print("  ✓ Separable kernel passed")
+
+
+def test_convolution_planner():
+    """Test that every planned convolution method agrees with scipy"""
+    
+    print("\n=== Testing Convolution Planner ===\n")
+    
+    from scipy import ndimage
+    from convolution import METHODS, convolve, plan_convolution
+    
+    rng = np.random.default_rng(1)
+    image = rng.integers(0, 256, (64, 80), dtype=np.uint8)
+    kernels = [
+        np.ones((7, 7)) / 49,                               # box
+        np.outer([1.0, 2.0, 1.0], [-1.0, 0.0, 1.0]),        # separable
+        rng.normal(size=(4, 5)),                            # general, even size
+    ]
+    
+    for kernel in kernels:
+        expected = ndimage.convolve(image.astype(np.float64), kernel)
+        for method in METHODS:
+            try:
+                result = convolve(image, kernel, mode='reflect', flip=True, method=method)
+            except ValueError:
+                continue  # method does not apply to this kernel
+            assert np.allclose(result, expected, atol=1e-8), \
+                f"{method} mismatch for kernel {kernel.shape}"
+    print("  ✓ All methods match scipy.ndimage.convolve")
+    
+    # Large box kernels must not use the O(k^2) direct method
+    method = plan_convolution((1080, 1920), np.ones((51, 51)) / 51 ** 2, 'reflect', True)
+    print(f"  - 51x51 box kernel on 1080p planned as: {method}")
+    assert method != 'direct', "Planner should avoid direct method for 51x51 box"
+    
+    # The average filter is exact by default; the planner is opt-in and
+    # stays within one gray level
+    exact = ImageProcessor.average_filter(image, 5)
+    assert np.array_equal(exact, _reference_convolution(image, np.ones((5, 5)) / 25))
+    for value, size in ((255, 5), (7, 3)):
+        flat = np.full((20, 30), value, dtype=np.uint8)
+        assert np.array_equal(ImageProcessor.average_filter(flat, size),
+                              _reference_convolution(flat, np.ones((size, size)) / size ** 2))
+    auto = ImageProcessor.average_filter(image, 5, method='auto')
+    assert np.abs(auto.astype(int) - exact.astype(int)).max() <= 1, "Average filter drift"
+    
+    # Gradients and Laplacians match scipy.ndimage.convolve to the uint8
+    # level, whatever the planner would choose for an image this size
+    large = rng.integers(0, 256, (480, 640), dtype=np.uint8)
+    gradients = {'sobel_edge_detection': np.array([[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]]),
+                 'prewitt_edge_detection': np.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]])}
+    for name, kernel_x in gradients.items():
+        Gx = ndimage.convolve(large.astype(np.float64), kernel_x.astype(np.float64))
+        Gy = ndimage.convolve(large.astype(np.float64), kernel_x.T.astype(np.float64))
+        expected = np.clip(np.sqrt(Gx**2 + Gy**2), 0, 255).astype(np.uint8)
+        magnitude, gx, gy = getattr(ImageProcessor, name)(large)
+        assert np.array_equal(magnitude, expected), f"{name} differs from scipy"
+        assert np.array_equal(gx, Gx) and np.array_equal(gy, Gy), f"{name} gradients inexact"
+    laplacian = ndimage.convolve(large.astype(np.float64),
+                                 np.array([[1., 1, 1], [1, -8, 1], [1, 1, 1]]))
+    assert np.array_equal(ImageProcessor.laplacian_8_neighbor(large),
+                          np.clip(np.abs(laplacian), 0, 255).astype(np.uint8))
+    print("  ✓ Convolution planner passed")
+
+
+def test_result_cache():
+    """Test memoization of processor methods by content hash"""
+    import os
+    import tempfile
+    from result_cache import CachedProcessor, ResultCache
+    
+    print("\nTesting result cache...")
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (64, 64), dtype=np.uint8)
+    
+    cache = ResultCache(max_bytes=64 * 1024)
+    processor = CachedProcessor(ImageProcessor, cache)
+    
+    first = processor.median_filter(img, 5)
+    second = processor.median_filter(img, kernel_size=5)  # same call, keyword form
+    assert np.array_equal(first, ImageProcessor.median_filter(img, 5))
+    assert np.array_equal(first, second)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    
+    # Results are copies: editing one does not corrupt the cache
+    second[:] = 0
+    assert np.array_equal(processor.median_filter(img, 5), first)
+    
+    # Different content or parameters miss
+    processor.median_filter(img.copy(), 5)
+    processor.median_filter(img, 3)
+    processor.median_filter(255 - img, 5)
+    stats = cache.stats()
+    assert stats['hits'] == 3 and stats['misses'] == 3
+    assert 0 < stats['bytes'] <= 64 * 1024
+    
+    # Byte budget: 64 KB holds 16 results of 4 KB
+    for size in range(3, 43, 2):
+        processor.average_filter(img, size)
+    assert cache.stats()['evictions'] > 0 and cache.stats()['bytes'] <= 64 * 1024
+    
+    # Random operations are never cached
+    assert not np.array_equal(processor.add_salt_pepper_noise(img),
+                              processor.add_salt_pepper_noise(img))
+    
+    # Disk tier survives a new in-memory cache
+    with tempfile.TemporaryDirectory() as tmp:
+        ResultCache(disk_dir=tmp).memoize(ImageProcessor.sobel_edge_detection)(img)
+        assert any(name.endswith('.pkl') for name in os.listdir(tmp))
+        warm = ResultCache(disk_dir=tmp)
+        result = warm.memoize(ImageProcessor.sobel_edge_detection)(img)
+        assert warm.stats()['disk_hits'] == 1 and warm.stats()['hit_rate'] == 1.0
+        assert np.array_equal(result[0], ImageProcessor.sobel_edge_detection(img)[0])
+        
+        # The disk total is tracked without rescanning and stays in budget
+        small = ResultCache(disk_dir=tmp, disk_max_bytes=3 * img.nbytes)
+        for size in range(3, 15, 2):
+            small.memoize(ImageProcessor.average_filter)(img, size)
+        on_disk = sum(os.path.getsize(os.path.join(tmp, name))
+                      for name in os.listdir(tmp) if name.endswith('.pkl'))
+        assert small.stats()['disk_bytes'] == on_disk <= 3 * img.nbytes
+    
+    # Out-parameters are filled on every call, never served from the cache
+    from ml_processing import MLImageProcessor
+    ml = CachedProcessor(MLImageProcessor, ResultCache())
+    ml.detect_edges_ml(img, timings={})
+    timings = {}
+    ml.detect_edges_ml(img, timings=timings)
+    assert 'hysteresis' in timings and ml.cache.stats()['hits'] == 0
+    
+    print(f"  Cache stats: {cache.stats()}")
+    print("✓ Result cache")
+
+
+def test_job_runner():
+    """Test background jobs: results on the polling thread, stale jobs dropped"""
+    import threading
+    import time
+    from jobs import JobRunner
+
+    print("\nTesting background job runner...")
+    scheduled = []
+    progress = []
+    runner = JobRunner(lambda delay, callback: scheduled.append(callback),
+                       on_progress=lambda running: progress.append([job.name for job in running]))
+
+    def run_until_idle(timeout=10.0):
+        deadline = time.perf_counter() + timeout
+        while scheduled and time.perf_counter() < deadline:
+            scheduled.pop(0)()
+            time.sleep(0.005)
+        assert not scheduled, "jobs did not finish"
+
+    img = np.random.default_rng(0).integers(0, 256, (128, 128), dtype=np.uint8)
+    results = []
+    ui_thread = threading.get_ident()
+
+    def on_done(result):
+        assert threading.get_ident() == ui_thread
+        results.append(result)
+
+    # A blocked job, a job queued behind it, then a newer request: only the
+    # newest result is delivered
+    release = threading.Event()
+    runner.submit("slow", lambda: release.wait(5) and ImageProcessor.median_filter(img, 3), on_done)
+    queued = runner.submit("queued", lambda: ImageProcessor.median_filter(img, 5), on_done)
+    runner.submit("newest", lambda: ImageProcessor.median_filter(img, 7), on_done)
+    assert queued.cancelled()
+    release.set()
+    run_until_idle()
+    assert len(results) == 1
+    assert np.array_equal(results[0], ImageProcessor.median_filter(img, 7))
+    assert runner.stale >= 1
+    assert ["newest"] in progress and progress[-1] == []
+
+    # Errors are delivered to on_error, other channels run independently
+    errors = []
+    runner.submit("bad", lambda: 1 / 0, on_done, on_error=errors.append)
+    runner.submit("other", lambda: 42, on_done, channel='info')
+    run_until_idle()
+    assert isinstance(errors[0], ZeroDivisionError) and results[-1] == 42
+
+    # A burst of replaced requests leaves no callbacks behind
+    release.clear()
+    runner.submit("blocker", lambda: release.wait(5), on_done)
+    for i in range(50):
+        runner.submit(f"burst {i}", lambda: i, on_done)
+    release.set()
+    run_until_idle()
+    assert results[-1] == 49 and not runner._callbacks
+
+    runner.shutdown()
+    print(f"  Stale results discarded: {runner.stale}")
+    print("✓ Background job runner")
+
+
+def test_histogram_kernel():
+    """Test the shared histogram kernel against np.histogram"""
+    import histogram
+    from histogram import channel_histograms, intensity_histogram, joint_histogram
+
+    print("\nTesting histogram kernel...")
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (120, 90), dtype=np.uint8)
+    mask = rng.random(img.shape) > 0.5
+
+    for bins in (256, 32, 10):
+        expected, _ = np.histogram(img.flatten(), bins=bins, range=[0, 256])
+        assert np.array_equal(intensity_histogram(img, bins=bins), expected)
+    assert np.array_equal(intensity_histogram(img, mask=mask), np.bincount(img[mask], minlength=256))
+    noisy = img + rng.normal(0, 20, img.shape)  # float, partly outside [0, 256)
+    assert np.array_equal(intensity_histogram(noisy),
+                          np.histogram(noisy.flatten(), bins=256, range=[0, 256])[0])
+
+    # Tiles (summed in int64, counted on threads) give the same counts
+    tile_pixels, histogram.TILE_PIXELS = histogram.TILE_PIXELS, 1000
+    try:
+        tiled = intensity_histogram(img, mask=mask, workers=3)
+    finally:
+        histogram.TILE_PIXELS = tile_pixels
+    assert np.array_equal(tiled, np.bincount(img[mask], minlength=256))
+
+    color = rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)
+    per_channel = channel_histograms(color)
+    assert all(np.array_equal(per_channel[c], np.bincount(color[..., c].ravel(), minlength=256))
+               for c in range(3))
+    joint = joint_histogram(color, bins=8, mask=mask[:60, :80])
+    expected, _ = np.histogramdd(color[mask[:60, :80]].astype(np.float64), bins=8,
+                                 range=[(0, 256)] * 3)
+    assert joint.shape == (8, 8, 8) and np.array_equal(joint, expected)
+
+    # Empty images count nothing
+    for shape in ((0, 3), (3, 0), (0,), (0, 4, 3)):
+        for bins in (256, 32):
+            empty = intensity_histogram(np.zeros(shape, np.uint8), bins=bins)
+            assert empty.dtype == np.int64 and np.array_equal(empty, np.zeros(bins))
+    assert not channel_histograms(np.zeros((0, 3), np.uint8)).any()
+
+    print("✓ Histogram kernel")
+
+
+def test_point_ops():
+    """Test point operations compiled to lookup tables"""
+    from point_ops import apply_point_ops, compile_lut
+
+    print("\nTesting point operation tables...")
+    rng = np.random.default_rng(0)
+    img = rng.integers(20, 200, (90, 110), dtype=np.uint8)
+    gray = img.astype(np.float64)
+
+    # Same output as the per-pixel formulas of image_processing_app.py
+    log_ref = 2.0 * np.log1p(gray)
+    log_ref = (log_ref - log_ref.min()) / (log_ref.max() - log_ref.min()) * 255
+    inv_ref = np.expm1(gray / 255.0 / 0.5)
+    inv_ref = (inv_ref - inv_ref.min()) / (inv_ref.max() - inv_ref.min()) * 255
+    for name, params, ref in [('negative', {}, 255 - img),
+                              ('log_transform', {'c': 2.0}, log_ref),
+                              ('inverse_log_transform', {'c': 0.5}, inv_ref),
+                              ('gamma_transform', {'gamma': 0.4},
+                               np.power(gray / 255.0, 0.4) * 255)]:
+        assert np.array_equal(apply_point_ops(img, [(name, params)]), ref.astype(np.uint8)), name
+
+    # A chain is one table, equal to applying the steps in turn
+    steps = [('gamma_transform', {'gamma': 2.2}), ('contrast_clipping_type2', {}),
+             ('histogram_equalization', {}), ('negative', {})]
+    expected = img
+    for name, params in steps:
+        expected = apply_point_ops(expected, [(name, params)])
+    assert np.array_equal(apply_point_ops(img, steps), expected)
+
+    # Methods use the tables for uint8 and keep the arithmetic otherwise
+    lut = compile_lut('contrast_clipping_type1', low_threshold=50, high_threshold=150)
+    assert np.array_equal(ImageProcessor.contrast_clipping_type1(img, 50, 150), lut[img])
+    stretched = ImageProcessor.contrast_stretching(gray)
+    assert stretched.dtype == np.uint8
+    assert np.array_equal(stretched, ImageProcessor.contrast_stretching(img))
+
+    print("✓ Point operation tables")
+
+
+def test_histogram_matching():
+    """Test searchsorted CDF inversion and reusable references"""
+    from point_ops import HistogramReference
+
+    print("\nTesting histogram matching...")
+    rng = np.random.default_rng(0)
+    img = rng.integers(30, 180, (80, 100), dtype=np.uint8)
+    equalized, _ = ImageProcessor.histogram_equalization(img)
+
+    # Same lookup as the per-level argmin loop, including ties on the
+    # repeated CDF values of empty reference bins
+    for ref_hist in [rng.random(256), rng.integers(0, 3, 256) * (rng.random(256) > 0.6),
+                     np.exp(-((np.arange(256) - 128) ** 2) / (2 * 50 ** 2)).astype(np.float32)]:
+        ref_cdf = ref_hist.cumsum()
+        ref_cdf = (ref_cdf - ref_cdf.min()) * 255 / (ref_cdf.max() - ref_cdf.min())
+        table = np.array([np.argmin(np.abs(ref_cdf - s)) for s in range(256)], dtype=np.uint8)
+        assert np.array_equal(ImageProcessor.histogram_matching(img, ref_hist), table[equalized])
+
+    # A reference built once from an image is reused across frames
+    reference = HistogramReference.from_image(cv2.GaussianBlur(img, (9, 9), 3))
+    for frame in (img, 255 - img):
+        assert np.array_equal(reference.match(frame),
+                              ImageProcessor.histogram_matching(frame, reference.hist))
+
+    # Colour: every channel matched to the same channel of the reference
+    color = rng.integers(0, 256, (60, 70, 3), dtype=np.uint8)
+    target = np.dstack([img[:60, :70], 255 - img[:60, :70], equalized[:60, :70]])
+    matched = ImageProcessor.histogram_matching_color(color, target)
+    for c in range(3):
+        expected = ImageProcessor.histogram_matching(np.ascontiguousarray(color[..., c]),
+                                                     HistogramReference.from_image(target[..., c]))
+        assert np.array_equal(matched[..., c], expected)
+
+    print("✓ Histogram matching")
+
+
+def test_pipeline():
+    """Test Pipeline: fused point operations, float32 intermediates"""
+    from convolution import convolve
+    from pipeline import Pipeline
+
+    print("\nTesting operation pipeline...")
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (120, 160), dtype=np.uint8), (7, 7), 2)
+
+    steps = ['contrast_stretching',
+             ('contrast_clipping_type1', {'low_threshold': 40, 'high_threshold': 200}),
+             'contrast_clipping_type2', 'histogram_equalization',
+             ('histogram_matching', {'reference_hist': rng.random(256)}),
+             ('average_filter', {'kernel_size': 5}), 'sobel_edge_detection',
+             ('median_filter', {'kernel_size': 3}), ('sharpen_image', {'method': 'log'})]
+    expected = img
+    for step in steps:
+        name, kwargs = step if isinstance(step, tuple) else (step, {})
+        expected = getattr(ImageProcessor, name)(expected, **kwargs)
+        if isinstance(expected, tuple):
+            expected = expected[0]
+
+    # uint8 precision: identical to calling the methods one by one
+    exact = Pipeline(steps, precision='uint8')
+    assert exact.describe()[0] == ('lut(contrast_stretching + contrast_clipping_type1 + '
+                                   'contrast_clipping_type2 + histogram_equalization + '
+                                   'histogram_matching)')
+    assert np.array_equal(exact(img), expected)
+    assert np.array_equal(Pipeline(steps, precision='uint8', fuse=False)(img), expected)
+
+    # float32: no rounding between linear stages (float64 reference)
+    pipe = Pipeline([('average_filter', {'kernel_size': 5}), 'sharpen_image',
+                     'laplacian_8_neighbor'])
+    assert pipe.describe() == ['float32(average_filter)', 'float32(sharpen_image)',
+                               'float32(laplacian_8_neighbor)']
+    lap = np.array([[1, 1, 1], [1, -8, 1], [1, 1, 1]], dtype=np.float64)
+    ref = np.clip(convolve(img.astype(np.float64), np.ones((5, 5)) / 25, mode='nearest'), 0, 255)
+    ref = np.clip(ref - convolve(ref, lap, mode='reflect', flip=True), 0, 255)
+    ref = np.clip(np.abs(convolve(ref, lap, mode='reflect', flip=True)), 0, 255).astype(np.uint8)
+    first = pipe(img)
+    assert np.abs(first.astype(int) - ref).max() <= 1
+    # Buffers are reused, but results handed out are not overwritten
+    second = pipe(255 - img)
+    assert np.array_equal(first, pipe(img)) and not np.array_equal(first, second)
+    # Buffers are kept for the most recent shapes only
+    from pipeline import BUFFER_SHAPES
+    for size in range(20, 30):
+        assert pipe(img[:size, :size]).shape == (size, size)
+    assert len(pipe._buffers) <= BUFFER_SHAPES
+    assert np.array_equal(pipe(img), first)
+
+    print(f"  Plan: {exact.describe()}")
+    print("✓ Operation pipeline")
+
+
+def test_batch_cli():
+    """Test the headless batch command: pipeline spec, pool, resume"""
+    import io
+    import tempfile
+    import xuly
+
+    print("\nTesting batch CLI...")
+    stages = xuly.parse_pipeline("clahe:clip=2, tile=(4,4) | median:5 | sobel")
+    assert stages == [('clahe', (), {'clip_limit': 2, 'tile_grid_size': (4, 4)}),
+                      ('median', (5,), {}), ('sobel', (), {})]
+    for bad in ("blur:3", "median:3,4,5", "clip:low=1,2"):
+        try:
+            xuly.parse_pipeline(bad)
+            assert False, f"accepted {bad}"
+        except ValueError:
+            pass
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        source, output = os.path.join(tmp, 'in'), os.path.join(tmp, 'out')
+        os.makedirs(os.path.join(source, 'sub'))
+        images = {}
+        for name in ('a.png', 'b.png', os.path.join('sub', 'c.png')):
+            images[name] = rng.integers(0, 256, (48, 64), dtype=np.uint8)
+            cv2.imwrite(os.path.join(source, name), images[name])
+
+        pattern = os.path.join(source, '**', '*.png')
+        spec = "median:3 | otsu"
+        counts = xuly.run_batch(pattern, spec, output, workers=2, chunk_size=1, log=io.StringIO())
+        assert counts == {'processed': 3, 'failed': 0, 'skipped': 0}
+        for name, image in images.items():
+            expected = xuly.run_pipeline(image, xuly.parse_pipeline(spec))
+            assert np.array_equal(cv2.imread(os.path.join(output, name), cv2.IMREAD_GRAYSCALE),
+                                  expected)
+
+        # A rerun skips finished files; a new file is picked up
+        cv2.imwrite(os.path.join(source, 'd.png'), images['a.png'])
+        counts = xuly.run_batch(pattern, spec, output, workers=1, log=io.StringIO())
+        assert counts == {'processed': 1, 'failed': 0, 'skipped': 3}
+
+        # Another pipeline must not reuse the progress log
+        try:
+            xuly.run_batch(pattern, "sobel", output, workers=1, log=io.StringIO())
+            assert False, "resumed a different pipeline"
+        except ValueError:
+            pass
+        assert xuly.main(['batch', pattern, "sobel", output, '-j', '1', '--restart']) == 0
+
+        # Default precision reproduces the methods exactly; float32 is opt-in
+        spec = "average:5 | log | prewitt"
+        assert xuly.main(['batch', pattern, spec, output, '-j', '1', '--restart']) == 0
+        expected = ImageProcessor.prewitt_edge_detection(ImageProcessor.laplacian_of_gaussian(
+            ImageProcessor.average_filter(images['a.png'], 5)))[0]
+        assert np.array_equal(cv2.imread(os.path.join(output, 'a.png'), cv2.IMREAD_GRAYSCALE),
+                              expected)
+        try:
+            xuly.run_batch(pattern, spec, output, workers=1, precision='float32', log=io.StringIO())
+            assert False, "resumed with a different precision"
+        except ValueError:
+            pass
+
+        # Output directory inside the input tree: earlier outputs are not inputs
+        nested = os.path.join(source, 'out')
+        for _ in range(2):
+            counts = xuly.run_batch(pattern, spec, nested, workers=1, log=io.StringIO())
+        assert counts == {'processed': 0, 'failed': 0, 'skipped': 4}
+
+    print("✓ Batch CLI")
+
+
 def create_comparison_images():
     """Create comparison images showing before/after processing"""
     
@@ -209,6 +691,15 @@ if __name__ == "__main__":
     
     # Test all functions
     test_image_processing()
+    test_convolution_engine()
+    test_convolution_planner()
+    test_result_cache()
+    test_job_runner()
+    test_histogram_kernel()
+    test_point_ops()
+    test_histogram_matching()
+    test_pipeline()
+    test_batch_cli()
     
     # Create comparison images
     create_comparison_images()
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Xử lý hàng loạt - Headless Batch Processing
+Runs ImageProcessor / MLImageProcessor operations over many files without
+a display:
+- Pipeline spec: stages separated by '|', each 'name[:arg,key=value,...]',
+  e.g. "clahe:clip=2 | median:5 | sobel" (see `python xuly.py ops`), run
+  as a pipeline.Pipeline with the methods' uint8 rounding (float32
+  intermediates only with --precision float32)
+- Input glob (recursive '**' allowed); outputs keep the path relative to
+  the glob's base directory
+- Process pool with a bounded number of chunks in flight, so the file list
+  is streamed rather than held in memory
+- Resumable: finished inputs are appended to a log in the output directory
+  and skipped when the same command is run again
+
+Usage:
+    python xuly.py batch "photos/**/*.jpg" "clahe:clip=2 | median:5 | sobel" out/
+    python xuly.py batch "scans/*.png" "otsu" out/ --workers 8 --chunk-size 64
+"""
+
+import argparse
+import ast
+import functools
+import glob
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import cv2
+
+from image_processing import ImageProcessor
+from ml_processing import MLImageProcessor
+from pipeline import PRECISIONS, Pipeline
+
+
+def _first(func: Callable) -> Callable:
+    """Keep only the image of a function returning (image, ...)"""
+    @functools.wraps(func)
+    def wrapper(image, *args, **kwargs):
+        return func(image, *args, **kwargs)[0]
+    return wrapper
+
+
+# name -> (function, short parameter names)
+OPERATIONS: Dict[str, Tuple[Callable, Dict[str, str]]] = {
+    'stretch': (ImageProcessor.contrast_stretching, {'min': 'r_min', 'max': 'r_max'}),
+    'clip': (ImageProcessor.contrast_clipping_type1,
+             {'low': 'low_threshold', 'high': 'high_threshold'}),
+    'clip2': (ImageProcessor.contrast_clipping_type2,
+              {'dark': 'dark_threshold', 'mid': 'mid_threshold'}),
+    'equalize': (_first(ImageProcessor.histogram_equalization), {}),
+    'clahe': (ImageProcessor.adaptive_histogram_equalization,
+              {'clip': 'clip_limit', 'tile': 'tile_grid_size'}),
+    'average': (ImageProcessor.average_filter, {'size': 'kernel_size'}),
+    'median': (ImageProcessor.median_filter, {'size': 'kernel_size'}),
+    'noise': (ImageProcessor.add_salt_pepper_noise, {'salt': 'salt_prob', 'pepper': 'pepper_prob'}),
+    'sobel': (_first(ImageProcessor.sobel_edge_detection), {}),
+    'prewitt': (_first(ImageProcessor.prewitt_edge_detection), {}),
+    'roberts': (_first(ImageProcessor.roberts_edge_detection), {}),
+    'kirsch': (ImageProcessor.kirsch_edge_detection, {}),
+    'laplacian4': (ImageProcessor.laplacian_4_neighbor, {}),
+    'laplacian8': (ImageProcessor.laplacian_8_neighbor, {}),
+    'log': (ImageProcessor.laplacian_of_gaussian, {}),
+    'sharpen': (ImageProcessor.sharpen_image, {}),
+    'lowpass': (ImageProcessor.ideal_lowpass_filter, {'cutoff': 'cutoff_frequency'}),
+    'gaussian': (ImageProcessor.gaussian_lowpass_filter, {}),
+    'highpass': (ImageProcessor.ideal_highpass_filter, {'cutoff': 'cutoff_frequency'}),
+    'butterworth': (ImageProcessor.butterworth_highpass_filter, {'d0': 'D0'}),
+    'kmeans': (_first(MLImageProcessor.kmeans_segmentation), {}),
+    'otsu': (_first(MLImageProcessor.otsu_threshold), {}),
+    'adaptive': (MLImageProcessor.adaptive_threshold_ml, {'block': 'block_size'}),
+    'canny': (MLImageProcessor.detect_edges_ml, {'low': 'low_threshold', 'high': 'high_threshold'}),
+    'morph': (MLImageProcessor.morphological_operations, {'op': 'operation', 'size': 'kernel_size'}),
+}
+
+
+def _parse_value(text: str):
+    """Python literal if possible ('2', '(8, 8)', 'True'), else the string"""
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def _split_args(text: str) -> List[str]:
+    """Split on commas outside brackets: 'tile=(8,8),clip=2' -> 2 items"""
+    items, depth, current = [], 0, ''
+    for char in text:
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        if char == ',' and depth == 0:
+            items.append(current)
+            current = ''
+        else:
+            current += char
+    items.append(current)
+    return [item.strip() for item in items if item.strip()]
+
+
+def parse_pipeline(spec: str) -> List[Tuple[str, tuple, dict]]:
+    """
+    Parse a pipeline spec
+
+    Args:
+        spec: e.g. "clahe:clip=2 | median:5 | sobel"
+
+    Returns:
+        List of (operation name, args, kwargs); kwargs use the function's
+        parameter names
+
+    Raises:
+        ValueError: Unknown operation or arguments that do not fit it
+    """
+    stages = []
+    for text in spec.split('|'):
+        name, _, arg_text = text.strip().partition(':')
+        name = name.strip().lower()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}' (see 'python xuly.py ops')")
+        func, aliases = OPERATIONS[name]
+
+        args, kwargs = [], {}
+        for item in _split_args(arg_text):
+            key, equals, value = item.partition('=')
+            if equals:
+                kwargs[aliases.get(key.strip(), key.strip())] = _parse_value(value.strip())
+            elif kwargs:
+                raise ValueError(f"{name}: positional argument after keyword: {item}")
+            else:
+                args.append(_parse_value(item))
+
+        try:
+            inspect.signature(func).bind(None, *args, **kwargs)
+        except TypeError as error:
+            raise ValueError(f"{name}: {error}") from None
+        stages.append((name, tuple(args), kwargs))
+    return stages
+
+
+def build_pipeline(stages: List[Tuple[str, tuple, dict]],
+                   precision: str = 'uint8') -> Pipeline:
+    """
+    Pipeline of parsed stages (point operations fused)
+
+    precision='uint8' gives exactly the output of the methods;
+    'float32' keeps linear stages unrounded in between (see pipeline).
+    """
+    steps = []
+    for name, args, kwargs in stages:
+        func = OPERATIONS[name][0]
+        bound = inspect.signature(func).bind(None, *args, **kwargs).arguments
+        steps.append((func, dict(list(bound.items())[1:])))
+    return Pipeline(steps, precision=precision)
+
+
+def run_pipeline(image: np.ndarray, stages: List[Tuple[str, tuple, dict]],
+                 precision: str = 'uint8') -> np.ndarray:
+    """Apply parsed pipeline stages in order"""
+    return build_pipeline(stages, precision)(image)
+
+
+def glob_base(pattern: str) -> str:
+    """Directory part of a glob pattern before the first wildcard"""
+    parts = os.path.normpath(pattern).split(os.sep)
+    base = []
+    for part in parts[:-1]:
+        if glob.has_magic(part):
+            break
+        base.append(part)
+    return os.sep.join(base) if base else '.'
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_pipeline(spec: str, precision: str) -> Pipeline:
+    return build_pipeline(parse_pipeline(spec), precision)
+
+
+def _process_chunk(spec: str, precision: str, output_dir: str, extension: str,
+                   items: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Worker: read, process and write a chunk of files
+
+    Returns:
+        (relative path, error message or '') per input
+    """
+    pipeline = _cached_pipeline(spec, precision)
+    results = []
+    for path, relative in items:
+        try:
+            image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise ValueError("cannot read image")
+            result = pipeline(image)
+
+            target = os.path.join(output_dir, os.path.splitext(relative)[0] + extension)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Write then rename, so an interrupted run never leaves a partial file
+            temporary = f"{target}.{os.getpid()}.tmp{extension}"
+            if not cv2.imwrite(temporary, result):
+                raise ValueError(f"cannot write {target}")
+            os.replace(temporary, target)
+            results.append((relative, ''))
+        except Exception as error:  # Reported per file; the batch continues
+            results.append((relative, str(error) or type(error).__name__))
+    return results
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _group_by_extension(chunk: List[Tuple[str, str]]) -> Iterator[List[Tuple[str, str]]]:
+    groups: Dict[str, list] = {}
+    for item in chunk:
+        groups.setdefault(os.path.splitext(item[0])[1].lower(), []).append(item)
+    return iter(groups.values())
+
+
+# Resume state kept in the output directory
+RUN_FILE = '.xuly-run.json'
+DONE_LOG = '.xuly-done.log'
+
+
+def run_batch(pattern: str, spec: str, output_dir: str, workers: int = None,
+              chunk_size: int = 16, in_flight: int = 2, extension: str = None,
+              restart: bool = False, precision: str = 'uint8',
+              progress_every: float = 2.0, log=sys.stderr) -> Dict[str, int]:
+    """
+    Process every file matching a glob through a pipeline
+
+    Args:
+        pattern: Input glob, e.g. "data/**/*.png"
+        spec: Pipeline spec (see parse_pipeline)
+        output_dir: Output root; also holds the resume log. Files under it
+            are not inputs, even if they match the pattern
+        workers: Worker processes (None = all CPUs, 1 = in this process)
+        chunk_size: Files per task sent to a worker
+        in_flight: Chunks queued per worker (bounds memory)
+        extension: Output file extension (default: keep the input's)
+        restart: Ignore the resume log and process everything again
+        precision: 'uint8' (same output as the methods) or 'float32'
+            (unrounded intermediates between linear stages)
+        progress_every: Seconds between progress lines
+        log: Stream for progress and errors
+
+    Returns:
+        Dict with processed, failed and skipped counts
+    """
+    stages = parse_pipeline(spec)  # Fail fast on a bad spec
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+
+    # A resume log only applies to the same pattern and pipeline
+    run = {'pattern': pattern, 'pipeline': [[name, list(args), kwargs] for name, args, kwargs in stages],
+           'extension': extension, 'precision': precision}
+    run_path, done_path = os.path.join(output_dir, RUN_FILE), os.path.join(output_dir, DONE_LOG)
+    done = set()
+    if not restart and os.path.exists(run_path):
+        with open(run_path) as f:
+            if json.load(f) != json.loads(json.dumps(run)):
+                raise ValueError(f"{output_dir} holds a run with a different pattern, "
+                                 "pipeline or precision (use --restart to overwrite)")
+        if os.path.exists(done_path):
+            with open(done_path, encoding='utf-8') as f:
+                done = {line.rstrip('\n') for line in f}
+    else:
+        with open(run_path, 'w') as f:
+            json.dump(run, f)
+        open(done_path, 'w').close()
+
+    base = glob_base(pattern)
+    counts = {'processed': 0, 'failed': 0, 'skipped': 0}
+    # Outputs may lie under a recursive input glob; they are never inputs
+    output_root = os.path.join(os.path.realpath(output_dir), '')
+
+    def pending() -> Iterator[Tuple[str, str]]:
+        for path in glob.iglob(pattern, recursive=True):
+            if not os.path.isfile(path) or os.path.realpath(path).startswith(output_root):
+                continue
+            relative = os.path.relpath(path, base)
+            if relative in done:
+                counts['skipped'] += 1
+                continue
+            yield path, relative
+
+    start = last_report = time.perf_counter()
+    with open(done_path, 'a', encoding='utf-8') as done_log:
+        def record(results):
+            nonlocal last_report
+            for relative, error in results:
+                if error:
+                    counts['failed'] += 1
+                    print(f"FAILED {relative}: {error}", file=log)
+                else:
+                    counts['processed'] += 1
+                    done_log.write(relative + '\n')
+            done_log.flush()
+            now = time.perf_counter()
+            if now - last_report >= progress_every:
+                last_report = now
+                rate = counts['processed'] / (now - start)
+                print(f"{counts['processed']} processed, {counts['failed']} failed, "
+                      f"{counts['skipped']} skipped ({rate:.1f} files/s)", file=log)
+
+        def task_args(chunk):
+            ext = extension or os.path.splitext(chunk[0][0])[1]
+            return spec, precision, output_dir, ext, chunk
+
+        chunks = _chunks(pending(), chunk_size)
+        if extension is None:
+            # Output extension follows each input, so group by extension
+            chunks = (group for chunk in chunks for group in _group_by_extension(chunk))
+
+        if workers == 1:
+            for chunk in chunks:
+                record(_process_chunk(*task_args(chunk)))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                running = set()
+                while True:
+                    for chunk in chunks:
+                        running.add(pool.submit(_process_chunk, *task_args(chunk)))
+                        if len(running) >= in_flight * workers:
+                            break
+                    if not running:
+                        break
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record(future.result())
+
+    elapsed = time.perf_counter() - start
+    print(f"Done: {counts['processed']} processed, {counts['failed']} failed, "
+          f"{counts['skipped']} skipped in {elapsed:.1f}s", file=log)
+    return counts
+
+
+def list_operations() -> None:
+    """Print the operations usable in a pipeline spec"""
+    for name, (func, aliases) in OPERATIONS.items():
+        params = list(inspect.signature(func).parameters.values())[1:]
+        shown = {value: key for key, value in aliases.items()}
+        text = ', '.join(f"{shown.get(p.name, p.name)}" +
+                         (f"={p.default!r}" if p.default is not inspect.Parameter.empty else '')
+                         for p in params)
+        print(f"  {name:12s} {text}")
+
+
+def main(argv: List[str] = None) -> int:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(prog='xuly', description="Xử lý ảnh hàng loạt (không cần giao diện)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help="Run a pipeline over files matching a glob")
+    batch.add_argument('input', help="Input glob, e.g. 'data/**/*.png' (quote it)")
+    batch.add_argument('pipeline', help="Pipeline spec, e.g. 'clahe:clip=2 | median:5 | sobel'")
+    batch.add_argument('output', help="Output directory")
+    batch.add_argument('--workers', '-j', type=int, default=None,
+                       help="Worker processes (default: all CPUs)")
+    batch.add_argument('--chunk-size', type=int, default=16, help="Files per task")
+    batch.add_argument('--in-flight', type=int, default=2,
+                       help="Queued chunks per worker (bounds memory)")
+    batch.add_argument('--ext', default=None, help="Output extension, e.g. .png")
+    batch.add_argument('--restart', action='store_true', help="Ignore previous progress")
+    batch.add_argument('--precision', choices=PRECISIONS, default='uint8',
+                       help="uint8: same output as the methods (default); float32: "
+                            "unrounded intermediates between linear stages")
+
+    commands.add_parser('ops', help="List pipeline operations")
+
+    args = parser.parse_args(argv)
+    if args.command == 'ops':
+        list_operations()
+        return 0
+
+    extension = args.ext if args.ext is None or args.ext.startswith('.') else '.' + args.ext
+    try:
+        counts = run_batch(args.input, args.pipeline, args.output, workers=args.workers,
+                           chunk_size=args.chunk_size, in_flight=args.in_flight,
+                           extension=extension, restart=args.restart,
+                           precision=args.precision)
+    except ValueError as error:
+        parser.error(str(error))
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())